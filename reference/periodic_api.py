@@ -4,20 +4,76 @@ periodic_api.py
 Backend for Mutual Fund & ETF Return Analyzer (DB-cached with CSV fallback)
 - Preserves original behavior and endpoints from the user's provided file
 - Adds DB caching for /api/stats, /api/schemes (optional), and /api/periodic_returns
-- Admin endpoints: /api/precompute_all, /api/precache_filters
+- CSV filtering/search for /api/schemes and the /api/dependent_filters facets run on an
+  in-memory index (scheme_index.py)
+- Process-local LRU/TTL response cache for /api/stats, /api/periodic_returns,
+  /api/top_performers and /api/returns_summary (response_cache.py)
+- ETag / Last-Modified / Cache-Control and 304s for /api/schemes, /api/stats and
+  /api/periodic_returns, keyed on a per-dataset data version shared by all workers
+  through the data_versions table
+- /api/periodic_returns_batch: many codes per call, one DB query, concurrent compute
+  for the rest, optional NDJSON streaming
+- Admin endpoints: /api/precompute_all (batch or background job), /api/precompute_status,
+  /api/precompute_cancel, /api/precache_filters, /api/cache_stats
 """
 
 import os
+import sys
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
+from types import SimpleNamespace
 
 import pandas as pd
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 
+from response_cache import DataVersion, ResponseCache
+from scheme_index import SchemeIndex
+
 # import the compute functions exactly as provided
 from periodic_return import fetch_nav_history, calculate_periodic_returns
 
+# --------------------------------------------------------------------
+# Optional batched returns engine (scripts/batch_returns.py). It produces the same
+# results dict as calculate_periodic_returns, for many schemes in one vectorized pass.
+# --------------------------------------------------------------------
+BATCH_ENGINE_AVAILABLE = False
+try:
+    sys.path.append(os.path.join(os.getcwd(), "scripts"))
+    from batch_returns import calculate_returns_batch
+    BATCH_ENGINE_AVAILABLE = True
+    print("[periodic_api] batch returns engine imported successfully")
+except Exception as e:
+    print("[periodic_api] batch returns engine unavailable, computing per scheme:", e)
+    calculate_returns_batch = None
+
+# Optional async NAV fetcher (scripts/async_fetcher.py, needs aiohttp): pooled client,
+# adaptive concurrency and jittered retries instead of sequential fetches with sleeps.
+ASYNC_FETCHER_AVAILABLE = False
+try:
+    from async_fetcher import AIOHTTP_AVAILABLE, iter_nav_payloads
+    from update_data import parse_nav_payload
+    ASYNC_FETCHER_AVAILABLE = AIOHTTP_AVAILABLE
+except Exception as e:
+    print("[periodic_api] async NAV fetcher unavailable, fetching sequentially:", e)
+
+# Optional precomputed correlation matrices (scripts/correlation.py) for "similar funds".
+CORRELATION_AVAILABLE = False
+correlation_index = None
+correlation_names = None
+try:
+    from correlation import CORRELATION_DIR, CorrelationIndex
+    CORRELATION_AVAILABLE = True
+except Exception as e:
+    print("[periodic_api] correlation matrices unavailable:", e)
+
+# Background precompute jobs (precompute_jobs.py): full-universe runs on a worker pool,
+# outside the request cycle, with progress exposed through /api/precompute_status.
+from precompute_jobs import PrecomputeRunner
+precompute_runner = None
+job_db = None       # the job thread's own connection (see get_job_db)
+
 # --------------------------------------------------------------------
 # Try to import user's database.py (optional). If not available, operate in CSV-only mode.
 # database.py is expected to expose helpers (any subset is fine):
@@ -26,14 +82,18 @@ from periodic_return import fetch_nav_history, calculate_periodic_returns
 #   - upsert_metadata(records)
 #   - get_schemes_from_db(filters)
 #   - get_filter_cache(type_)
-#   - upsert_filter_cache(type_, data)
+#   - upsert_filter_cache(type_, data), upsert_filter_cache_many({type_: data})
 #   - get_precomputed_return_json(code) OR get_precomputed_return(code)
+#   - get_precomputed_returns_many(codes)
 #   - upsert_fund_results_json(scheme_code, scheme_name, results_obj, meta=None)
+#   - upsert_fund_results_many(rows)  (rows of (scheme_code, scheme_name, results_obj, meta))
 #   - get_all_cached_returns(limit)
+#   - refresh_rankings(periods), get_fund_rankings(code)
+#   - bump_data_versions(datasets), get_data_versions()  (ETags shared across workers)
 # --------------------------------------------------------------------
 DB_AVAILABLE = False
 try:
-    from database import DB
+    from database import DB, Database
     DB_AVAILABLE = True
     print("[periodic_api] database.py imported successfully")
 except Exception as e:
@@ -69,6 +129,59 @@ CORS(app, resources={
     }
 })
 
+# --------------------------------------------------------------------
+# Response cache and data-version validators (response_cache.py). The data behind
+# the read endpoints only changes when it is written (precompute/precache, or a
+# fresh compute stored by the returns endpoints); every such write calls
+# data_changed(), which drops the affected cached responses and moves their ETags on
+# (fund_returns_changed() for the returns endpoints, which only drops those funds).
+# --------------------------------------------------------------------
+response_cache = ResponseCache()
+CACHE_TTL = {
+    "stats": 3600,
+    "periodic_returns": 900,
+    "top_performers": 900,
+    "returns_summary": 300
+}
+# dataset → cached endpoints built from it ("fund_returns": single funds stored by
+# the returns endpoints, see fund_returns_changed)
+DATASET_ENDPOINTS = {
+    "schemes": (),
+    "filters": ("stats",),
+    "returns": ("periodic_returns", "top_performers", "returns_summary"),
+    "fund_returns": (),
+    "rankings": ("top_performers",)
+}
+
+def drop_cached(datasets):
+    """Drop this worker's cached responses built from `datasets`."""
+    endpoints = {endpoint for name in datasets for endpoint in DATASET_ENDPOINTS[name]}
+    if endpoints:
+        response_cache.invalidate(*endpoints)
+
+# With the DB, every worker shares the data_versions table: a write in one worker
+# moves the ETags of all of them and drops their cached responses within
+# STAMP_REFRESH seconds. Without it ETags are per process (single worker only).
+version_store = None
+if DB_AVAILABLE and hasattr(DB, "bump_data_versions") and hasattr(DB, "get_data_versions"):
+    version_store = SimpleNamespace(bump=DB.bump_data_versions, load=DB.get_data_versions)
+data_version = DataVersion(DATASET_ENDPOINTS, store=version_store, on_change=drop_cached)
+
+def data_changed(*datasets):
+    """Record a write to `datasets`: new ETags, and drop the cached responses built from them."""
+    data_version.bump(*datasets)
+    drop_cached(datasets)
+
+def fund_returns_changed(*codes):
+    """
+    Record fresh returns stored for a few funds by the returns endpoints: new
+    ETags, but only those funds' cached /api/periodic_returns responses are
+    dropped. The aggregates (top_performers, returns_summary) catch up within
+    their TTL instead of being rebuilt after every single-fund compute.
+    """
+    data_version.bump("fund_returns")
+    response_cache.invalidate("periodic_returns", where={"code": codes})
+
 # --------------------------------------------------------------------
 # Load master dataset once at startup (CSV fallback)
 # --------------------------------------------------------------------
@@ -99,18 +212,18 @@ if DB_AVAILABLE and hasattr(DB, "upsert_metadata") and hasattr(DB, "count_metada
     try:
         current_count = DB.count_metadata()
         if current_count == 0:
-            recs = []
-            for _, row in schemes_df.iterrows():
-                recs.append({
-                    "scheme_code": row.get("schemeCode"),
-                    "scheme_name": row.get("schemeName"),
-                    "amc": row.get("AMC"),
-                    "category": row.get("schemeCategory"),
-                    "subcategory": row.get("schemeSubCategory"),
-                    "plan": row.get("Plan"),
-                    "option": row.get("Option"),
-                    "type": row.get("instrumentType")
-                })
+            # One COPY + merge for the whole CSV
+            recs = schemes_df.rename(columns={
+                "schemeCode": "scheme_code",
+                "schemeName": "scheme_name",
+                "AMC": "amc",
+                "schemeCategory": "category",
+                "schemeSubCategory": "subcategory",
+                "Plan": "plan",
+                "Option": "option",
+                "instrumentType": "type"
+            })[["scheme_code", "scheme_name", "amc", "category", "subcategory", "plan", "option", "type"]] \
+                .to_dict("records")
             if recs:
                 DB.upsert_metadata(recs)
                 print(f"[periodic_api] metadata initialized in DB (count={len(recs)})")
@@ -140,10 +253,62 @@ def norm_list(vals):
     """Normalize to lowercase, strip spaces, and filter empties."""
     return [v.strip().lower() for v in vals if isinstance(v, str) and v.strip()]
 
+def scheme_meta(code):
+    """type / plan / option of a scheme from the CSV, as stored alongside its returns."""
+    row = schemes_df[schemes_df["schemeCode"].astype(str) == str(code)]
+    if row.empty:
+        return {}
+    return {
+        "type": row.iloc[0]["instrumentType"],
+        "plan": row.iloc[0].get("Plan"),
+        "option": row.iloc[0].get("Option")
+    }
+
+def normalise_row(r):
+    """Normalise a scheme row (DB row dict, CSV record or pandas Series) into frontend shape."""
+    def get_field(keys, default=""):
+        for k in keys:
+            if isinstance(r, dict):
+                if k in r and r[k] is not None:
+                    return r[k]
+            else:
+                # pandas Series
+                if k in r.index and pd.notna(r[k]):
+                    return r[k]
+        return default
+
+    scheme_code = str(get_field(["schemeCode", "scheme_code", "scheme_code".lower()], "")).strip()
+    scheme_name = str(get_field(["schemeName", "scheme_name", "scheme_name".lower()], "")).strip()
+    amc = str(get_field(["AMC", "amc"], "")).strip()
+    category = str(get_field(["schemeCategory", "category"], "")).strip()
+    subcategory = str(get_field(["schemeSubCategory", "subcategory"], "")).strip()
+    plan = str(get_field(["Plan", "plan"], "")).strip()
+    option = str(get_field(["Option", "option"], "")).strip()
+
+    label = scheme_name or scheme_code
+    if amc:
+        label = f"{label} ({amc})"
+
+    return {
+        "value": scheme_code,
+        "label": label,
+        "schemeCode": scheme_code,
+        "schemeName": scheme_name,
+        "amc": amc,
+        "category": category,
+        "subcategory": subcategory,
+        "plan": plan,
+        "option": option
+    }
+
+# Filter/search/facet index over schemes_df (see scheme_index.py)
+scheme_index = SchemeIndex(schemes_df, normalise_row)
+
 # --------------------------------------------------------------------
 # Endpoint: /api/schemes (uses DB if available, else CSV)
 # --------------------------------------------------------------------
 @app.route("/api/schemes", methods=["GET"])
+@data_version.conditional(["schemes"])
 def get_scheme_list():
     try:
         q = request.args.get("q", "").lower().strip()
@@ -168,44 +333,6 @@ def get_scheme_list():
         if selected_type and selected_type.lower() != "both":
             filters["type"] = selected_type
 
-        # Helper to normalise a row (DB row or CSV row) into frontend shape
-        def normalise_row(r):
-            # r can be a dict (DB RealDictRow) or a pandas Series (CSV)
-            def get_field(keys, default=""):
-                for k in keys:
-                    if isinstance(r, dict):
-                        if k in r and r[k] is not None:
-                            return r[k]
-                    else:
-                        # pandas Series
-                        if k in r.index and pd.notna(r[k]):
-                            return r[k]
-                return default
-
-            scheme_code = str(get_field(["schemeCode", "scheme_code", "scheme_code".lower()], "")).strip()
-            scheme_name = str(get_field(["schemeName", "scheme_name", "scheme_name".lower()], "")).strip()
-            amc = str(get_field(["AMC", "amc"], "")).strip()
-            category = str(get_field(["schemeCategory", "category"], "")).strip()
-            subcategory = str(get_field(["schemeSubCategory", "subcategory"], "")).strip()
-            plan = str(get_field(["Plan", "plan"], "")).strip()
-            option = str(get_field(["Option", "option"], "")).strip()
-
-            label = scheme_name or scheme_code
-            if amc:
-                label = f"{label} ({amc})"
-
-            return {
-                "value": scheme_code,
-                "label": label,
-                "schemeCode": scheme_code,
-                "schemeName": scheme_name,
-                "amc": amc,
-                "category": category,
-                "subcategory": subcategory,
-                "plan": plan,
-                "option": option
-            }
-
         # If DB provides filtered fetch, prefer it
         if DB_AVAILABLE and hasattr(DB, "get_schemes_from_db"):
             try:
@@ -220,46 +347,10 @@ def get_scheme_list():
             except Exception as e:
                 print("[/api/schemes] DB get_schemes_from_db failed, falling back to CSV:", e)
 
-        # CSV fallback
-        df = schemes_df.copy()
-
-        # Type filter
-        if selected_type.lower() != "both":
-            df = df[df["instrumentType"].str.lower().str.strip() == selected_type.lower().strip()]
-
-        # safe_filter helper for CSV
-        def safe_filter(df_local, column, values):
-            if not values or column not in df_local.columns:
-                return df_local
-            norm_col = column + "_norm"
-            if norm_col not in df_local.columns:
-                df_local[norm_col] = df_local[column].astype(str).str.strip().str.lower()
-            vals = [v.lower().strip() for v in values if v]
-            return df_local[df_local[norm_col].apply(lambda x: any(v in x for v in vals))]
-
-        df = safe_filter(df, "AMC", filters["amc"])
-        df = safe_filter(df, "schemeCategory", filters["category"])
-        df = safe_filter(df, "schemeSubCategory", filters["subcategory"])
-        df = safe_filter(df, "Plan", filters["plan"])
-        df = safe_filter(df, "Option", filters["option"])
-
-        # Search q across CSV columns
-        if q:
-            q = q.lower()
-            df = df[
-                df["schemeName"].str.lower().str.contains(q, na=False)
-                | df["AMC"].str.lower().str.contains(q, na=False)
-                | df["schemeCategory"].str.lower().str.contains(q, na=False)
-                | df["schemeSubCategory"].str.lower().str.contains(q, na=False)
-                ]
-
-        # Drop duplicates and normalize rows
-        df = df.drop_duplicates(subset=["schemeCode"]).fillna("")
-        out = []
-        for _, row in df.iterrows():
-            out.append(normalise_row(row))
-
-        return jsonify(out)
+        # CSV fallback: bitset intersection over the prebuilt index, pre-serialized rows
+        mask = scheme_index.match(selected_type, {k: v for k, v in filters.items() if k != "type"}, q)
+        return app.response_class(scheme_index.to_json(scheme_index.rows_for(mask)),
+                                  mimetype="application/json")
 
     except Exception as e:
         print("❌ Error in /api/schemes:", str(e))
@@ -267,10 +358,41 @@ def get_scheme_list():
         return jsonify({"error": str(e)}), 500
 
 
+# --------------------------------------------------------------------
+# Filter stats from the CSV (shared by /api/stats and /api/precache_filters)
+# --------------------------------------------------------------------
+def compute_filter_stats(type_param, plan_param=None, option_param=None):
+    df = schemes_df.copy()
+    if type_param.lower() == "etf":
+        df = df[df["instrumentType"].str.lower() == "etf"]
+        df = df[df["Option_norm"] == "etf"]
+    else:
+        df = df[df["instrumentType"].str.lower() == "mutual fund"]
+
+    if plan_param and type_param.lower() != "etf":
+        df = df[df["Plan_norm"] == plan_param.lower()]
+    if option_param:
+        df = df[df["Option_norm"] == option_param.lower()]
+
+    stats = {
+        "total": len(df),
+        "mutual_funds": int((df["instrumentType"] == "Mutual Fund").sum()),
+        "etfs": int((df["instrumentType"] == "ETF").sum()),
+        "amcs": sorted(df["AMC"].dropna().unique().tolist()),
+        "categories": sorted(df["schemeCategory"].dropna().unique().tolist()),
+        "subcategories": sorted(df["schemeSubCategory"].dropna().unique().tolist()),
+        "plans": sorted(df["Plan"].dropna().unique().tolist()),
+        "options": sorted(df["Option"].dropna().unique().tolist()),
+        "source": "fresh"
+    }
+    return stats
+
 # --------------------------------------------------------------------
 # Endpoint: /api/stats (dropdown values) — DB-cached if possible
 # --------------------------------------------------------------------
 @app.route("/api/stats", methods=["GET"])
+@data_version.conditional(["schemes", "filters"])
+@response_cache.cached("stats", CACHE_TTL["stats"])
 def get_stats():
     try:
         type_param = request.args.get("type", "Mutual Fund")
@@ -299,29 +421,7 @@ def get_stats():
                 print("[/api/stats] get_filter_cache failed, will compute fresh:", e)
 
         # Compute from CSV (existing logic)
-        df = schemes_df.copy()
-        if type_param.lower() == "etf":
-            df = df[df["instrumentType"].str.lower() == "etf"]
-            df = df[df["Option_norm"] == "etf"]
-        else:
-            df = df[df["instrumentType"].str.lower() == "mutual fund"]
-
-        if plan_param and type_param.lower() != "etf":
-            df = df[df["Plan_norm"] == plan_param.lower()]
-        if option_param:
-            df = df[df["Option_norm"] == option_param.lower()]
-
-        stats = {
-            "total": len(df),
-            "mutual_funds": int((df["instrumentType"] == "Mutual Fund").sum()),
-            "etfs": int((df["instrumentType"] == "ETF").sum()),
-            "amcs": sorted(df["AMC"].dropna().unique().tolist()),
-            "categories": sorted(df["schemeCategory"].dropna().unique().tolist()),
-            "subcategories": sorted(df["schemeSubCategory"].dropna().unique().tolist()),
-            "plans": sorted(df["Plan"].dropna().unique().tolist()),
-            "options": sorted(df["Option"].dropna().unique().tolist()),
-            "source": "fresh"
-        }
+        stats = compute_filter_stats(type_param, plan_param, option_param)
 
         # Upsert into DB filter cache if helper exists
         if DB_AVAILABLE and hasattr(DB, "upsert_filter_cache"):
@@ -347,90 +447,39 @@ def get_dependent_filters():
     """
     Returns dependent dropdown values based on selected filters:
     type (Mutual Fund / ETF), plan, amc, category, subcategory, option.
-    Uses database metadata first, falls back to CSV if unavailable.
+    Each list holds the values still available given the *other* selected
+    filters; "counts" gives the number of schemes behind every value.
+    Served from the facet bitsets of scheme_index (memoized per filter set).
     """
     try:
         selected_type = request.args.get("type", "Mutual Fund")
 
         # Parse filters
-        plan_filter = norm_list(parse_multi_param("plan"))
-        amc_filter = norm_list(parse_multi_param("amc"))
-        cat_filter = norm_list(parse_multi_param("category"))
-        subcat_filter = norm_list(parse_multi_param("subcategory"))
-        option_filter = norm_list(parse_multi_param("option"))
-
         filters = {
-            "plan": plan_filter,
-            "amc": amc_filter,
-            "category": cat_filter,
-            "subcategory": subcat_filter,
-            "option": option_filter
+            "plan": norm_list(parse_multi_param("plan")),
+            "amc": norm_list(parse_multi_param("amc")),
+            "category": norm_list(parse_multi_param("category")),
+            "subcategory": norm_list(parse_multi_param("subcategory")),
+            "option": norm_list(parse_multi_param("option"))
         }
 
-        # Ensure DB path respects selected type
-        if selected_type and selected_type.lower() != "both":
-            filters["type"] = selected_type
-
-        df = None
-
-        # ✅ Prefer DB if available
-        if DB_AVAILABLE and hasattr(DB, "get_schemes_from_db"):
-            try:
-                rows = DB.get_schemes_from_db(filters)
-                df = pd.DataFrame(rows)
-                if not df.empty:
-                    print(f"[/api/dependent_filters] Using DB metadata — {len(df)} records")
-                    # Apply type filter defensively if column present
-                    if "type" in df.columns and selected_type and selected_type.lower() != "both":
-                        df = df[df["type"].astype(str).str.lower() == selected_type.lower()]
-            except Exception as e:
-                print(f"[/api/dependent_filters] DB metadata fetch failed: {e}")
-
-        # ❌ Fallback to CSV if DB unavailable or empty
-        if df is None or df.empty:
-            df = schemes_df.copy()
-            print("[/api/dependent_filters] Using CSV fallback")
-
-            # Apply type filter (Mutual Fund / ETF)
-            if selected_type.lower() == "etf":
-                df = df[df["instrumentType"].str.lower() == "etf"]
-            else:
-                df = df[df["instrumentType"].str.lower() == "mutual fund"]
-
-            # Normalize + filter helper (same as before)
-            def safe_filter(df_local, column, values):
-                if not values or column not in df_local.columns:
-                    return df_local
-                norm_col = column + "_norm"
-                if norm_col not in df_local.columns:
-                    df_local[norm_col] = df_local[column].astype(str).str.strip().str.lower()
-                vals = [v.lower().strip() for v in values if v]
-                return df_local[df_local[norm_col].apply(lambda x: any(v in x for v in vals))]
-
-            df = safe_filter(df, "Plan", plan_filter)
-            df = safe_filter(df, "AMC", amc_filter)
-            df = safe_filter(df, "schemeCategory", cat_filter)
-            df = safe_filter(df, "schemeSubCategory", subcat_filter)
-            df = safe_filter(df, "Option", option_filter)
-
-        # ✅ Build dependent dropdown lists dynamically
-        amcs = sorted(df["amc"].dropna().unique().tolist()) if "amc" in df.columns else \
-            sorted(df["AMC"].dropna().unique().tolist()) if "AMC" in df.columns else []
-        categories = sorted(df["category"].dropna().unique().tolist()) if "category" in df.columns else \
-            sorted(df["schemeCategory"].dropna().unique().tolist()) if "schemeCategory" in df.columns else []
-        subcategories = sorted(df["subcategory"].dropna().unique().tolist()) if "subcategory" in df.columns else \
-            sorted(df["schemeSubCategory"].dropna().unique().tolist()) if "schemeSubCategory" in df.columns else []
-        options = sorted(df["option"].dropna().unique().tolist()) if "option" in df.columns else \
-            sorted(df["Option"].dropna().unique().tolist()) if "Option" in df.columns else []
-        plans = sorted(df["plan"].dropna().unique().tolist()) if "plan" in df.columns else \
-            sorted(df["Plan"].dropna().unique().tolist()) if "Plan" in df.columns else []
+        # Mutual Fund / ETF (anything other than ETF means Mutual Fund)
+        facet_type = "ETF" if selected_type.lower() == "etf" else "Mutual Fund"
+        facets = scheme_index.facets(facet_type, filters)
 
         return jsonify({
-            "amcs": amcs,
-            "categories": categories,
-            "subcategories": subcategories,
-            "options": options,
-            "plans": plans
+            "amcs": list(facets["amc"]),
+            "categories": list(facets["category"]),
+            "subcategories": list(facets["subcategory"]),
+            "options": list(facets["option"]),
+            "plans": list(facets["plan"]),
+            "counts": {
+                "amcs": facets["amc"],
+                "categories": facets["category"],
+                "subcategories": facets["subcategory"],
+                "options": facets["option"],
+                "plans": facets["plan"]
+            }
         })
 
     except Exception as e:
@@ -449,6 +498,8 @@ def get_dependent_filters():
 # Endpoint: /api/periodic_returns (DB cached with compute fallback)
 # --------------------------------------------------------------------
 @app.route("/api/periodic_returns", methods=["GET"])
+@data_version.conditional(["returns", "fund_returns"])
+@response_cache.cached("periodic_returns", CACHE_TTL["periodic_returns"])
 def get_periodic_returns_api():
     try:
         amfi_code = request.args.get("code")
@@ -522,6 +573,7 @@ def get_periodic_returns_api():
                     pass
 
                 DB.upsert_fund_results_json(amfi_code, scheme_name, results, meta=meta)
+                fund_returns_changed(amfi_code)
             except Exception as e:
                 print("[/api/periodic_returns] Warning: DB upsert failed:", e)
 
@@ -538,10 +590,129 @@ def get_periodic_returns_api():
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+# --------------------------------------------------------------------
+# Endpoint: /api/periodic_returns_batch - many codes in one call (compare/portfolio views)
+# --------------------------------------------------------------------
+BATCH_MAX_CODES = 50
+BATCH_COMPUTE_WORKERS = 4
+
+def compute_fresh_returns(code):
+    """(scheme_name, results) computed from a fresh NAV fetch."""
+    nav_df, scheme_name = fetch_nav_history(code)
+    if nav_df is None or nav_df.empty:
+        raise ValueError("Invalid or no NAV data found")
+    return scheme_name, calculate_periodic_returns(nav_df)
+
+def batch_codes():
+    """Requested codes of a batch call: stripped, de-duplicated, in request order."""
+    codes = parse_multi_param("codes") + parse_multi_param("code")
+    if request.method == "POST":
+        body = request.get_json(silent=True) or {}
+        codes += [str(c).strip() for c in body.get("codes") or []]
+    return list(dict.fromkeys(c for c in codes if c))
+
+def batch_etag_key():
+    return ",".join(batch_codes()) + "|" + (request.args.get("format") or "json")
+
+@app.route("/api/periodic_returns_batch", methods=["GET", "POST"])
+@data_version.conditional(["returns", "fund_returns"], key=batch_etag_key)
+def get_periodic_returns_batch():
+    """
+    Periodic returns for many schemes: cached results come from one
+    `scheme_code = ANY(...)` query, the rest are computed concurrently
+    (BATCH_COMPUTE_WORKERS at a time) and stored with one bulk upsert.
+
+    Query params / JSON body:
+      - codes: comma-separated or repeated (or {"codes": [...]} in a POST body),
+        at most BATCH_MAX_CODES
+      - format=ndjson: stream one JSON line per scheme as it becomes ready
+        (cached schemes first) instead of a single payload in request order
+
+    GET responses carry an ETag over the returns data version and the code
+    list; POST responses are not validated.
+    """
+    try:
+        codes = batch_codes()
+        if not codes:
+            return jsonify({"error": "Missing 'codes' param"}), 400
+        if len(codes) > BATCH_MAX_CODES:
+            return jsonify({"error": f"At most {BATCH_MAX_CODES} codes per request"}), 400
+
+        # 1) Every cached result in one round-trip
+        entries = {}
+        if DB_AVAILABLE and hasattr(DB, "get_precomputed_returns_many"):
+            try:
+                for row in DB.get_precomputed_returns_many(codes):
+                    if row.get("results_json"):
+                        entries[str(row["scheme_code"])] = {
+                            "code": str(row["scheme_code"]),
+                            "scheme_name": row.get("scheme_name"),
+                            "results": row["results_json"],
+                            "source": "cache",
+                            "updated_at": row.get("updated_at")
+                        }
+            except Exception as e:
+                print("[/api/periodic_returns_batch] DB read failed (computing all):", e)
+        missing = [c for c in codes if c not in entries]
+
+        # 2) Compute the rest concurrently; yields entries as they finish
+        def compute_missing():
+            if not missing:
+                return
+            fresh = []
+            with ThreadPoolExecutor(max_workers=min(BATCH_COMPUTE_WORKERS, len(missing))) as pool:
+                futures = {pool.submit(compute_fresh_returns, code): code for code in missing}
+                for future in as_completed(futures):
+                    code = futures[future]
+                    try:
+                        scheme_name, results = future.result()
+                    except Exception as e:
+                        print(f"[/api/periodic_returns_batch] compute failed for {code}: {e}")
+                        yield {"code": code, "error": str(e)}
+                        continue
+                    fresh.append((code, scheme_name, results, scheme_meta(code)))
+                    yield {
+                        "code": code,
+                        "scheme_name": scheme_name,
+                        "results": results,
+                        "source": "fresh",
+                        "computed_at": datetime.now(timezone.utc).isoformat()
+                    }
+
+            # 3) Store everything computed with one bulk write
+            if fresh and DB_AVAILABLE and hasattr(DB, "upsert_fund_results_many"):
+                try:
+                    DB.upsert_fund_results_many(fresh)
+                    fund_returns_changed(*(code for code, _, _, _ in fresh))
+                except Exception as e:
+                    print("[/api/periodic_returns_batch] Warning: DB upsert failed:", e)
+
+        if request.args.get("format") == "ndjson":
+            def stream():
+                for entry in list(entries.values()):
+                    yield app.json.dumps(entry) + "\n"
+                for entry in compute_missing():
+                    yield app.json.dumps(entry) + "\n"
+            return app.response_class(stream(), mimetype="application/x-ndjson")
+
+        for entry in compute_missing():
+            entries[entry["code"]] = entry
+        return jsonify({
+            "count": len(codes),
+            "cached": len(codes) - len(missing),
+            "results": [entries[c] for c in codes]
+        })
+
+    except Exception as e:
+        print("❌ Error in /api/periodic_returns_batch:", str(e))
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
 # --------------------------------------------------------------------
 # Endpoint: /api/returns_summary - return a page-friendly sample of cached returns
 # --------------------------------------------------------------------
 @app.route("/api/returns_summary", methods=["GET"])
+@response_cache.cached("returns_summary", CACHE_TTL["returns_summary"])
 def returns_summary():
     try:
         limit = int(request.args.get("limit", 200))
@@ -584,6 +755,7 @@ def returns_summary():
 # Endpoint: /api/top_performers - return top N funds for each category
 # --------------------------------------------------------------------
 @app.route("/api/top_performers", methods=["GET"])
+@response_cache.cached("top_performers", CACHE_TTL["top_performers"])
 def top_performers():
     try:
         investment_type = request.args.get("type", "Mutual Fund")
@@ -632,6 +804,146 @@ def top_performers():
         return jsonify({"error": str(e)}), 500
 
 
+# --------------------------------------------------------------------
+# Endpoint: /api/fund_rank - a fund's precomputed rank within its category peers
+# --------------------------------------------------------------------
+@app.route("/api/fund_rank", methods=["GET"])
+def fund_rank():
+    try:
+        amfi_code = request.args.get("code")
+        if not amfi_code:
+            return jsonify({"error": "Missing 'code' param"}), 400
+        if not (DB_AVAILABLE and hasattr(DB, "get_fund_rankings")):
+            return jsonify({"error": "Database not ready"}), 500
+
+        rankings = {}
+        for row in DB.get_fund_rankings(str(amfi_code)):
+            rankings[row["period"]] = {
+                "category": row["category"],
+                "return": row["return_value"],
+                "rank": row["rank"],
+                "peer_count": row["peer_count"],
+                "percentile": row["percentile"],
+                "quartile": row["quartile"]
+            }
+        if not rankings:
+            return jsonify({"error": "No rankings for this scheme"}), 404
+
+        return jsonify({"scheme_code": str(amfi_code), "rankings": rankings})
+
+    except Exception as e:
+        print("❌ Error in /api/fund_rank:", str(e))
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+# --------------------------------------------------------------------
+# Endpoint: /api/similar_funds - most correlated funds from the precomputed matrices
+# --------------------------------------------------------------------
+@app.route("/api/similar_funds", methods=["GET"])
+def similar_funds():
+    global correlation_index, correlation_names
+    try:
+        amfi_code = request.args.get("code")
+        if not amfi_code:
+            return jsonify({"error": "Missing 'code' param"}), 400
+        if not CORRELATION_AVAILABLE:
+            return jsonify({"error": "Correlation data not available"}), 500
+
+        # Matrices are memory-mapped (and names indexed) once per process, and
+        # re-mapped when scripts/correlation.py has rebuilt them
+        if correlation_index is None:
+            correlation_index = CorrelationIndex(CORRELATION_DIR)
+            correlation_names = dict(zip(schemes_df["schemeCode"].astype(str), schemes_df["schemeName"]))
+        else:
+            correlation_index.refresh()
+        if amfi_code not in correlation_index:
+            return jsonify({"error": "No correlation data for this scheme"}), 404
+
+        k = min(int(request.args.get("k", 10)), 50)
+        similar = [
+            {"scheme_code": code, "scheme_name": correlation_names.get(code), "correlation": corr}
+            for code, corr in correlation_index.most_similar(amfi_code, k)
+        ]
+        return jsonify({"scheme_code": amfi_code, "similar": similar})
+
+    except Exception as e:
+        print("❌ Error in /api/similar_funds:", str(e))
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
+# --------------------------------------------------------------------
+# Background precompute job helpers (used by /api/precompute_all?mode=background)
+# --------------------------------------------------------------------
+def fetch_navs_async(codes):
+    """(code, nav_df, scheme_name) for every code the async fetcher could download."""
+    by_str = {str(code): code for code in codes}
+    for result in iter_nav_payloads([(c, None) for c in by_str]):
+        data = result.data or {}
+        if data.get("data"):
+            yield by_str[result.code], parse_nav_payload(data).set_index("date"), data.get("meta", {}).get("scheme_name")
+
+def get_job_db():
+    """
+    Connection used only by the precompute job thread. Request threads keep DB,
+    so their commits, rollbacks and reconnects never land inside a job's
+    COPY + merge transaction.
+    """
+    global job_db
+    if job_db is None:
+        job_db = Database()
+    return job_db
+
+def write_job_results(rows):
+    """Persist one batch of (code, scheme_name, results) rows from a precompute job."""
+    if not (DB_AVAILABLE and hasattr(DB, "upsert_fund_results_many")):
+        return
+    db = get_job_db()
+    db.ensure_connection_alive()
+    db.upsert_fund_results_many([(code, name, results, scheme_meta(code)) for code, name, results in rows])
+    data_changed("returns")
+
+def get_precompute_runner():
+    global precompute_runner
+    if precompute_runner is None:
+        precompute_runner = PrecomputeRunner(
+            fetch_one=fetch_nav_history,
+            compute_one=calculate_periodic_returns,
+            write_many=write_job_results,
+            fetch_many=fetch_navs_async if ASYNC_FETCHER_AVAILABLE else None,
+            compute_batch=calculate_returns_batch if BATCH_ENGINE_AVAILABLE else None,
+        )
+    return precompute_runner
+
+def refresh_rankings_after_job(job):
+    if DB_AVAILABLE and hasattr(DB, "refresh_rankings"):
+        try:
+            db = get_job_db()
+            db.ensure_connection_alive()
+            db.refresh_rankings()
+            data_changed("rankings")
+        except Exception as e:
+            print(f"💾 [DB] rankings refresh failed after job {job.id}: {e}")
+
+def start_precompute_job():
+    """Queue a background job for codes[start:start+limit] (default: the whole universe)."""
+    codes = schemes_df["schemeCode"].dropna().unique().tolist()
+    start_index = int(request.args.get("start", 0))
+    limit = request.args.get("limit")
+    job_codes = codes[start_index:start_index + int(limit)] if limit else codes[start_index:]
+
+    # Ranks only make sense once every fund has fresh returns
+    full_run = start_index == 0 and len(job_codes) == len(codes)
+    job, started = get_precompute_runner().submit(
+        job_codes, on_complete=refresh_rankings_after_job if full_run else None)
+    if not started:
+        return jsonify({"error": "A precompute job is already running", **job.to_dict()}), 409
+
+    return jsonify({
+        "message": "Precompute job started",
+        "status_url": f"/api/precompute_status?job={job.id}",
+        **job.to_dict()
+    }), 202
 
 # --------------------------------------------------------------------
 # Admin Endpoint: /api/precompute_all - compute & cache returns for all schemes in CSV (POST)
@@ -646,12 +958,17 @@ def precompute_all():
     Query params:
       - start: starting index (default 0)
       - batch: number of schemes to process (default 100)
+      - mode=background: start a background job over codes[start:] (or
+        codes[start:start+limit]) and return 202 with its job id at once
     """
 
     import time, gc, requests, traceback
     from datetime import datetime
 
     try:
+        if request.args.get("mode") == "background":
+            return start_precompute_job()
+
         start_index = int(request.args.get("start", 0))
         batch_size = min(int(request.args.get("batch", 100)), 10)
         end_index = start_index + batch_size
@@ -673,16 +990,29 @@ def precompute_all():
             sub_codes = batch_codes[sub_start:sub_start + mini_batch]
             print(f"➡️  Processing sub-batch {sub_start} → {sub_start + len(sub_codes)} ...")
 
-            for code in sub_codes:
+            # 1) Fetch NAVs for the sub-batch — concurrently via the async fetcher when
+            #    available; anything it could not fetch goes through the sequential retry loop
+            fetched = {}
+            if ASYNC_FETCHER_AVAILABLE:
+                by_str = {str(code): code for code in sub_codes}
                 try:
-                    scheme_name, results = None, None
+                    for result in iter_nav_payloads([(c, None) for c in by_str]):
+                        data = result.data or {}
+                        if data.get("data"):
+                            nav_df = parse_nav_payload(data).set_index("date")
+                            fetched[by_str[result.code]] = (nav_df, data.get("meta", {}).get("scheme_name"))
+                        else:
+                            print(f"⚠️ [{result.code}] async fetch failed after {result.attempts} attempts: {result.error}")
+                except Exception as e:
+                    print(f"⚠️ [precompute_all] async fetcher failed, falling back to sequential: {e}")
 
-                    # Retry NAV fetch up to 3 times
+            for code in [c for c in sub_codes if c not in fetched]:
+                try:
                     for attempt in range(3):
                         try:
                             nav_df, scheme_name = fetch_nav_history(code, session=session)
                             if nav_df is not None and not nav_df.empty:
-                                results = calculate_periodic_returns(nav_df)
+                                fetched[code] = (nav_df, scheme_name)
                                 break
                             else:
                                 wait_time = 2 * (attempt + 1)
@@ -697,53 +1027,8 @@ def precompute_all():
                             print(f"⚠️ [{code}] fetch attempt {attempt+1} failed: {e}")
                             time.sleep(wait_time)
 
-                    if results is None:
+                    if code not in fetched:
                         failed.append({"code": code, "reason": "no NAV after retries"})
-                        continue
-
-                    # --- Save to DB safely ---
-                    if DB_AVAILABLE and hasattr(DB, "upsert_fund_results_json"):
-                        try:
-                            # reconnect if helper available
-                            if hasattr(DB, "ensure_connection_alive"):
-                                DB.ensure_connection_alive()
-
-                            row = schemes_df[schemes_df["schemeCode"] == code]
-                            meta = {}
-                            if not row.empty:
-                                meta = {
-                                    "type": row.iloc[0]["instrumentType"],
-                                    "plan": row.iloc[0].get("Plan"),
-                                    "option": row.iloc[0].get("Option")
-                                }
-
-                            DB.upsert_fund_results_json(code, scheme_name, results, meta=meta)
-
-                        except Exception as e:
-                            if "closed" in str(e).lower():
-                                print(f"🔁 [DB] reconnecting after closed connection for {code}")
-                                try:
-                                    import psycopg2
-                                    from psycopg2.extras import RealDictCursor
-                                    DB.conn = psycopg2.connect(DB.DATABASE_URL, sslmode="require")
-                                    DB.cursor = DB.conn.cursor(cursor_factory=RealDictCursor)
-                                    DB.upsert_fund_results_json(code, scheme_name, results, meta=meta)
-                                except Exception as inner:
-                                    print(f"💾 [DB] re-upsert failed for {code}: {inner}")
-                                    failed.append({"code": code, "error": str(inner)})
-                            else:
-                                print(f"💾 [DB] upsert failed for {code}: {e}")
-                                failed.append({"code": code, "error": str(e)})
-
-                    processed += 1
-
-                    # Log periodically
-                    if processed % 25 == 0:
-                        print(f"✅ [{datetime.now().strftime('%H:%M:%S')}] Processed {processed} schemes...")
-
-                    # Free memory
-                    del nav_df, results
-                    gc.collect()
                     time.sleep(0.3)
 
                 except Exception as e:
@@ -751,12 +1036,72 @@ def precompute_all():
                     failed.append({"code": code, "error": str(e)})
                     time.sleep(0.5)
 
+            # 2) Compute returns — whole sub-batch at once when the batch engine is available
+            computed = {}
+            if BATCH_ENGINE_AVAILABLE and fetched:
+                try:
+                    computed = calculate_returns_batch({code: nav_df for code, (nav_df, _) in fetched.items()})
+                except Exception as e:
+                    print(f"⚠️ [precompute_all] batch engine failed, computing per scheme: {e}")
+                    computed = {}
+            for code, (nav_df, _) in fetched.items():
+                if code not in computed:
+                    try:
+                        computed[code] = calculate_periodic_returns(nav_df)
+                    except Exception as e:
+                        print(f"❌ [precompute_all] failed for {code}: {e}")
+                        failed.append({"code": code, "error": str(e)})
+
+            # 3) Save the sub-batch to DB in one bulk upsert
+            rows = [(code, scheme_name, computed[code], scheme_meta(code))
+                    for code, (nav_df, scheme_name) in fetched.items() if computed.get(code) is not None]
+
+            if rows and DB_AVAILABLE and hasattr(DB, "upsert_fund_results_many"):
+                try:
+                    # reconnect if helper available
+                    if hasattr(DB, "ensure_connection_alive"):
+                        DB.ensure_connection_alive()
+                    DB.upsert_fund_results_many(rows)
+
+                except Exception as e:
+                    if "closed" in str(e).lower():
+                        print(f"🔁 [DB] reconnecting after closed connection for sub-batch {sub_start}")
+                        try:
+                            DB.connect()
+                            DB.upsert_fund_results_many(rows)
+                        except Exception as inner:
+                            print(f"💾 [DB] re-upsert failed for sub-batch {sub_start}: {inner}")
+                            failed.extend({"code": code, "error": str(inner)} for code, *_ in rows)
+                    else:
+                        print(f"💾 [DB] bulk upsert failed for sub-batch {sub_start}: {e}")
+                        failed.extend({"code": code, "error": str(e)} for code, *_ in rows)
+
+            processed += len(rows)
+            print(f"✅ [{datetime.now().strftime('%H:%M:%S')}] Processed {processed} schemes...")
+
+            # Free memory
+            del fetched, computed
+            gc.collect()
+
             # Cooldown between sub-batches
             print(f"⏸ Cooling 4s after sub-batch...")
             time.sleep(4)
             gc.collect()
 
+        # Cached returns/top performers are stale once this batch is written
+        if processed:
+            data_changed("returns")
+
         next_start = end_index if end_index < total_schemes else None
+
+        # Last batch: re-rank every fund against its category peers
+        if next_start is None and DB_AVAILABLE and hasattr(DB, "refresh_rankings"):
+            try:
+                DB.refresh_rankings()
+                data_changed("rankings")
+            except Exception as e:
+                print(f"💾 [DB] rankings refresh failed: {e}")
+
         print(f"🏁 [{datetime.now().strftime('%H:%M:%S')}] Batch done — processed={processed}, failed={len(failed)}")
 
         return jsonify({
@@ -774,6 +1119,33 @@ def precompute_all():
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+# --------------------------------------------------------------------
+# Admin Endpoint: /api/precompute_status - progress of a background precompute job
+# --------------------------------------------------------------------
+@app.route("/api/precompute_status", methods=["GET"])
+def precompute_status():
+    runner = get_precompute_runner()
+    job_id = request.args.get("job")
+    job = runner.get(job_id) if job_id else runner.latest()
+    if job is None:
+        return jsonify({"error": "No such precompute job"}), 404
+    return jsonify(job.to_dict())
+
+# --------------------------------------------------------------------
+# Admin Endpoint: /api/precompute_cancel - stop a background job after its current chunk
+# --------------------------------------------------------------------
+@app.route("/api/precompute_cancel", methods=["POST"])
+def precompute_cancel():
+    runner = get_precompute_runner()
+    job_id = request.args.get("job")
+    job = runner.cancel(job_id) if job_id else runner.current()
+    if job is None:
+        return jsonify({"error": "No such precompute job"}), 404
+    if job_id is None:
+        runner.cancel(job.id)
+    return jsonify({"message": "Cancellation requested" if job.active else "Job already finished",
+                    **job.to_dict()})
+
 # --------------------------------------------------------------------
 # Admin Endpoint: /api/precache_filters - compute & store filter cache in DB
 # --------------------------------------------------------------------
@@ -782,18 +1154,43 @@ def precache_filters():
     try:
         if not (DB_AVAILABLE and hasattr(DB, "upsert_filter_cache")):
             return jsonify({"message": "DB filter cache helper not available"}), 400
-        # compute for both types
-        for t in ["Mutual Fund", "ETF"]:
-            # reuse get_stats logic: call endpoint function directly to get fresh data (non-cached)
-            with app.test_request_context(f"/api/stats?type={t}"):
-                resp = get_stats()
-                # get_stats already upserts to DB via upsert_filter_cache
+        # compute fresh for both types (get_stats would serve the existing cache) and store in one merge
+        caches = {t: compute_filter_stats(t) for t in ["Mutual Fund", "ETF"]}
+        if hasattr(DB, "upsert_filter_cache_many"):
+            DB.upsert_filter_cache_many(caches)
+        else:
+            for t, stats in caches.items():
+                DB.upsert_filter_cache(t, stats)
+        data_changed("filters")
         return jsonify({"message": "filter cache refreshed"})
     except Exception as e:
         print("❌ Error in /api/precache_filters:", e)
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+# --------------------------------------------------------------------
+# Admin Endpoint: /api/refresh_rankings - recompute category ranks from fund_returns
+# --------------------------------------------------------------------
+@app.route("/api/refresh_rankings", methods=["POST"])
+def refresh_rankings():
+    try:
+        if not (DB_AVAILABLE and hasattr(DB, "refresh_rankings")):
+            return jsonify({"message": "DB rankings helper not available"}), 400
+        count = DB.refresh_rankings()
+        data_changed("rankings")
+        return jsonify({"message": "rankings refreshed", "rows": count})
+    except Exception as e:
+        print("❌ Error in /api/refresh_rankings:", e)
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+# --------------------------------------------------------------------
+# Admin Endpoint: /api/cache_stats - response cache hit/miss/eviction counters
+# --------------------------------------------------------------------
+@app.route("/api/cache_stats", methods=["GET"])
+def cache_stats():
+    return jsonify(response_cache.stats())
+
 # --------------------------------------------------------------------
 # Root / Health Check
 # --------------------------------------------------------------------
@@ -806,10 +1203,18 @@ def home():
             "/api/schemes",
             "/api/dependent_filters",
             "/api/periodic_returns?code=<scheme_code>",
+            "/api/periodic_returns_batch?codes=<code>,<code>,...[&format=ndjson]",
             "/api/returns_summary",
             "/api/top_performers?type=<investment_type>",
+            "/api/fund_rank?code=<scheme_code>",
+            "/api/similar_funds?code=<scheme_code>&k=<count>",
             "/api/precompute_all (POST)",
-            "/api/precache_filters (POST)"
+            "/api/precompute_all?mode=background (POST)",
+            "/api/precompute_status?job=<job_id>",
+            "/api/precompute_cancel?job=<job_id> (POST)",
+            "/api/precache_filters (POST)",
+            "/api/refresh_rankings (POST)",
+            "/api/cache_stats"
         ]
     })
 
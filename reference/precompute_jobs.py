@@ -0,0 +1,300 @@
+"""
+precompute_jobs.py
+Background job runner for /api/precompute_all.
+
+- A job covers any list of scheme codes (by default the whole universe) and
+  runs in its own thread, outside the request cycle; the endpoint returns at once
+- NAVs are fetched with fetch_many (e.g. the async fetcher) when given; codes
+  it misses go through fetch_one with retries on a thread pool, so a backoff
+  sleep only holds up one worker
+- Returns are computed chunk by chunk on a ProcessPoolExecutor (batch engine
+  when given, per-scheme function otherwise) while the next chunk is fetched
+- Finished results are handed to write_many in batches of WRITE_BATCH rows
+- Job status and progress (fetched / computed / written / failed, rate, ETA)
+  are kept in memory for the status endpoint; one job runs at a time
+"""
+
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime
+
+FETCH_WORKERS = 8
+COMPUTE_WORKERS = min(4, os.cpu_count() or 1)
+CHUNK_SIZE = 100            # schemes per fetch round / compute task
+WRITE_BATCH = 500           # result rows per DB write
+FETCH_RETRIES = 3
+JOB_HISTORY = 20            # finished jobs kept for the status endpoint
+FAILED_SAMPLE = 20
+
+
+def _compute_chunk(compute_one, compute_batch, frames):
+    """
+    Worker: {code: nav_df} → ({code: results}, [failure dicts]).
+
+    Uses the batch engine when available and falls back to per-scheme
+    computation for anything it did not return.
+    """
+    computed, failed = {}, []
+    if compute_batch is not None:
+        try:
+            computed = compute_batch(frames)
+        except Exception as e:
+            print(f"⚠️ [precompute job] batch engine failed, computing per scheme: {e}")
+            computed = {}
+    for code, nav_df in frames.items():
+        if code in computed:
+            continue
+        try:
+            computed[code] = compute_one(nav_df)
+        except Exception as e:
+            failed.append({"code": code, "error": f"compute: {e}"})
+    return computed, failed
+
+
+class PrecomputeJob:
+    """State and progress counters of one precompute run."""
+
+    def __init__(self, codes, on_complete=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.codes = list(codes)
+        self.on_complete = on_complete
+        self.status = "queued"
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.fetched = 0
+        self.computed = 0
+        self.written = 0
+        self.failed = []
+        self.cancel_requested = threading.Event()
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, n in counts.items():
+                setattr(self, name, getattr(self, name) + n)
+
+    def fail(self, code, reason):
+        with self._lock:
+            self.failed.append({"code": code, "error": reason})
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def to_dict(self):
+        with self._lock:
+            total = len(self.codes)
+            done = self.written + len(self.failed)
+            end = self.finished_at or time.time()
+            elapsed = end - self.started_at if self.started_at else 0.0
+            rate = done / elapsed if elapsed > 0 else None
+            eta = (total - done) / rate if rate and self.active else None
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "total": total,
+                "fetched": self.fetched,
+                "computed": self.computed,
+                "written": self.written,
+                "failed_count": len(self.failed),
+                "failed_sample": self.failed[:FAILED_SAMPLE],
+                "progress_pct": round(100 * done / total, 2) if total else 100.0,
+                "schemes_per_sec": round(rate, 2) if rate else None,
+                "eta_seconds": round(eta) if eta is not None else None,
+                "elapsed_seconds": round(elapsed, 1),
+                "created_at": datetime.fromtimestamp(self.created_at).isoformat(timespec="seconds"),
+                "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds")
+                if self.started_at else None,
+                "finished_at": datetime.fromtimestamp(self.finished_at).isoformat(timespec="seconds")
+                if self.finished_at else None,
+                "error": self.error,
+            }
+
+
+class PrecomputeRunner:
+    """
+    Runs PrecomputeJobs in a background thread.
+
+    fetch_one(code) → (nav_df, scheme_name); may raise or return an empty frame.
+    fetch_many(codes) → iterable of (code, nav_df, scheme_name) for the codes it
+        could fetch (optional).
+    compute_one(nav_df) → results dict; compute_batch({code: nav_df}) → {code: results}
+        (optional). Both must be picklable module-level functions.
+    write_many([(code, scheme_name, results)]) persists one batch of rows.
+    """
+
+    def __init__(self, fetch_one, compute_one, write_many, fetch_many=None, compute_batch=None,
+                 fetch_workers=FETCH_WORKERS, compute_workers=COMPUTE_WORKERS,
+                 chunk_size=CHUNK_SIZE, write_batch=WRITE_BATCH):
+        self.fetch_one = fetch_one
+        self.fetch_many = fetch_many
+        self.compute_one = compute_one
+        self.compute_batch = compute_batch
+        self.write_many = write_many
+        self.fetch_workers = fetch_workers
+        self.compute_workers = compute_workers
+        self.chunk_size = chunk_size
+        self.write_batch = write_batch
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    # ----------------------------------------------------------------
+    # Job registry
+    # ----------------------------------------------------------------
+    def current(self):
+        with self._lock:
+            return next((job for job in self.jobs.values() if job.active), None)
+
+    def latest(self):
+        with self._lock:
+            return max(self.jobs.values(), key=lambda job: job.created_at, default=None)
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def submit(self, codes, on_complete=None):
+        """
+        Start a job for `codes` unless one is already running.
+
+        Returns (job, started); when another job is active it is returned with
+        started=False. on_complete(job) runs after the last write.
+        """
+        with self._lock:
+            running = next((job for job in self.jobs.values() if job.active), None)
+            if running:
+                return running, False
+            job = PrecomputeJob(codes, on_complete)
+            self.jobs[job.id] = job
+            finished = sorted((j for j in self.jobs.values() if not j.active), key=lambda j: j.created_at)
+            for old in finished[:max(0, len(finished) - JOB_HISTORY)]:
+                del self.jobs[old.id]
+
+        threading.Thread(target=self._run, args=(job,), name=f"precompute-{job.id}", daemon=True).start()
+        return job, True
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job and job.active:
+            job.cancel_requested.set()
+        return job
+
+    # ----------------------------------------------------------------
+    # Execution
+    # ----------------------------------------------------------------
+    def _run(self, job):
+        job.status = "running"
+        job.started_at = time.time()
+        print(f"🧮 [precompute job {job.id}] started — {len(job.codes)} schemes")
+        try:
+            self._execute(job)
+            job.status = "cancelled" if job.cancel_requested.is_set() else "done"
+            if job.on_complete and job.status == "done":
+                job.on_complete(job)
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"❌ [precompute job {job.id}] failed: {e}")
+            traceback.print_exc()
+        finally:
+            job.finished_at = time.time()
+        print(f"🏁 [precompute job {job.id}] {job.status} — written={job.written}, failed={len(job.failed)}")
+
+    def _execute(self, job):
+        names = {}
+        pending_rows = []
+
+        def flush():
+            if not pending_rows:
+                return
+            rows = list(pending_rows)
+            pending_rows.clear()
+            try:
+                self.write_many(rows)
+                job.add(written=len(rows))
+            except Exception as e:
+                print(f"💾 [precompute job {job.id}] write of {len(rows)} rows failed: {e}")
+                for code, _, _ in rows:
+                    job.fail(code, f"write: {e}")
+
+        def collect(futures):
+            for future in futures:
+                codes = chunk_codes.pop(future)
+                try:
+                    computed, failed = future.result()
+                except Exception as e:
+                    # e.g. a killed worker (BrokenProcessPool): the whole chunk failed
+                    for code in codes:
+                        names.pop(code, None)
+                        job.fail(code, f"compute: {e}")
+                    continue
+                job.add(computed=len(computed))
+                for item in failed:
+                    job.fail(item["code"], item["error"])
+                pending_rows.extend((code, names.pop(code, None), results) for code, results in computed.items())
+                if len(pending_rows) >= self.write_batch:
+                    flush()
+
+        with ThreadPoolExecutor(self.fetch_workers) as fetch_pool, \
+                ProcessPoolExecutor(self.compute_workers) as compute_pool:
+            in_flight = set()
+            chunk_codes = {}        # future → codes of its chunk, to record them if it fails
+            for start in range(0, len(job.codes), self.chunk_size):
+                if job.cancel_requested.is_set():
+                    break
+                frames = {}
+                for code, nav_df, scheme_name in self._fetch_chunk(job, fetch_pool, job.codes[start:start + self.chunk_size]):
+                    frames[code] = nav_df
+                    names[code] = scheme_name
+                job.add(fetched=len(frames))
+                if frames:
+                    future = compute_pool.submit(_compute_chunk, self.compute_one, self.compute_batch, frames)
+                    chunk_codes[future] = list(frames)
+                    in_flight.add(future)
+
+                # Keep fetching while compute works, but never more than 2 chunks per worker queued
+                while len(in_flight) >= 2 * self.compute_workers:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+
+            collect(wait(in_flight).done)
+        flush()
+
+    def _fetch_chunk(self, job, pool, codes):
+        """Yield (code, nav_df, scheme_name) for every code that could be fetched."""
+        remaining = set(codes)
+        if self.fetch_many is not None:
+            try:
+                for code, nav_df, scheme_name in self.fetch_many(codes):
+                    if code in remaining and nav_df is not None and not nav_df.empty:
+                        remaining.discard(code)
+                        yield code, nav_df, scheme_name
+            except Exception as e:
+                print(f"⚠️ [precompute job {job.id}] bulk fetch failed, falling back to per-scheme fetch: {e}")
+
+        ordered = [code for code in codes if code in remaining]
+        for code, (nav_df, scheme_name, error) in zip(ordered, pool.map(self._fetch_with_retry, ordered)):
+            if error:
+                job.fail(code, error)
+            else:
+                yield code, nav_df, scheme_name
+
+    def _fetch_with_retry(self, code):
+        error = "no NAV after retries"
+        for attempt in range(FETCH_RETRIES):
+            try:
+                nav_df, scheme_name = self.fetch_one(code)
+                if nav_df is not None and not nav_df.empty:
+                    return nav_df, scheme_name, None
+                error = "no NAV after retries"
+            except Exception as e:
+                error = f"fetch: {e}"
+            if attempt + 1 < FETCH_RETRIES:
+                time.sleep(2 * (attempt + 1))
+        return None, None, error
@@ -0,0 +1,274 @@
+"""
+response_cache.py
+Process-local LRU/TTL cache of serialized JSON responses for hot read endpoints,
+plus data-version validators (ETag / Last-Modified) for conditional GETs.
+
+- Entries are keyed by endpoint + normalized query args (sorted names, stripped
+  values, empties dropped) and hold the response body bytes, so a hit skips the
+  DB round-trip and the JSON encoding
+- Bounded by max_entries with least-recently-used eviction; each endpoint has
+  its own TTL
+- invalidate(*endpoints) drops entries when precompute/precache writes new data
+  (where= narrows it to the entries for given query-arg values, e.g. one fund's
+  code); a per-endpoint generation stops a request that started before the
+  invalidation from storing its (stale) result afterwards
+- stats() reports hits, misses, evictions, expirations and invalidations,
+  overall and per endpoint
+- Each worker process has its own cache
+- DataVersion keeps a version stamp per dataset (scheme master, filter cache,
+  fund returns, ...); conditional() tags responses with an ETag built from the
+  stamps of the datasets they are made of, and answers a matching
+  If-None-Match with 304 before the view runs (no DB, no serialization).
+  Only GET/HEAD are validated; a view whose answer depends on more than its
+  URL's data version passes key= to fold the request's normalized parameters
+  into the ETag
+- With a shared store (e.g. a data_versions table) every worker bumps and reads
+  the same stamps, re-read at most every STAMP_REFRESH seconds; a change made by
+  another worker is passed to on_change so local cached responses are dropped
+  too. Without one the stamps are per process (ETags embed a boot id), which is
+  only correct for a single worker: conditional responses are turned off when
+  WEB_CONCURRENCY says there are more
+"""
+
+import functools
+import hashlib
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+
+from flask import make_response, request
+
+MAX_ENTRIES = 2048
+HTTP_MAX_AGE = 60           # seconds browsers/CDNs may reuse a response before revalidating
+STAMP_REFRESH = 5           # seconds a worker trusts the shared stamps it last read
+
+
+class ResponseCache:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()       # key → (expires_at, body, mimetype)
+        self._generations = Counter()       # endpoint → invalidation count
+        self._counters = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(endpoint, args):
+        """Cache key for a request: endpoint plus its query args, order-insensitive."""
+        normalized = []
+        for name in sorted(args):
+            values = tuple(v.strip() for v in args.getlist(name) if v.strip())
+            if values:
+                normalized.append((name, values))
+        return endpoint, tuple(normalized)
+
+    def generation(self, endpoint):
+        with self._lock:
+            return self._generations[endpoint]
+
+    def get(self, key):
+        """(body, mimetype) for a live entry, else None."""
+        endpoint = key[0]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters[endpoint]["misses"] += 1
+                return None
+            expires_at, body, mimetype = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._counters[endpoint]["expirations"] += 1
+                self._counters[endpoint]["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters[endpoint]["hits"] += 1
+            return body, mimetype
+
+    def put(self, key, body, mimetype, ttl, generation):
+        """Store a response unless its endpoint was invalidated since `generation`."""
+        endpoint = key[0]
+        with self._lock:
+            if self._generations[endpoint] != generation:
+                return
+            self._entries[key] = (time.monotonic() + ttl, body, mimetype)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._counters[evicted[0]]["evictions"] += 1
+
+    def invalidate(self, *endpoints, where=None):
+        """
+        Drop every entry of `endpoints` (all endpoints when none are given).
+
+        where={arg: values} only drops the entries whose query arg `arg` has one
+        of `values` (e.g. {"code": ["119551"]}); with several args all must match.
+        """
+        wanted = {name: {str(v).strip() for v in values} for name, values in (where or {}).items()}
+
+        def matches(key):
+            args = dict(key[1])
+            return all(not wanted[name].isdisjoint(args.get(name, ())) for name in wanted)
+
+        with self._lock:
+            targets = set(endpoints) or {key[0] for key in self._entries} | set(self._counters)
+            for key in [key for key in self._entries if key[0] in targets and matches(key)]:
+                del self._entries[key]
+            for endpoint in targets:
+                self._generations[endpoint] += 1
+                self._counters[endpoint]["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            sizes = Counter(key[0] for key in self._entries)
+            endpoints = {
+                endpoint: {**counters, "entries": sizes[endpoint]}
+                for endpoint, counters in self._counters.items()
+            }
+            total = sum((Counter(c) for c in self._counters.values()), Counter())
+            lookups = total["hits"] + total["misses"]
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hit_ratio": round(total["hits"] / lookups, 4) if lookups else None,
+                **{name: total[name] for name in ("hits", "misses", "evictions", "expirations", "invalidations")},
+                "endpoints": endpoints,
+            }
+
+    def cached(self, endpoint, ttl):
+        """Decorator for a Flask view: serve 200 responses from the cache for `ttl` seconds."""
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                key = self.key(endpoint, request.args)
+                hit = self.get(key)
+                if hit is not None:
+                    body, mimetype = hit
+                    response = make_response(body)
+                    response.mimetype = mimetype
+                    response.headers["X-Cache"] = "HIT"
+                    return response
+
+                generation = self.generation(endpoint)
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    self.put(key, response.get_data(), response.mimetype, ttl, generation)
+                response.headers["X-Cache"] = "MISS"
+                return response
+            return wrapper
+        return decorator
+
+
+class DataVersion:
+    """
+    Version stamps of the datasets responses are built from.
+
+    store (optional) is shared by all workers: store.bump(datasets) records a
+    change and store.load() → {dataset: (version, changed_at epoch seconds)}.
+    on_change(datasets) runs when a re-read finds datasets changed since the
+    last read (by this worker or another one).
+    """
+
+    def __init__(self, datasets, store=None, on_change=None, refresh=STAMP_REFRESH):
+        self.datasets = list(datasets)
+        self.store = store
+        self.on_change = on_change
+        self.refresh = refresh
+        self.started = time.time()
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        if store is None:
+            self.prefix = f"{int(self.started):x}{os.getpid():x}"
+            self.enabled = int(os.getenv("WEB_CONCURRENCY") or 1) <= 1
+            self._stamps = {name: (0, self.started) for name in self.datasets}   # name → (version, changed_at)
+            if not self.enabled:
+                print("[DataVersion] several workers and no shared version store — conditional responses disabled")
+        else:
+            self.prefix = "s"
+            self.enabled = True
+            self._stamps = None
+
+    def bump(self, *datasets):
+        """Record that `datasets` changed."""
+        if self.store is not None:
+            try:
+                self.store.bump(datasets)
+            except Exception as e:
+                print("[DataVersion] shared bump failed:", e)
+            self._load(force=True)
+            return
+        with self._lock:
+            now = time.time()
+            for name in datasets:
+                version, _ = self._stamps.get(name, (0, now))
+                self._stamps[name] = (version + 1, now)
+
+    def _load(self, force=False):
+        """Re-read the shared stamps when older than `refresh` seconds. Returns the stamps (None if never read)."""
+        with self._lock:
+            if not force and self._loaded_at is not None and time.monotonic() - self._loaded_at < self.refresh:
+                return self._stamps
+            try:
+                loaded = self.store.load()
+            except Exception as e:
+                print("[DataVersion] reading shared versions failed:", e)
+                self._loaded_at = time.monotonic()      # retry after `refresh`, not per request
+                return self._stamps
+            previous = self._stamps
+            self._stamps = {name: loaded.get(name, (0, self.started)) for name in self.datasets}
+            self._loaded_at = time.monotonic()
+        if previous is not None and self.on_change:
+            changed = [name for name in self.datasets if self._stamps[name][0] != previous[name][0]]
+            if changed:
+                self.on_change(changed)
+        return self._stamps
+
+    def stamp(self, datasets):
+        """(ETag value, last-modified timestamp) for a response built from `datasets`, None if unknown."""
+        if self.store is not None:
+            all_stamps = self._load()
+            if all_stamps is None:
+                return None
+        else:
+            all_stamps = self._stamps
+        with self._lock:
+            stamps = [all_stamps[name] for name in datasets]
+        etag = self.prefix + "-" + ".".join(str(version) for version, _ in stamps)
+        return etag, max(changed_at for _, changed_at in stamps)
+
+    def conditional(self, datasets, max_age=HTTP_MAX_AGE, key=None):
+        """
+        Decorator for a Flask view: ETag / Last-Modified / Cache-Control on 200
+        GET responses, and 304 for a matching If-None-Match without calling the view.
+
+        key() → string naming what the current request asks for (e.g. its
+        normalized scheme codes); it is hashed into the ETag. Requests other
+        than GET/HEAD, and every request while the stamps are unknown (shared
+        store unreadable, or several workers without one), go straight to the
+        view, untagged.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if request.method not in ("GET", "HEAD") or not self.enabled:
+                    return view(*args, **kwargs)
+                # Stamp first: data that changes while the view runs gets the older
+                # (never matching) ETag rather than a newer one
+                stamped = self.stamp(datasets)
+                if stamped is None:
+                    return view(*args, **kwargs)
+                etag, changed_at = stamped
+                if key is not None:
+                    etag += "-" + hashlib.sha1(key().encode()).hexdigest()[:12]
+                if request.if_none_match.contains_weak(etag):
+                    response = make_response("", 304)
+                else:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                response.set_etag(etag, weak=True)
+                response.last_modified = changed_at
+                response.cache_control.public = True
+                response.cache_control.max_age = max_age
+                return response
+            return wrapper
+        return decorator
@@ -0,0 +1,219 @@
+"""
+scheme_index.py
+In-memory search/filter index over the scheme master (schemeswithcodes.csv).
+
+- Built once at startup from schemes_df; queries never touch the DataFrame
+- Each filter field (type, AMC, category, subcategory, plan, option) keeps one
+  bitset (boolean row mask) per distinct normalized value; a filter value
+  selects every distinct value it is a substring of, as the CSV filters did
+- Scheme names are indexed by their 1-, 2- and 3-character n-grams: a query of
+  up to 3 characters is a single posting lookup, longer queries intersect
+  their trigram postings and confirm the substring on the few candidates left
+- Rows are normalized and JSON-encoded up front, so a response is a join of
+  pre-serialized strings
+- facets() answers "which values of each facet remain, and how many schemes
+  each, given the other selected facets" by intersecting the other facets'
+  bitsets and counting value ids; answers are memoized per normalized filter
+  signature
+"""
+
+import json
+from collections import defaultdict
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+NGRAM_MAX = 3
+QUERY_CACHE = 4096
+
+# filter name → schemes_df column
+FILTER_FIELDS = {
+    "type": "instrumentType",
+    "amc": "AMC",
+    "category": "schemeCategory",
+    "subcategory": "schemeSubCategory",
+    "plan": "Plan",
+    "option": "Option",
+}
+# Columns besides the name that a search query also matches
+SEARCH_FIELDS = ["amc", "category", "subcategory"]
+# Dropdowns served by facets()
+FACET_FIELDS = ["amc", "category", "subcategory", "plan", "option"]
+
+
+def _ngrams(text):
+    return {text[i:i + n] for n in range(1, NGRAM_MAX + 1) for i in range(len(text) - n + 1)}
+
+
+class SchemeIndex:
+    def __init__(self, df, serialize):
+        """
+        df: the scheme master with FILTER_FIELDS columns plus schemeCode/schemeName.
+        serialize(record) → response dict for one row (record from df.fillna("")).
+        """
+        self.size = len(df)
+        self.rows = [serialize(r) for r in df.fillna("").to_dict("records")]
+        self.row_json = [json.dumps(r, sort_keys=True, separators=(",", ":")) for r in self.rows]
+
+        # drop_duplicates(subset=["schemeCode"]) semantics: first matching row per code wins
+        codes = df["schemeCode"].astype(str).to_numpy()
+        _, self.code_ids = np.unique(codes, return_inverse=True)
+        self.has_duplicates = len(set(codes)) < len(codes)
+
+        # field → {normalized value: row mask}; values normalized like the *_norm columns
+        # (missing values never match a filter)
+        self.bitsets = {}
+        for field, column in FILTER_FIELDS.items():
+            norm = df[column].astype(str).str.strip().str.lower()
+            norm = np.array([v if isinstance(v, str) else None for v in norm], dtype=object)
+            self.bitsets[field] = self._masks(norm, skip_none=True)
+
+        # field → {lowercased raw value: row mask} for search (NaN never matches)
+        self.search_bitsets = {}
+        for field in SEARCH_FIELDS:
+            values = df[FILTER_FIELDS[field]]
+            lowered = np.array([v.lower() if isinstance(v, str) else None for v in values], dtype=object)
+            self.search_bitsets[field] = self._masks(lowered, skip_none=True)
+
+        # field → sorted distinct raw values, and each row's index into them (-1 = missing)
+        self.facet_values = {}
+        self.facet_ids = {}
+        for field in FACET_FIELDS:
+            raw = df[FILTER_FIELDS[field]]
+            present = raw.notna().to_numpy()
+            values = sorted(raw[present].unique().tolist())
+            lookup = {value: i for i, value in enumerate(values)}
+            self.facet_values[field] = values
+            self.facet_ids[field] = np.array([lookup[v] if p else -1 for v, p in zip(raw, present)], dtype=np.int32)
+
+        self.names = [v.lower() if isinstance(v, str) else "" for v in df["schemeName"]]
+        postings = defaultdict(list)
+        for row, name in enumerate(self.names):
+            for gram in _ngrams(name):
+                postings[gram].append(row)
+        self.postings = {gram: np.array(rows, dtype=np.int32) for gram, rows in postings.items()}
+
+        self.all_rows = self._freeze(np.ones(self.size, dtype=bool))
+        self.no_rows = self._freeze(np.zeros(self.size, dtype=bool))
+
+    @staticmethod
+    def _freeze(mask):
+        mask.flags.writeable = False
+        return mask
+
+    def _masks(self, values, skip_none=False):
+        masks = {}
+        for value in pd.unique(values):
+            if skip_none and value is None:
+                continue
+            masks[value] = self._freeze(values == value)
+        return masks
+
+    # ----------------------------------------------------------------
+    # Bitset lookups (memoized; returned masks are read-only)
+    # ----------------------------------------------------------------
+    @lru_cache(maxsize=QUERY_CACHE)
+    def type_mask(self, type_):
+        """Rows whose instrument type equals `type_` (case-insensitive)."""
+        return self.bitsets["type"].get(type_.lower().strip(), self.no_rows)
+
+    @lru_cache(maxsize=QUERY_CACHE)
+    def field_mask(self, field, values):
+        """Rows where any of `values` (normalized, tuple) is a substring of the field."""
+        mask = np.zeros(self.size, dtype=bool)
+        for norm, rows in self.bitsets[field].items():
+            if any(v in norm for v in values):
+                mask |= rows
+        return self._freeze(mask)
+
+    @lru_cache(maxsize=QUERY_CACHE)
+    def search_mask(self, q):
+        """Rows whose name, AMC, category or subcategory contains `q` (lowercase)."""
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self._name_matches(q)] = True
+        for field in SEARCH_FIELDS:
+            for text, rows in self.search_bitsets[field].items():
+                if q in text:
+                    mask |= rows
+        return self._freeze(mask)
+
+    def _name_matches(self, q):
+        if len(q) <= NGRAM_MAX:
+            return self.postings.get(q, np.empty(0, dtype=np.int32))
+        grams = sorted({q[i:i + NGRAM_MAX] for i in range(len(q) - NGRAM_MAX + 1)},
+                       key=lambda g: len(self.postings.get(g, ())))
+        candidates = self.postings.get(grams[0], np.empty(0, dtype=np.int32))
+        for gram in grams[1:]:
+            if not len(candidates):
+                break
+            candidates = np.intersect1d(candidates, self.postings.get(gram, ()), assume_unique=True)
+        return np.array([row for row in candidates if q in self.names[row]], dtype=np.int32)
+
+    # ----------------------------------------------------------------
+    # Queries
+    # ----------------------------------------------------------------
+    def match(self, type_=None, filters=None, q=None):
+        """
+        Row mask for a type ("both"/None = any), {field: [normalized values]}
+        substring filters and a lowercase search query.
+        """
+        mask = self.all_rows
+        if type_ is not None and type_.lower() != "both":
+            mask = mask & self.type_mask(type_)
+        for field, values in (filters or {}).items():
+            values = tuple(v.lower().strip() for v in values if v)
+            if values:
+                mask = mask & self.field_mask(field, values)
+        if q:
+            mask = mask & self.search_mask(q)
+        return mask
+
+    def rows_for(self, mask):
+        """Row numbers set in `mask`, in CSV order, first row per scheme code."""
+        rows = np.flatnonzero(mask)
+        if self.has_duplicates and len(rows):
+            _, first = np.unique(self.code_ids[rows], return_index=True)
+            rows = rows[np.sort(first)]
+        return rows
+
+    def to_json(self, rows):
+        """JSON array of the pre-serialized rows."""
+        return "[" + ",".join(self.row_json[row] for row in rows) + "]"
+
+    # ----------------------------------------------------------------
+    # Facets
+    # ----------------------------------------------------------------
+    def facets(self, type_, filters):
+        """
+        {facet: {value: scheme count}} for every FACET_FIELDS facet, counting the
+        schemes of `type_` that match the selected values of all *other* facets.
+        Values are in sorted order; treat the returned dicts as read-only.
+        """
+        selected = []
+        for field, values in filters.items():
+            values = tuple(sorted({v.lower().strip() for v in values if v}))
+            if values:
+                selected.append((field, values))
+        return self._facets(type_.lower().strip(), tuple(sorted(selected)))
+
+    @lru_cache(maxsize=QUERY_CACHE)
+    def _facets(self, type_, selected):
+        base = self.all_rows if type_ == "both" else self.type_mask(type_)
+        masks = {field: self.field_mask(field, values) for field, values in selected}
+
+        out = {}
+        for field in FACET_FIELDS:
+            mask = base
+            for other, rows in masks.items():
+                if other != field:
+                    mask = mask & rows
+            values = self.facet_values[field]
+            ids = self.facet_ids[field][mask]
+            if self.has_duplicates:
+                # Count schemes, not rows: a code repeated with the same value counts once
+                pairs = np.unique(self.code_ids[mask].astype(np.int64) * (len(values) + 1) + ids + 1)
+                ids = pairs % (len(values) + 1) - 1
+            counts = np.bincount(ids + 1, minlength=len(values) + 1)[1:]
+            out[field] = {values[i]: int(counts[i]) for i in np.flatnonzero(counts)}
+        return out
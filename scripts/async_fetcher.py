@@ -0,0 +1,230 @@
+"""
+async_fetcher.py
+asyncio NAV downloader for mfapi.in.
+
+- One pooled aiohttp session (keep-alive, DNS cache) for the whole run
+- Concurrency limit adapts AIMD-style: grows while responses are fast, halves on
+  429/5xx/timeouts and shrinks when latency exceeds the target
+- Retries with jittered exponential backoff (honours Retry-After)
+- Results are streamed back as they arrive, so compute can start immediately
+- Bounded: a request slot is only freed once its result has been taken by the
+  consumer, so at most `max_pending` results are in flight or waiting, however
+  slow the consumer is
+
+aiohttp is optional; AIOHTTP_AVAILABLE is False when it is not installed.
+"""
+
+import asyncio
+import queue
+import random
+import threading
+import time
+from collections import namedtuple
+
+from nav_parser import decode_json
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    aiohttp = None
+    AIOHTTP_AVAILABLE = False
+
+MFAPI_BASE = "https://api.mfapi.in/mf/"
+HTTP_HEADERS = {"User-Agent": "Mozilla/5.0", "Accept": "application/json"}
+
+INITIAL_CONCURRENCY = 10
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 64
+TARGET_LATENCY = 2.0        # seconds; slower responses shrink the limit
+REQUEST_TIMEOUT = 15
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5          # seconds; attempt n sleeps up to BACKOFF_BASE * 2**n
+BACKOFF_CAP = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_PENDING = MAX_CONCURRENCY * 2   # requests in flight + results not yet consumed
+STREAM_BUFFER = 256         # results buffered for a slow synchronous consumer
+
+# One result per requested code. `data` is the decoded JSON on success, else None.
+FetchResult = namedtuple("FetchResult", "code data status error attempts elapsed nbytes")
+
+
+class AdaptiveLimiter:
+    """Concurrency gate whose limit moves with observed latency and throttling."""
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, minimum=MIN_CONCURRENCY,
+                 maximum=MAX_CONCURRENCY, target_latency=TARGET_LATENCY):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency, throttled=False):
+        async with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit / 2)
+            elif latency > self.target_latency:
+                self.limit = max(self.minimum, self.limit * 0.9)
+            else:
+                # Additive increase: roughly +1 per `limit` fast responses
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Full-jitter exponential backoff for retry number `attempt` (0-based)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _retry_after(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class AsyncNavFetcher:
+    def __init__(self, base_url=MFAPI_BASE, headers=HTTP_HEADERS, timeout=REQUEST_TIMEOUT,
+                 max_retries=MAX_RETRIES, limiter=None, max_pending=MAX_PENDING):
+        if not AIOHTTP_AVAILABLE:
+            raise RuntimeError("aiohttp is required for the async NAV fetcher (pip install aiohttp)")
+        self.base_url = base_url
+        self.headers = headers
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.limiter = limiter
+        self.max_pending = max_pending
+
+    async def _fetch(self, session, code, params):
+        """Fetch one scheme with retries. Never raises; failures come back in the result."""
+        url = f"{self.base_url}{code}"
+        started = time.monotonic()
+        status, error = None, None
+
+        for attempt in range(self.max_retries + 1):
+            retryable, retry_after = False, None
+            await self.limiter.acquire()
+            t0 = time.monotonic()
+            try:
+                async with session.get(url, params=params) as resp:
+                    status = resp.status
+                    body = await resp.read()
+                    if status == 200:
+                        data = decode_json(body)
+                        return FetchResult(code, data, status, None, attempt + 1,
+                                           time.monotonic() - started, len(body))
+                    retryable = status in RETRY_STATUSES
+                    retry_after = _retry_after(resp.headers.get("Retry-After"))
+                    error = f"HTTP {status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                retryable = True
+                error = f"{type(e).__name__}: {e}"
+            except ValueError as e:
+                error = f"Invalid JSON: {e}"
+            finally:
+                await self.limiter.release(time.monotonic() - t0, throttled=retryable)
+
+            if not retryable or attempt == self.max_retries:
+                break
+            await asyncio.sleep(retry_after if retry_after is not None else backoff_delay(attempt))
+
+        return FetchResult(code, None, status, error, attempt + 1, time.monotonic() - started, 0)
+
+    async def stream(self, jobs):
+        """
+        Async generator over FetchResults in completion order.
+
+        `jobs` is an iterable of (code, params) where params is an optional dict
+        of query parameters (e.g. startDate/endDate for incremental fetches).
+
+        A slot is taken per request and given back only when its result is
+        dequeued here, so requests in flight plus results waiting for the
+        consumer never exceed max_pending: a stalled consumer stalls fetching.
+        """
+        jobs = [(str(code), params) for code, params in jobs]
+        if self.limiter is None:
+            self.limiter = AdaptiveLimiter()
+
+        results = asyncio.Queue()
+        slots = asyncio.Semaphore(self.max_pending)
+        tasks = set()
+        connector = aiohttp.TCPConnector(limit=self.limiter.maximum, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        async with aiohttp.ClientSession(headers=self.headers, timeout=timeout, connector=connector) as session:
+            async def run(code, params):
+                await results.put(await self._fetch(session, code, params))
+
+            async def produce():
+                for code, params in jobs:
+                    await slots.acquire()
+                    task = asyncio.create_task(run(code, params))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+
+            producer = asyncio.create_task(produce())
+            try:
+                for _ in range(len(jobs)):
+                    result = await results.get()
+                    slots.release()
+                    yield result
+            finally:
+                producer.cancel()
+                for task in list(tasks):
+                    task.cancel()
+
+
+def iter_nav_payloads(jobs, buffer=STREAM_BUFFER, **kwargs):
+    """
+    Synchronous wrapper: run AsyncNavFetcher on a background event loop and
+    yield FetchResults as they arrive.
+
+    Usable from plain scripts and request handlers. At most `buffer` results
+    wait in the hand-off queue, one more in the pump and max_pending in the
+    fetcher; beyond that (buffer + max_pending + 1) the fetcher pauses.
+    """
+    out = queue.Queue(maxsize=buffer)
+    done = object()
+    stop = threading.Event()
+
+    async def pump():
+        loop = asyncio.get_running_loop()
+        async for result in AsyncNavFetcher(**kwargs).stream(jobs):
+            if stop.is_set():
+                break
+            await loop.run_in_executor(None, out.put, result)
+
+    def runner():
+        try:
+            asyncio.run(pump())
+        except BaseException as e:
+            out.put(e)
+        finally:
+            out.put(done)
+
+    thread = threading.Thread(target=runner, name="nav-fetcher", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = out.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # Drain so a blocked producer can observe `stop` and exit
+        while thread.is_alive():
+            try:
+                out.get(timeout=0.1)
+            except queue.Empty:
+                pass
@@ -0,0 +1,177 @@
+"""
+batch_returns.py
+Batched multi-scheme SIP returns engine.
+
+- Aligns many schemes' NAV histories into one date × scheme float matrix
+  (forward-filled over days a scheme did not publish a NAV)
+- Split-adjusts every column at once and resolves SIP dates for all schemes
+  with shared index lookups
+- Solves every XIRR period of every scheme in the chunk with one solver call
+- Produces the same {period: return} dicts as update_data.calculate_returns
+"""
+
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from update_data import (
+    PERIODS, ABSOLUTE_PERIODS, SIP_AMOUNT, SPLIT_RATIOS, SPLIT_TOLERANCE, sip_schedule,
+)
+from xirr_solver import DAYS_PER_YEAR, solve_xirr
+
+# Schemes per matrix; bounds memory at roughly dates × BATCH_SIZE × 16 bytes
+BATCH_SIZE = 500
+
+
+def _as_series(nav):
+    """NAV DataFrame or NavStore (dates, navs) pair → float Series, None if empty."""
+    if nav is None:
+        return None
+    if isinstance(nav, tuple):
+        dates, navs = nav
+        s = pd.Series(navs, index=pd.DatetimeIndex(dates), dtype=float, copy=False)
+    else:
+        s = nav["nav"].astype(float)
+    return s if len(s) else None
+
+
+def build_nav_matrix(nav_frames):
+    """
+    Align {code: nav} into (dates, codes, navs, has_nav).
+
+    Each value is a NAV DataFrame (date index, `nav` column) or a (dates, navs)
+    array pair as returned by NavStore.read_many. `navs` is a date × scheme
+    float64 matrix forward-filled over non-trading days (NaN before a scheme's
+    first NAV); `has_nav` marks the rows where the scheme actually published a NAV.
+    """
+    series = {}
+    for code, nav in nav_frames.items():
+        s = _as_series(nav)
+        if s is None:
+            continue
+        s = s.sort_index()
+        series[code] = s[~s.index.duplicated(keep="first")]
+
+    if not series:
+        return pd.DatetimeIndex([]), [], np.empty((0, 0)), np.empty((0, 0), dtype=bool)
+
+    wide = pd.concat(series, axis=1, sort=True)
+    has_nav = wide.notna().to_numpy()
+    navs = wide.ffill().to_numpy(dtype=float)
+    return wide.index, list(wide.columns), navs, has_nav
+
+
+def adjust_splits_matrix(navs):
+    """Column-wise version of update_data.adjust_splits over a forward-filled matrix."""
+    if navs.shape[0] < 2:
+        return navs.copy()
+
+    prev_nav, curr_nav = navs[:-1], navs[1:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = prev_nav / curr_nav
+        rev_ratio = curr_nav / prev_nav
+
+    # NaN (pre-listing) and forward-filled rows never match a candidate
+    fwd_factor = np.ones_like(ratio)
+    rev_factor = np.ones_like(ratio)
+    for possible in SPLIT_RATIOS:
+        fwd_factor[np.abs(ratio - possible) / possible < SPLIT_TOLERANCE] = possible
+        rev_factor[np.abs(rev_ratio - possible) / possible < SPLIT_TOLERANCE] = possible
+
+    ones = np.ones((1, navs.shape[1]))
+    multiplier = np.vstack((ones, np.cumprod(fwd_factor, axis=0)))
+    divisor = np.vstack((ones, np.cumprod(rev_factor, axis=0)))
+    return navs * multiplier / divisor
+
+
+def _next_nav_index(has_nav):
+    """For every (date, scheme), the row of that scheme's next published NAV (len(dates) if none)."""
+    n = has_nav.shape[0]
+    idx = np.where(has_nav, np.arange(n)[:, None], n)
+    return np.minimum.accumulate(idx[::-1], axis=0)[::-1]
+
+
+def _pad(matrix, width):
+    """Right-pad rows with zeros (zero cashflows do not affect NPV)."""
+    return np.pad(matrix, ((0, 0), (0, width - matrix.shape[1])))
+
+
+def _calculate_chunk(dates, navs, has_nav):
+    """Compute period results for every column of one aligned matrix."""
+    n_dates, n_schemes = navs.shape
+    results = [{label: None for label in PERIODS} for _ in range(n_schemes)]
+    if n_schemes == 0:
+        return results
+
+    adjusted = adjust_splits_matrix(navs)
+    next_idx = _next_nav_index(has_nav)
+    first_pos = has_nav.argmax(axis=0)
+    last_pos = n_dates - 1 - has_nav[::-1].argmax(axis=0)
+    day_numbers = dates.values.astype("datetime64[D]").astype(np.int64)
+
+    # XIRR rows gathered across all end-date groups and periods, solved at once
+    xirr_targets, xirr_cashflows, xirr_times = [], [], []
+
+    # Schemes sharing a last NAV date share their SIP schedules
+    for end in np.unique(last_pos):
+        group = np.flatnonzero(last_pos == end)
+        end_date = dates[end]
+
+        for label, days in PERIODS.items():
+            start_date = end_date - timedelta(days=days)
+            cols = group[dates[first_pos[group]] <= start_date]
+            if cols.size == 0:
+                continue
+
+            sip_dates = sip_schedule(start_date, end_date)
+            if len(sip_dates) == 0:
+                continue
+
+            # (k, g) rows of the NAV each instalment buys at
+            pos = next_idx[dates.searchsorted(sip_dates, side="left")][:, cols]
+            units = SIP_AMOUNT / adjusted[pos, cols]
+            invested = len(sip_dates) * SIP_AMOUNT
+            value = units.sum(axis=0) * adjusted[end, cols]
+
+            if label in ABSOLUTE_PERIODS:
+                for col, v in zip(cols, value):
+                    results[col][label] = round(((float(v) / invested) - 1) * 100, 2)
+                continue
+
+            flow_days = np.vstack((day_numbers[pos], np.full((1, cols.size), day_numbers[end]))).T
+            cashflows = np.full(flow_days.shape, -float(SIP_AMOUNT))
+            cashflows[:, -1] = value
+            xirr_targets.extend((col, label) for col in cols)
+            xirr_cashflows.append(cashflows)
+            xirr_times.append((flow_days - flow_days[:, :1]) / DAYS_PER_YEAR)
+
+    if xirr_targets:
+        width = max(cf.shape[1] for cf in xirr_cashflows)
+        rates = solve_xirr(np.vstack([_pad(cf, width) for cf in xirr_cashflows]),
+                           np.vstack([_pad(t, width) for t in xirr_times]))
+        for (col, label), rate in zip(xirr_targets, rates):
+            results[col][label] = round(float(rate) * 100, 2) if np.isfinite(rate) else None
+
+    return results
+
+
+def calculate_returns_batch(nav_frames, batch_size=BATCH_SIZE):
+    """
+    Calculate SIP returns (Absolute/XIRR) for many schemes at once.
+
+    `nav_frames` maps scheme code → NAV DataFrame (date index, `nav` column) as
+    returned by fetch_nav_history, or → (dates, navs) arrays straight from
+    NavStore.read_many. Returns {code: results} with the same shape as
+    calculate_returns; empty histories map to {}.
+    """
+    out = {code: {} for code, nav in nav_frames.items() if _as_series(nav) is None}
+    codes = [code for code in nav_frames if code not in out]
+
+    for i in range(0, len(codes), batch_size):
+        chunk = {code: nav_frames[code] for code in codes[i:i + batch_size]}
+        dates, chunk_codes, navs, has_nav = build_nav_matrix(chunk)
+        for code, results in zip(chunk_codes, _calculate_chunk(dates, navs, has_nav)):
+            out[code] = results
+
+    return out
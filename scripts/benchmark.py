@@ -0,0 +1,262 @@
+"""
+benchmark.py
+Offline benchmark for the returns computation pipeline.
+
+- Builds a seeded corpus of synthetic mfapi-style NAV histories (1–15 years,
+  with injected forward/reverse splits and multi-week publication gaps)
+- Times parse_nav_arrays, xirr, simulate_sip, calculate_returns, analyze_scheme,
+  process_scheme (HTTP and NavStore redirected to in-memory/temporary
+  stand-ins, no network) and the batched calculate_returns_batch engine
+- Reports per-call latency (mean/p50/p95), schemes/sec and peak traced memory
+- Writes a JSON baseline; --compare flags benchmarks slower than a previous
+  baseline by more than REGRESSION_THRESHOLD
+
+Usage:
+    python scripts/benchmark.py
+    python scripts/benchmark.py --schemes 500 --out /tmp/bench.json --compare scripts/cache/benchmark.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import update_data
+from nav_store import NavStore
+
+SEED = 42
+SCHEMES = 120
+REPEAT = 3
+BASELINE_FILE = os.path.join(update_data.CACHE_DIR, "benchmark.json")
+REGRESSION_THRESHOLD = 1.25     # current / baseline p50 above this is a regression
+
+HISTORY_YEARS = (1, 3, 5, 8, 12, 15)
+SPLIT_KINDS = (None, None, "forward", "reverse")
+
+
+# ==========================================
+# SYNTHETIC DATA
+# ==========================================
+def synthetic_payload(rng, code, years, split=None, gaps=True, end=datetime(2025, 6, 30)):
+    """
+    An mfapi.in-shaped payload ({meta, data}, newest first, DD-MM-YYYY strings)
+    for a random-walk NAV over `years` of business days.
+
+    split: None, "forward" (NAV ÷ 10 mid-history) or "reverse" (NAV × 5).
+    gaps: drop a few multi-week stretches and ~2% of single days.
+    """
+    dates = pd.bdate_range(end - timedelta(days=int(years * 365.25)), end)
+    navs = 10 * np.cumprod(1 + rng.normal(0.0004, 0.011, len(dates)))
+
+    if split:
+        at = int(rng.integers(len(dates) // 4, 3 * len(dates) // 4))
+        navs[at:] = navs[at:] / 10 if split == "forward" else navs[at:] * 5
+
+    keep = np.ones(len(dates), dtype=bool)
+    if gaps:
+        keep &= rng.random(len(dates)) > 0.02
+        for _ in range(int(rng.integers(1, 4))):
+            start = int(rng.integers(1, max(2, len(dates) - 30)))
+            keep[start:start + int(rng.integers(10, 30))] = False
+        keep[[0, -1]] = True
+
+    rows = [{"date": d.strftime("%d-%m-%Y"), "nav": f"{v:.4f}"}
+            for d, v in zip(dates[keep][::-1], navs[keep][::-1])]
+    return {"meta": {"scheme_code": code, "scheme_name": f"Synthetic Fund {code}"}, "data": rows}
+
+
+def build_corpus(n=SCHEMES, seed=SEED):
+    """{code: payload} for n schemes cycling through HISTORY_YEARS and SPLIT_KINDS."""
+    rng = np.random.default_rng(seed)
+    corpus = {}
+    for i in range(n):
+        code = str(900000 + i)
+        years = HISTORY_YEARS[i % len(HISTORY_YEARS)]
+        split = SPLIT_KINDS[(i // len(HISTORY_YEARS)) % len(SPLIT_KINDS)]
+        corpus[code] = synthetic_payload(rng, code, years, split=split)
+    return corpus
+
+
+class _FakeResponse:
+    def __init__(self, body):
+        self.status_code = 200 if body is not None else 404
+        self.content = body or b""
+
+
+class _FakeRequests:
+    """Stands in for the requests module inside update_data: serves the encoded corpus."""
+
+    def __init__(self, corpus):
+        self.bodies = {code: json.dumps(payload).encode() for code, payload in corpus.items()}
+
+    def get(self, url, **kwargs):
+        return _FakeResponse(self.bodies.get(url.rsplit("/", 1)[-1]))
+
+
+@contextlib.contextmanager
+def offline(corpus):
+    """Route update_data's HTTP calls to the corpus and its NavStore to a temp dir."""
+    saved = update_data.requests, update_data._nav_store
+    with tempfile.TemporaryDirectory() as tmp:
+        update_data.requests = _FakeRequests(corpus)
+        update_data._nav_store = NavStore(tmp)
+        try:
+            yield
+        finally:
+            update_data.requests, update_data._nav_store = saved
+
+
+# ==========================================
+# MEASUREMENT
+# ==========================================
+def _measure(calls, repeat):
+    """Run every zero-arg callable `repeat` times; returns per-call seconds and peak bytes."""
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            for call in calls:
+                t0 = time.perf_counter()
+                call()
+                timings.append(time.perf_counter() - t0)
+
+        # Separate pass: tracemalloc slows allocation-heavy code
+        tracemalloc.start()
+        for call in calls:
+            call()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return np.array(timings), peak
+
+
+def _summary(timings, peak, schemes_per_call=1):
+    total = timings.sum()
+    return {
+        "calls": int(timings.size),
+        "mean_ms": round(float(timings.mean()) * 1e3, 4),
+        "p50_ms": round(float(np.percentile(timings, 50)) * 1e3, 4),
+        "p95_ms": round(float(np.percentile(timings, 95)) * 1e3, 4),
+        "schemes_per_sec": round(timings.size * schemes_per_call / total, 2) if total > 0 else None,
+        "peak_mem_mb": round(peak / 2**20, 3),
+    }
+
+
+def run_benchmarks(corpus, repeat=REPEAT):
+    from batch_returns import calculate_returns_batch
+    from nav_parser import parse_nav_arrays
+    from xirr_solver import xirr
+
+    frames = {code: update_data.parse_nav_payload(p).set_index("date") for code, p in corpus.items()}
+    with contextlib.redirect_stdout(io.StringIO()):
+        prepared = {code: update_data.prepare_nav(df) for code, df in frames.items()}
+    rows = [{"schemeCode": code, "schemeName": p["meta"]["scheme_name"]} for code, p in corpus.items()]
+
+    # Longest window each scheme supports, as simulate_sip/xirr inputs
+    windows = []
+    for dates, navs, _ in prepared.values():
+        end = dates[-1]
+        fits = [days for days in update_data.PERIODS.values() if end - timedelta(days=days) >= dates[0]]
+        if fits:
+            windows.append((dates, navs, end - timedelta(days=max(fits)), end))
+    flows = [update_data.simulate_sip(*w)[2:] for w in windows]
+
+    results = {}
+    bodies = [json.dumps(p).encode() for p in corpus.values()]
+    results["parse_nav_arrays"] = _summary(*_measure(
+        [lambda b=b: parse_nav_arrays(b) for b in bodies], repeat))
+    results["xirr"] = _summary(*_measure(
+        [lambda f=f: xirr(f[1], f[0]) for f in flows], repeat))
+    results["simulate_sip"] = _summary(*_measure(
+        [lambda w=w: update_data.simulate_sip(*w) for w in windows], repeat))
+    results["calculate_returns"] = _summary(*_measure(
+        [lambda df=df: update_data.calculate_returns(df) for df in frames.values()], repeat))
+    results["analyze_scheme"] = _summary(*_measure(
+        [lambda df=df: update_data.analyze_scheme(df) for df in frames.values()], repeat))
+    with offline(corpus):
+        results["process_scheme"] = _summary(*_measure(
+            [lambda r=r: update_data.process_scheme(r) for r in rows], repeat))
+    results["calculate_returns_batch"] = _summary(*_measure(
+        [lambda: calculate_returns_batch(frames)], repeat), schemes_per_call=len(frames))
+    return results
+
+
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """Print p50 ratios against a baseline; returns the names of regressed benchmarks."""
+    regressed = []
+    for name, stats in current.items():
+        base = baseline.get(name)
+        if not base or not base.get("p50_ms"):
+            print(f"  {name:<24} (no baseline)")
+            continue
+        ratio = stats["p50_ms"] / base["p50_ms"]
+        flag = "❌ REGRESSION" if ratio > threshold else "✅"
+        print(f"  {name:<24} {base['p50_ms']:>10.3f} → {stats['p50_ms']:>10.3f} ms  ×{ratio:.2f}  {flag}")
+        if ratio > threshold:
+            regressed.append(name)
+    return regressed
+
+
+# ==========================================
+# MAIN EXECUTION
+# ==========================================
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SIP returns pipeline on synthetic NAVs.")
+    parser.add_argument("--schemes", type=int, default=SCHEMES, help="synthetic schemes in the corpus")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="timed passes over the corpus")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--out", default=BASELINE_FILE, help="where to write the JSON results")
+    parser.add_argument("--compare", help="previous results JSON to check for regressions")
+    args = parser.parse_args()
+
+    print(f"🧪 Building synthetic corpus ({args.schemes} schemes, seed {args.seed})...")
+    corpus = build_corpus(args.schemes, args.seed)
+
+    print("⏱  Running benchmarks...")
+    results = run_benchmarks(corpus, repeat=args.repeat)
+
+    print(f"\n{'benchmark':<24} {'p50 ms':>10} {'p95 ms':>10} {'schemes/s':>11} {'peak MB':>9}")
+    for name, s in results.items():
+        print(f"{name:<24} {s['p50_ms']:>10.3f} {s['p95_ms']:>10.3f} "
+              f"{s['schemes_per_sec'] or 0:>11.1f} {s['peak_mem_mb']:>9.2f}")
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "schemes": args.schemes,
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\n📊 Compared with {args.compare} ({baseline.get('created_at')}):")
+        if compare(results, baseline.get("results", {})):
+            exit_code = 1
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results written to {args.out}")
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+correlation.py
+Fund-to-fund daily-return correlation matrices for overlap/diversification views.
+
+- One matrix per scheme category (schemeswithcodes.csv) or per named basket of codes
+- Built from the NAV cache filled by update_data.fetch_nav_history (missing
+  schemes are fetched), split-adjusted, over the trailing LOOKBACK_DAYS
+- Each pair's correlation is the Pearson correlation over the days both
+  schemes published (pairs with < MIN_OVERLAP shared days are NaN); the
+  overlap sums come from masked products computed block by block in float32,
+  so a few thousand schemes fit in memory
+- Saved under CORRELATION_DIR as <name>.npy (float32, memory-mapped on load)
+  plus <name>.json holding the scheme-code index; CorrelationIndex picks up
+  rebuilt files without a restart
+
+Usage:
+    python scripts/correlation.py                          # every category
+    python scripts/correlation.py --category "Equity Scheme"
+    python scripts/correlation.py --codes 119551,120503 --name my_basket
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+CORRELATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "correlation")
+LOOKBACK_DAYS = 365 * 3
+MIN_OVERLAP = 60            # shared return days required for a correlation
+BLOCK_SIZE = 512            # schemes per block in the blocked product
+SIMILAR_DEFAULT = 10
+
+
+def _slug(name):
+    return re.sub(r"[^a-z0-9]+", "_", str(name).lower()).strip("_") or "basket"
+
+
+# ==========================================
+# BUILD
+# ==========================================
+def daily_returns(nav_frames, lookback_days=LOOKBACK_DAYS):
+    """
+    Align {code: nav} into (codes, returns) with returns a date × scheme float32
+    matrix of split-adjusted daily returns, NaN where the scheme published no NAV.
+
+    Each series is cut to the lookback window plus its last NAV before it (the
+    base of the first return) before alignment, so only the window is aligned
+    and split-adjusted.
+    """
+    from batch_returns import _as_series, adjust_splits_matrix, build_nav_matrix
+
+    series = {}
+    for code, nav in nav_frames.items():
+        s = _as_series(nav)
+        if s is not None:
+            series[code] = s.sort_index()
+    if not series:
+        return [], np.empty((0, 0), dtype=np.float32)
+
+    cutoff = max(s.index[-1] for s in series.values()) - pd.Timedelta(days=lookback_days)
+    window = {}
+    for code, s in series.items():
+        first = max(s.index.searchsorted(cutoff) - 1, 0)
+        window[code] = (s.index.values[first:], s.to_numpy()[first:])
+
+    dates, codes, navs, has_nav = build_nav_matrix(window)
+    start = dates.searchsorted(cutoff)
+    adjusted = adjust_splits_matrix(navs[start:])
+    has_nav = has_nav[start:]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = adjusted[1:] / adjusted[:-1] - 1
+    returns[~has_nav[1:]] = np.nan
+    return codes, returns.astype(np.float32)
+
+
+def correlation_matrix(returns, min_overlap=MIN_OVERLAP, block_size=BLOCK_SIZE):
+    """
+    Pairwise Pearson correlation of the columns of a (days × schemes) return
+    matrix, each pair over the days both columns are observed.
+
+    With Z the data (zero where missing) and M the observed mask, every tile
+    needs overlap MᵢᵀMⱼ, sums ZᵢᵀMⱼ / MᵢᵀZⱼ, sums of squares (Zᵢ²)ᵀMⱼ / Mᵢᵀ(Zⱼ²)
+    and cross products ZᵢᵀZⱼ. Columns are standardized over their own days
+    first (Pearson is unaffected), which keeps the float32 sums well conditioned.
+    """
+    n = returns.shape[1]
+    observed = np.isfinite(returns)
+    counts = observed.sum(axis=0)
+
+    denom = np.maximum(counts, 1).astype(np.float32)
+
+    z = np.where(observed, returns, 0).astype(np.float32)
+    z -= z.sum(axis=0) / denom
+    z[~observed] = 0
+    std = np.sqrt((z ** 2).sum(axis=0) / denom)
+    z /= np.where(std > 0, std, np.inf).astype(np.float32)
+    z2 = z ** 2
+    mask = observed.astype(np.float32)
+
+    corr = np.empty((n, n), dtype=np.float32)
+    for i in range(0, n, block_size):
+        zi, zi2, mi = z[:, i:i + block_size], z2[:, i:i + block_size], mask[:, i:i + block_size]
+        for j in range(i, n, block_size):
+            zj, zj2, mj = z[:, j:j + block_size], z2[:, j:j + block_size], mask[:, j:j + block_size]
+            overlap = (mi.T @ mj).astype(np.float64)
+            sum_i, sum_j = zi.T @ mj, mi.T @ zj
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cov = zi.T @ zj - sum_i * (sum_j / overlap)
+                var_i = zi2.T @ mj - sum_i * (sum_i / overlap)
+                var_j = mi.T @ zj2 - sum_j * (sum_j / overlap)
+                tile = cov / np.sqrt(var_i * var_j)
+            tile[(overlap < min_overlap) | ~np.isfinite(tile)] = np.nan
+            np.clip(tile, -1, 1, out=tile)      # float rounding only
+            corr[i:i + block_size, j:j + block_size] = tile
+            corr[j:j + block_size, i:i + block_size] = tile.T
+
+    np.fill_diagonal(corr, np.where(counts >= min_overlap, 1, np.nan))
+    return corr
+
+
+def load_navs(codes):
+    """NAV histories for codes from the NavStore, fetching any that are not cached yet."""
+    from update_data import fetch_nav_history, get_nav_store
+
+    store = get_nav_store()
+    frames = store.read_many(codes)
+    for code in codes:
+        code = str(code)
+        if code not in frames:
+            nav_df, _ = fetch_nav_history(code, incremental=True)
+            if nav_df is not None:
+                frames[code] = nav_df
+    return frames
+
+
+def save_matrix(directory, name, codes, corr, **meta):
+    """Write <name>.npy then <name>.json, each atomically (readers never see a partial file)."""
+    os.makedirs(directory, exist_ok=True)
+    npy_path = os.path.join(directory, f"{name}.npy")
+    with open(npy_path + ".tmp", "wb") as f:
+        np.save(f, corr)
+    os.replace(npy_path + ".tmp", npy_path)
+
+    json_path = os.path.join(directory, f"{name}.json")
+    with open(json_path + ".tmp", "w") as f:
+        json.dump({"name": name, "codes": [str(c) for c in codes], **meta}, f)
+    os.replace(json_path + ".tmp", json_path)
+
+
+def build_group(name, codes, directory):
+    """Build and save one group's matrix; returns the number of schemes in it."""
+    scheme_codes, returns = daily_returns(load_navs(codes))
+    if len(scheme_codes) < 2:
+        print(f"⚠️ {name}: fewer than 2 schemes with NAV history, skipped")
+        return 0
+    corr = correlation_matrix(returns)
+    save_matrix(directory, _slug(name), scheme_codes, corr, group=name,
+                lookback_days=LOOKBACK_DAYS, built_at=datetime.now().strftime("%Y-%m-%d"))
+    print(f"✅ {name}: {len(scheme_codes)} schemes")
+    return len(scheme_codes)
+
+
+# ==========================================
+# LOOKUP
+# ==========================================
+class CorrelationIndex:
+    """
+    Memory-mapped matrices from CORRELATION_DIR with a scheme-code → (matrix, row) index.
+
+    refresh() reloads the index when matrix files were added, removed or
+    rewritten since the last load, so rebuilt matrices are served without a restart.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.signature = None
+        self._state = ({}, {})     # (name → (codes, corr, meta), code → (name, row)), swapped as one
+        self._lock = threading.Lock()
+        self.refresh()
+
+    @property
+    def matrices(self):
+        return self._state[0]
+
+    @property
+    def rows(self):
+        return self._state[1]
+
+    def _signature(self):
+        """(path, mtime, size) of every matrix file; changes whenever a matrix is rebuilt."""
+        entries = []
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.json")) +
+                           glob.glob(os.path.join(self.directory, "*.npy"))):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, st.st_mtime_ns, st.st_size))
+        return tuple(entries)
+
+    def refresh(self):
+        """Reload if the files changed; returns True when it did."""
+        with self._lock:
+            signature = self._signature()
+            if signature == self.signature:
+                return False
+            matrices, rows = {}, {}
+            for meta_path in sorted(glob.glob(os.path.join(self.directory, "*.json"))):
+                try:
+                    with open(meta_path) as f:
+                        meta = json.load(f)
+                    corr = np.load(meta_path[:-len(".json")] + ".npy", mmap_mode="r")
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ Skipping unreadable correlation matrix {meta_path}: {e}")
+                    continue
+                codes = meta["codes"]
+                if corr.shape != (len(codes), len(codes)):
+                    # .npy already rebuilt, .json not yet: picked up on the next refresh
+                    continue
+                matrices[meta["name"]] = (codes, corr, meta)
+                for row, code in enumerate(codes):
+                    rows.setdefault(code, (meta["name"], row))
+            self._state, self.signature = (matrices, rows), signature
+            return True
+
+    def __contains__(self, code):
+        return str(code) in self.rows
+
+    def most_similar(self, code, k=SIMILAR_DEFAULT):
+        """The k schemes most correlated with `code` in its matrix, as [(code, correlation)]."""
+        matrices, rows = self._state
+        entry = rows.get(str(code))
+        if entry is None:
+            return []
+        name, row = entry
+        codes, corr, _ = matrices[name]
+        values = np.array(corr[row], dtype=np.float32)
+        values[row] = np.nan
+        values = np.where(np.isfinite(values), values, -np.inf)
+
+        k = min(k, len(values) - 1)
+        if k <= 0:
+            return []
+        top = np.argpartition(values, -k)[-k:]
+        top = top[np.argsort(values[top])[::-1]]
+        return [(codes[i], round(float(values[i]), 4)) for i in top if np.isfinite(values[i])]
+
+
+# ==========================================
+# MAIN EXECUTION
+# ==========================================
+def main():
+    from update_data import INPUT_FILE
+
+    parser = argparse.ArgumentParser(description="Precompute fund-to-fund NAV correlation matrices.")
+    parser.add_argument("--category", action="append",
+                        help="build only these schemeCategory values (repeatable; default: all)")
+    parser.add_argument("--codes", help="comma-separated scheme codes for a custom basket")
+    parser.add_argument("--name", default="basket", help="matrix name for --codes")
+    parser.add_argument("--out", default=CORRELATION_DIR,
+                        help="output directory")
+    args = parser.parse_args()
+
+    if args.codes:
+        codes = [c.strip() for c in args.codes.split(",") if c.strip()]
+        build_group(args.name, codes, args.out)
+        return
+
+    schemes = pd.read_csv(INPUT_FILE)
+    for category, group in schemes.groupby("schemeCategory"):
+        if args.category and category not in args.category:
+            continue
+        build_group(category, group["schemeCode"].astype(str).unique().tolist(), args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+nav_parser.py
+Fast path from an mfapi.in response body to NumPy NAV arrays.
+
+- decode_json uses orjson when installed (ORJSON_AVAILABLE), else the stdlib
+- parse_nav_arrays reads the {date: "DD-MM-YYYY", nav: "123.45"} rows straight
+  into datetime64[D] and float64 arrays: dates are decoded from their fixed
+  byte positions, with no format inference and no per-row pandas conversion
+  (only irregular rows, e.g. unpadded days, fall back to pandas)
+- Rows with malformed dates or non-positive/non-numeric NAVs are dropped, the
+  same rows pd.to_datetime/pd.to_numeric(errors="coerce") used to drop
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+DATE_DTYPE = np.dtype("datetime64[D]")
+_DAYS_IN_MONTH = np.array([31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+def decode_json(body):
+    """Decode a JSON response body (bytes or str)."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def parse_dates(values):
+    """
+    DD-MM-YYYY strings → (datetime64[D] array, valid mask).
+
+    Invalid entries (wrong length, non-digits, impossible day/month) are
+    flagged in the mask; their slots hold NaT.
+    """
+    try:
+        # One spare byte: anything longer than 10 characters leaves it non-zero
+        raw = np.asarray(values, dtype="S11")
+    except UnicodeEncodeError:
+        return _parse_dates_slow(values)
+
+    chars = raw.view(np.uint8).reshape(raw.size, 11).astype(np.int16)
+    digits = chars[:, [0, 1, 3, 4, 6, 7, 8, 9]] - ord("0")
+
+    day = digits[:, 0] * 10 + digits[:, 1]
+    month = digits[:, 2] * 10 + digits[:, 3]
+    year = digits[:, 4] * 1000 + digits[:, 5] * 100 + digits[:, 6] * 10 + digits[:, 7]
+
+    valid = ((digits >= 0) & (digits <= 9)).all(axis=1)
+    valid &= (chars[:, 2] == ord("-")) & (chars[:, 5] == ord("-")) & (chars[:, 10] == 0)
+    valid &= (month >= 1) & (month <= 12) & (day >= 1)
+    valid &= day <= _DAYS_IN_MONTH[np.clip(month - 1, 0, 11)]
+
+    months = np.where(valid, (year - 1970) * 12 + month - 1, 0).astype("datetime64[M]")
+    dates = months.astype(DATE_DTYPE) + np.where(valid, day - 1, 0).astype("timedelta64[D]")
+    # 29 February outside leap years rolls into March; reject it
+    valid &= dates.astype("datetime64[M]") == months
+    dates[~valid] = np.datetime64("NaT")
+
+    # Rare irregular rows (e.g. unpadded "1-1-2020") get pandas' lenient parse
+    retry = np.flatnonzero(~valid & (raw != b""))
+    if retry.size:
+        slow_dates, slow_valid = _parse_dates_slow([values[i] for i in retry])
+        dates[retry], valid[retry] = slow_dates, slow_valid
+    return dates, valid
+
+
+def _parse_dates_slow(values):
+    parsed = pd.to_datetime(pd.Series(values, dtype=object), format="%d-%m-%Y", errors="coerce")
+    return parsed.to_numpy(dtype=DATE_DTYPE, copy=True), parsed.notna().to_numpy(copy=True)
+
+
+def parse_navs(values):
+    """NAV strings/numbers → float64 array, NaN where not numeric."""
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=np.float64, copy=True)
+
+
+def parse_nav_arrays(data):
+    """
+    Turn an API payload (decoded dict, or raw bytes/str) into sorted
+    (dates datetime64[D], navs float64) arrays of valid, positive NAVs.
+    """
+    if isinstance(data, (bytes, bytearray, str)):
+        data = decode_json(data)
+    rows = data.get("data") or []
+    if not rows:
+        return np.empty(0, DATE_DTYPE), np.empty(0, np.float64)
+
+    dates, valid = parse_dates([row.get("date") or "" for row in rows])
+    navs = parse_navs([row.get("nav") for row in rows])
+    with np.errstate(invalid="ignore"):
+        valid &= np.isfinite(navs) & (navs > 0)
+    dates, navs = dates[valid], navs[valid]
+
+    # The API lists newest first
+    if dates.size > 1 and not (dates[1:] >= dates[:-1]).all():
+        if (dates[1:] <= dates[:-1]).all():
+            dates, navs = dates[::-1], navs[::-1]
+        else:
+            order = np.argsort(dates, kind="stable")
+            dates, navs = dates[order], navs[order]
+    return np.ascontiguousarray(dates), np.ascontiguousarray(navs)
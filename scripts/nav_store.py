@@ -0,0 +1,226 @@
+"""
+nav_store.py
+Columnar NAV store shared by all schemes (replaces one CSV per scheme).
+
+Layout under NAV_STORE_DIR:
+- dates.bin   datetime64[D] values, append-only
+- navs.bin    float64 values, append-only (same row order as dates.bin)
+- index.json  {code: [[offset, length], ...]} segments of each scheme's rows
+
+Both data files are opened with np.memmap, so a scheme stored as one segment is
+read zero-copy. Appends add a new segment at the end of the files; compact()
+rewrites the files so every scheme is a single contiguous segment again.
+
+The two files are appended one after the other, so a crash can leave them with
+different row counts. On open both are truncated to the rows they have in
+common and index segments past that point are dropped (a scheme left with no
+segments is simply not stored and gets refetched).
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+DATE_DTYPE = np.dtype("<M8[D]")
+NAV_DTYPE = np.dtype("<f8")
+INDEX_FLUSH_EVERY = 200     # appends between index.json writes
+
+
+class NavStore:
+    def __init__(self, path):
+        self.path = path
+        self.dates_path = os.path.join(path, "dates.bin")
+        self.navs_path = os.path.join(path, "navs.bin")
+        self.index_path = os.path.join(path, "index.json")
+        self._lock = threading.RLock()
+        self._dates = None
+        self._navs = None
+        self._dirty = 0
+
+        os.makedirs(path, exist_ok=True)
+        for p in (self.dates_path, self.navs_path):
+            if not os.path.exists(p):
+                open(p, "wb").close()
+
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+        self._rows = self._file_rows()
+        self._repair()
+
+    # ----------------------------------------------------------------
+    # Internal helpers
+    # ----------------------------------------------------------------
+    def _file_rows(self):
+        return os.path.getsize(self.navs_path) // NAV_DTYPE.itemsize
+
+    def _repair(self):
+        """Undo a torn append: align both files on whole common rows and trim the index to them."""
+        rows = min(os.path.getsize(self.dates_path) // DATE_DTYPE.itemsize, self._rows)
+        for path, dtype in ((self.dates_path, DATE_DTYPE), (self.navs_path, NAV_DTYPE)):
+            if os.path.getsize(path) != rows * dtype.itemsize:
+                print(f"⚠️ NavStore: truncating {os.path.basename(path)} to {rows} rows after an interrupted write")
+                os.truncate(path, rows * dtype.itemsize)
+        self._rows = rows
+
+        # Segments are appended in file order, so only a scheme's trailing segments can be cut off
+        dropped = 0
+        for code in list(self.index):
+            segments = [seg for seg in self.index[code] if seg[0] + seg[1] <= rows]
+            if len(segments) != len(self.index[code]):
+                dropped += 1
+                if segments:
+                    self.index[code] = segments
+                else:
+                    del self.index[code]
+        if dropped:
+            print(f"⚠️ NavStore: dropped rows past the end of the data files for {dropped} schemes")
+            self.flush()
+
+    def _mapped(self, end):
+        """Return memmaps covering at least `end` rows, remapping after appends."""
+        if self._navs is None or len(self._navs) < end:
+            rows = self._file_rows()
+            if rows == 0:
+                return np.empty(0, DATE_DTYPE), np.empty(0, NAV_DTYPE)
+            self._dates = np.memmap(self.dates_path, dtype=DATE_DTYPE, mode="r", shape=(rows,))
+            self._navs = np.memmap(self.navs_path, dtype=NAV_DTYPE, mode="r", shape=(rows,))
+        return self._dates, self._navs
+
+    @staticmethod
+    def _to_arrays(rows):
+        """Accept a date/nav DataFrame (column or index dates) or a (dates, navs) pair."""
+        if isinstance(rows, pd.DataFrame):
+            dates = rows["date"] if "date" in rows.columns else rows.index
+            navs = rows["nav"]
+        else:
+            dates, navs = rows
+        return (np.asarray(pd.DatetimeIndex(dates).values, dtype=DATE_DTYPE),
+                np.asarray(navs, dtype=NAV_DTYPE))
+
+    def _write_rows(self, dates, navs):
+        """Append raw rows to both data files; returns the starting offset."""
+        offset = self._rows
+        try:
+            with open(self.dates_path, "ab") as f:
+                f.write(dates.tobytes())
+            with open(self.navs_path, "ab") as f:
+                f.write(navs.tobytes())
+        except BaseException:
+            # Keep the files aligned (a hard crash here is repaired on the next open)
+            os.truncate(self.dates_path, offset * DATE_DTYPE.itemsize)
+            os.truncate(self.navs_path, offset * NAV_DTYPE.itemsize)
+            raise
+        self._rows += len(navs)
+        return offset
+
+    def _touch(self):
+        self._dirty += 1
+        if self._dirty >= INDEX_FLUSH_EVERY:
+            self.flush()
+
+    # ----------------------------------------------------------------
+    # Public API
+    # ----------------------------------------------------------------
+    def __contains__(self, code):
+        return str(code) in self.index
+
+    def codes(self):
+        return list(self.index)
+
+    def read(self, code):
+        """Return (dates, navs) arrays for a scheme, or None if it is not stored."""
+        with self._lock:
+            segments = list(self.index.get(str(code)) or ())
+            if not segments:
+                return None
+            end = max(off + n for off, n in segments)
+            dates, navs = self._mapped(end)
+        if len(segments) == 1:
+            off, n = segments[0]
+            return dates[off:off + n], navs[off:off + n]
+        return (np.concatenate([dates[off:off + n] for off, n in segments]),
+                np.concatenate([navs[off:off + n] for off, n in segments]))
+
+    def read_many(self, codes):
+        """Return {code: (dates, navs)} for every stored code in `codes`."""
+        out = {}
+        for code in codes:
+            arrays = self.read(code)
+            if arrays is not None:
+                out[str(code)] = arrays
+        return out
+
+    def read_frame(self, code):
+        """Return a scheme's history as a date-indexed DataFrame (fetch_nav_history shape)."""
+        arrays = self.read(code)
+        if arrays is None:
+            return None
+        dates, navs = arrays
+        return pd.DataFrame({"nav": navs}, index=pd.DatetimeIndex(dates, name="date"))
+
+    def last_date(self, code):
+        arrays = self.read(code)
+        if arrays is None or len(arrays[0]) == 0:
+            return None
+        return pd.Timestamp(arrays[0][-1])
+
+    def append(self, code, rows):
+        """Append new rows (dates after the stored history) to a scheme."""
+        dates, navs = self._to_arrays(rows)
+        if len(navs) == 0:
+            return
+        with self._lock:
+            offset = self._write_rows(dates, navs)
+            self.index.setdefault(str(code), []).append([offset, len(navs)])
+            self._touch()
+
+    def replace(self, code, rows):
+        """Replace a scheme's whole history (old rows are dropped on the next compact())."""
+        dates, navs = self._to_arrays(rows)
+        with self._lock:
+            offset = self._write_rows(dates, navs)
+            self.index[str(code)] = [[offset, len(navs)]]
+            self._touch()
+
+    def flush(self):
+        """Persist index.json atomically."""
+        with self._lock:
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.index, f)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = 0
+
+    def compact(self):
+        """
+        Rewrite the data files so each scheme is one contiguous segment with no dead rows.
+
+        Segments are copied with plain file reads rather than through the
+        memmaps, so resident memory does not grow with the size of the store.
+        """
+        with self._lock:
+            tmp_dates, tmp_navs = self.dates_path + ".tmp", self.navs_path + ".tmp"
+            index, offset = {}, 0
+            with open(self.dates_path, "rb") as sd, open(self.navs_path, "rb") as sn, \
+                    open(tmp_dates, "wb") as fd, open(tmp_navs, "wb") as fn:
+                for code, segments in self.index.items():
+                    rows = 0
+                    for off, n in segments:
+                        sd.seek(off * DATE_DTYPE.itemsize)
+                        fd.write(sd.read(n * DATE_DTYPE.itemsize))
+                        sn.seek(off * NAV_DTYPE.itemsize)
+                        fn.write(sn.read(n * NAV_DTYPE.itemsize))
+                        rows += n
+                    index[code] = [[offset, rows]]
+                    offset += rows
+            self._dates = self._navs = None
+            os.replace(tmp_dates, self.dates_path)
+            os.replace(tmp_navs, self.navs_path)
+            self.index = index
+            self._rows = offset
+            self.flush()
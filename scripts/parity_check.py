@@ -0,0 +1,248 @@
+"""
+parity_check.py
+Golden-output parity checker for the SIP returns engines.
+
+- golden/returns_corpus.json.gz holds frozen NAV histories and the results
+  dict calculate_returns produced for each one
+- Cases cover the edges that broke engines before: schemes younger than a
+  period, forward/reverse/stacked splits, publication gaps, stale histories,
+  flat NAVs and XIRRs far from the solver's starting guess
+- Any engine is checked against the corpus; a period passes when both values
+  are None or they differ by at most --tolerance percentage points
+
+Usage:
+    python scripts/parity_check.py                       # per-scheme engine
+    python scripts/parity_check.py --engine batch
+    python scripts/parity_check.py --engine my_module:my_calculate_returns
+    python scripts/parity_check.py --regenerate          # rebuild the corpus (review the diff!)
+"""
+
+import argparse
+import contextlib
+import gzip
+import importlib
+import io
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_FILE = os.path.join(SCRIPT_DIR, "golden", "returns_corpus.json.gz")
+TOLERANCE = 0.01            # percentage points; results are rounded to 2 decimals
+END_DATE = datetime(2025, 6, 30)
+
+
+# ==========================================
+# CORPUS CASES
+# ==========================================
+def _walk(seed, days, drift=0.0004, vol=0.01, start_nav=10.0, gaps=False):
+    """Business-day random-walk NAV ending on END_DATE, optionally with dropped days."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(END_DATE - timedelta(days=days), END_DATE)
+    navs = start_nav * np.cumprod(1 + rng.normal(drift, vol, len(dates)))
+    if gaps:
+        keep = rng.random(len(dates)) > 0.03
+        keep[[0, -1]] = True
+        dates, navs = dates[keep], navs[keep]
+    return dates, navs
+
+
+def _split(navs, frac, factor):
+    """Divide the tail by `factor` (forward split for factor > 1, reverse for < 1)."""
+    at = int(len(navs) * frac)
+    navs = navs.copy()
+    navs[at:] /= factor
+    return navs
+
+
+def _drop(dates, navs, start, end):
+    keep = (dates < pd.Timestamp(start)) | (dates > pd.Timestamp(end))
+    return dates[keep], navs[keep]
+
+
+def _case_builders():
+    y = 365
+    cases = {}
+
+    def add(name, description, dates, navs):
+        cases[name] = (description, dates, navs)
+
+    add("plain_15y", "15 years, no splits or gaps", *_walk(1, 15 * y))
+    add("gaps_12y", "12 years with ~3% of days missing", *_walk(2, 12 * y, gaps=True))
+
+    add("young_20d", "20 days old: every period None", *_walk(3, 20))
+    add("young_200d", "200 days old: only 1M/3M/6M", *_walk(4, 200))
+    add("young_2y", "2 years old: up to 1Y", *_walk(5, 2 * y, gaps=True))
+    add("exact_3y", "history starts exactly 3Y before the last NAV", *_walk(6, 3 * y))
+    add("just_short_3y", "history starts one day after the 3Y start date",
+        *_walk(7, 3 * y - 1))
+
+    d, n = _walk(8, 8 * y)
+    add("forward_split_x2", "2-for-1 split mid-history", d, _split(n, 0.5, 2))
+    d, n = _walk(9, 8 * y)
+    add("forward_split_x10", "10-for-1 split (face value 10 → 1)", d, _split(n, 0.3, 10))
+    d, n = _walk(10, 11 * y, gaps=True)
+    add("forward_split_x100_gaps", "100-for-1 split plus missing days", d, _split(n, 0.7, 100))
+    d, n = _walk(11, 6 * y)
+    add("reverse_split_x5", "1-for-5 consolidation", d, _split(n, 0.6, 0.2))
+    d, n = _walk(12, 12 * y)
+    add("stacked_splits", "forward ×10 then reverse ÷2", d, _split(_split(n, 0.35, 10), 0.75, 0.5))
+    d, n = _walk(13, 2 * y)
+    add("split_inside_1y", "forward ×5 split inside the last year", d, _split(n, 0.9, 5))
+
+    d, n = _walk(14, 7 * y)
+    add("gap_6_months", "no NAVs for six months (SIP dates buy at the next NAV)",
+        *_drop(d, n, "2021-03-15", "2021-09-20"))
+    d, n = _drop(*_walk(15, 5 * y), "2022-06-01", "2022-07-31")
+    add("gap_over_period_start", "gaps covering the 3Y and 1Y start dates",
+        *_drop(d, n, "2024-06-10", "2024-07-15"))
+    d, n = _walk(16, 9 * y)
+    add("stale_history", "scheme stopped publishing a year before END_DATE",
+        d[d < pd.Timestamp("2024-06-30")], n[d < pd.Timestamp("2024-06-30")])
+
+    d, _ = _walk(17, 6 * y)
+    add("flat_nav", "constant NAV: every return 0", d, np.full(len(d), 10.0))
+    add("tiny_nav", "NAV around 0.01", *_walk(18, 5 * y, start_nav=0.01))
+
+    # XIRR far from the 0.1 starting guess
+    d, _ = _walk(19, 4 * y)
+    add("crash_95pct", "gradual 95% decline; Newton from 0.1 overshoots below -100% "
+        "(the pre-vectorized loop raised here), expected holds the bracketed root",
+        d, 100 * np.geomspace(1, 0.05, len(d)))
+    d, _ = _walk(20, 4 * y)
+    add("rally_40x", "gradual 40× rise (XIRR in the hundreds of %)", d, 10 * np.geomspace(1, 40, len(d)))
+    d, n = _walk(21, 6 * y)
+    add("v_shape", "80% crash then full recovery in the last year",
+        d, n * np.concatenate([np.geomspace(1, 0.2, len(d) - 250), np.geomspace(0.2, 1, 250)]))
+    add("high_volatility", "5% daily volatility", *_walk(22, 10 * y, drift=0.001, vol=0.05))
+
+    return cases
+
+
+def build_corpus():
+    """Run the current per-scheme engine over every case; returns the corpus dict."""
+    from update_data import calculate_returns
+
+    out = {"generated_at": datetime.now().strftime("%Y-%m-%d"), "tolerance": TOLERANCE, "cases": []}
+    for name, (description, dates, navs) in _case_builders().items():
+        navs = np.round(np.asarray(navs, dtype=float), 4)
+        frame = _frame([d.strftime("%Y-%m-%d") for d in dates], navs.tolist())
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = calculate_returns(frame)
+        out["cases"].append({
+            "name": name,
+            "description": description,
+            "dates": frame.index.strftime("%Y-%m-%d").tolist(),
+            "navs": navs.tolist(),
+            "expected": expected,
+        })
+    return out
+
+
+# ==========================================
+# CHECKING
+# ==========================================
+def _frame(dates, navs):
+    """fetch_nav_history-shaped frame: `nav` column on a `date` index."""
+    return pd.DataFrame({"nav": navs}, index=pd.DatetimeIndex(pd.to_datetime(dates), name="date"))
+
+
+def load_corpus(path=CORPUS_FILE):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def resolve_engine(spec):
+    """
+    Engine callable {name: nav_df} → {name: results}.
+
+    "scheme" and "batch" are the built-in engines; "module:function" loads a
+    per-scheme function with calculate_returns' signature.
+    """
+    if spec == "scheme":
+        from update_data import calculate_returns
+        return lambda frames: {k: calculate_returns(df) for k, df in frames.items()}
+    if spec == "batch":
+        from batch_returns import calculate_returns_batch
+        return calculate_returns_batch
+
+    module, _, func = spec.partition(":")
+    fn = getattr(importlib.import_module(module), func)
+    return lambda frames: {k: fn(df) for k, df in frames.items()}
+
+
+def compare_results(expected, actual, tolerance=TOLERANCE):
+    """[(period, expected, actual)] for every period outside tolerance."""
+    diffs = []
+    for period, want in expected.items():
+        got = actual.get(period)
+        if want is None or got is None:
+            if want is not got:
+                diffs.append((period, want, got))
+        elif not np.isfinite(got) or abs(got - want) > tolerance + 1e-9:
+            diffs.append((period, want, got))
+    return diffs
+
+
+def check(engine, corpus, tolerance=TOLERANCE):
+    """Run `engine` over the corpus; returns {case name: diffs} for failing cases."""
+    cases = {c["name"]: c for c in corpus["cases"]}
+    frames = {name: _frame(c["dates"], c["navs"]) for name, c in cases.items()}
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = engine(frames)
+
+    failures = {}
+    for name, case in cases.items():
+        diffs = compare_results(case["expected"], results.get(name) or {}, tolerance)
+        if diffs:
+            failures[name] = diffs
+    return failures
+
+
+# ==========================================
+# MAIN EXECUTION
+# ==========================================
+def main():
+    parser = argparse.ArgumentParser(description="Check a returns engine against the golden corpus.")
+    parser.add_argument("--engine", default="scheme",
+                        help='"scheme", "batch" or "module:function" (per-scheme, calculate_returns signature)')
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="allowed absolute difference in percentage points")
+    parser.add_argument("--corpus", default=CORPUS_FILE)
+    parser.add_argument("--regenerate", action="store_true",
+                        help="rebuild the corpus from the current calculate_returns")
+    args = parser.parse_args()
+
+    if args.regenerate:
+        corpus = build_corpus()
+        os.makedirs(os.path.dirname(args.corpus), exist_ok=True)
+        with gzip.open(args.corpus, "wt", encoding="utf-8") as f:
+            json.dump(corpus, f)
+        print(f"💾 Wrote {len(corpus['cases'])} golden cases to {args.corpus}")
+        return
+
+    corpus = load_corpus(args.corpus)
+    failures = check(resolve_engine(args.engine), corpus, args.tolerance)
+
+    print(f"🔍 Engine '{args.engine}' vs {len(corpus['cases'])} golden cases (±{args.tolerance}):")
+    for case in corpus["cases"]:
+        diffs = failures.get(case["name"])
+        if not diffs:
+            print(f"  ✅ {case['name']}")
+            continue
+        print(f"  ❌ {case['name']} — {case['description']}")
+        for period, want, got in diffs:
+            print(f"       {period:>4}: expected {want}, got {got}")
+
+    if failures:
+        print(f"\n❌ {len(failures)} case(s) out of tolerance")
+        sys.exit(1)
+    print("\n🎉 All cases match")
+
+
+if __name__ == "__main__":
+    main()
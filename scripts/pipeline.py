@@ -0,0 +1,156 @@
+"""
+pipeline.py
+Staged producer/consumer pipeline for the nightly refresh.
+
+  fetch (I/O threads or async) ──► bounded queue ──► compute (process pool) ──► writer
+
+- The fetch stage runs in its own thread and blocks once `queue_size` fetched
+  schemes are waiting, so NAV histories never pile up in memory; a blocked
+  fetch stage stalls the fetcher behind it (thread pool or async fetcher,
+  each with its own fixed bound, see update_data.iter_fetched)
+- The compute stage ships chunks of schemes to a ProcessPoolExecutor, using
+  either per-scheme analyze_scheme or the batched NAV-matrix engine; at most
+  2 × compute_workers chunks are in flight. A chunk the batch engine fails on
+  is computed per scheme; schemes that still fail (or whose worker died) are
+  recorded as run-metrics failures rather than dropped silently
+- The writer stage hands finished rows to a sink callable as they complete
+"""
+
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from run_metrics import METRICS
+
+QUEUE_SIZE = 200            # fetched schemes waiting for compute
+SCHEME_CHUNK = 25           # schemes per compute task (per-scheme engine)
+BATCH_CHUNK = 250           # schemes per compute task (batch engine)
+
+_DONE = object()
+
+
+def _compute_chunk(engine, items):
+    """
+    Worker: compute returns for [(row, nav_df), ...].
+
+    Returns (output rows, run-metrics state) so the parent can merge this
+    worker's stage timings.
+    """
+    from run_metrics import METRICS
+    from update_data import analyze_scheme, build_result, calculate_metrics
+
+    # Batch engine first; anything it fails on or leaves out is computed per scheme
+    returns = {}
+    if engine == "batch":
+        from batch_returns import calculate_returns_batch
+        frames = {str(row["schemeCode"]): nav_df for row, nav_df in items}
+        try:
+            with METRICS.timer("compute_batch"):
+                returns = calculate_returns_batch(frames)
+        except Exception as e:
+            print(f"⚠️ Batch engine failed ({e}), computing chunk per scheme")
+
+    rows = []
+    for row, nav_df in items:
+        code = str(row["schemeCode"])
+        try:
+            with METRICS.scheme(code):
+                if code in returns:
+                    rows.append(build_result(row, returns[code], calculate_metrics(nav_df)))
+                else:
+                    rows.append(build_result(row, *analyze_scheme(nav_df)))
+        except Exception as e:
+            print(f"Error computing {code}: {e}")
+            METRICS.fail(code, f"compute: {type(e).__name__}")
+    return rows, METRICS.drain()
+
+
+def run_pipeline(fetched, sink, engine="scheme", compute_workers=None, queue_size=QUEUE_SIZE,
+                 chunk_size=None, on_progress=None):
+    """
+    Run fetch → compute → write for an iterable of (row, nav_df).
+
+    `fetched` is the I/O stage (e.g. update_data.iter_fetched); it is consumed
+    in a background thread. `sink(row_dict)` is called from the writer thread
+    for every finished row. Returns the number of rows written.
+    """
+    compute_workers = compute_workers or os.cpu_count() or 1
+    chunk_size = chunk_size or (BATCH_CHUNK if engine == "batch" else SCHEME_CHUNK)
+
+    fetch_q = queue.Queue(maxsize=queue_size)
+    write_q = queue.Queue(maxsize=queue_size)
+    in_flight = threading.BoundedSemaphore(compute_workers * 2)
+    errors = []
+    written = [0]
+
+    def fetch_stage():
+        try:
+            for row, nav_df in fetched:
+                fetch_q.put((row, nav_df))
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            fetch_q.put(_DONE)
+
+    def write_stage():
+        while True:
+            rows = write_q.get()
+            if rows is _DONE:
+                break
+            for row in rows:
+                try:
+                    sink(row)
+                    written[0] += 1
+                except Exception as e:
+                    print(f"⚠️ Writer failed for {row.get('scheme_code')}: {e}")
+
+    def on_done(future, codes):
+        try:
+            rows, metrics = future.result()
+            METRICS.merge(metrics)
+            write_q.put(rows)
+        except Exception as e:
+            # The worker itself failed (e.g. it died); none of the chunk was computed
+            print(f"⚠️ Compute chunk of {len(codes)} schemes failed: {e}")
+            for code in codes:
+                METRICS.fail(code, f"compute: {type(e).__name__}")
+        finally:
+            in_flight.release()
+
+    fetcher = threading.Thread(target=fetch_stage, name="pipeline-fetch", daemon=True)
+    writer = threading.Thread(target=write_stage, name="pipeline-write", daemon=True)
+    fetcher.start()
+    writer.start()
+
+    seen = 0
+    with ProcessPoolExecutor(max_workers=compute_workers) as pool:
+        chunk = []
+
+        def submit():
+            in_flight.acquire()
+            codes = [str(row["schemeCode"]) for row, _ in chunk]
+            future = pool.submit(_compute_chunk, engine, list(chunk))
+            future.add_done_callback(lambda f: on_done(f, codes))
+            chunk.clear()
+
+        while True:
+            item = fetch_q.get()
+            if item is _DONE:
+                break
+            seen += 1
+            if on_progress:
+                on_progress(seen)
+            if item[1] is not None:
+                chunk.append(item)
+            if len(chunk) >= chunk_size:
+                submit()
+        if chunk:
+            submit()
+
+    write_q.put(_DONE)
+    writer.join()
+    fetcher.join()
+    if errors:
+        raise errors[0]
+    return written[0]
@@ -0,0 +1,103 @@
+"""
+result_writer.py
+Streaming, resumable writer for precomputed_clean.csv.
+
+- Rows are appended to <output>.partial and flushed as each scheme finishes
+- <output>.checkpoint records the run date and every completed scheme code
+  (written only after that scheme's row is on disk)
+- resume=True continues today's interrupted run: rows whose code never made it
+  into the checkpoint are dropped and completed codes are exposed as `done`
+- close() atomically replaces the output file with the finished partial file
+"""
+
+import csv
+import os
+import threading
+from datetime import datetime
+
+
+class ResultWriter:
+    def __init__(self, output_path, resume=False):
+        self.output_path = output_path
+        self.partial_path = output_path + ".partial"
+        self.checkpoint_path = output_path + ".checkpoint"
+        self.today = datetime.now().strftime("%Y-%m-%d")
+        self.done = set()
+        self.written = 0
+        self._lock = threading.Lock()
+        self._fieldnames = None
+        self._writer = None
+
+        if resume and self._load_checkpoint():
+            self._trim_partial()
+            self._data = open(self.partial_path, "a", newline="", encoding="utf-8")
+            self._checkpoint = open(self.checkpoint_path, "a", encoding="utf-8")
+            if self._fieldnames:
+                self._writer = csv.DictWriter(self._data, fieldnames=self._fieldnames)
+            self.written = len(self.done)
+        else:
+            self._data = open(self.partial_path, "w", newline="", encoding="utf-8")
+            self._checkpoint = open(self.checkpoint_path, "w", encoding="utf-8")
+            self._checkpoint.write(f"date={self.today}\n")
+            self._checkpoint.flush()
+
+    def _load_checkpoint(self):
+        """Load completed codes if a checkpoint from today exists alongside its partial file."""
+        if not (os.path.exists(self.checkpoint_path) and os.path.exists(self.partial_path)):
+            return False
+        with open(self.checkpoint_path, encoding="utf-8") as f:
+            text = f.read()
+        # Every entry is written with its newline in one call; text after the
+        # last newline is a torn entry and must not count (or be appended to)
+        lines = text.split("\n")
+        if len(lines) < 2 or lines[0].strip() != f"date={self.today}":
+            return False
+        self.done = {line.strip() for line in lines[1:-1] if line.strip()}
+        if lines[-1]:
+            with open(self.checkpoint_path, "r+b") as f:
+                f.truncate(len(text[:-len(lines[-1])].encode("utf-8")))
+        return True
+
+    def _trim_partial(self):
+        """Drop rows (including a torn last line) whose code is not checkpointed."""
+        tmp_path = self.partial_path + ".tmp"
+        with open(self.partial_path, newline="", encoding="utf-8") as src, \
+                open(tmp_path, "w", newline="", encoding="utf-8") as dst:
+            reader = csv.DictReader(src)
+            self._fieldnames = reader.fieldnames
+            if self._fieldnames:
+                writer = csv.DictWriter(dst, fieldnames=self._fieldnames)
+                writer.writeheader()
+                for row in reader:
+                    if row.get("scheme_code") in self.done:
+                        writer.writerow(row)
+        os.replace(tmp_path, self.partial_path)
+
+    def write(self, row):
+        """Append one result row and checkpoint its scheme code."""
+        with self._lock:
+            if self._writer is None:
+                self._fieldnames = list(row.keys())
+                self._writer = csv.DictWriter(self._data, fieldnames=self._fieldnames)
+                self._writer.writeheader()
+            self._writer.writerow(row)
+            self._data.flush()
+
+            code = str(row["scheme_code"])
+            self._checkpoint.write(code + "\n")
+            self._checkpoint.flush()
+            self.done.add(code)
+            self.written += 1
+
+    def close(self):
+        """Finish the run: publish the output file and clear the checkpoint. Returns rows written."""
+        with self._lock:
+            self._data.close()
+            self._checkpoint.close()
+            if self.written == 0:
+                os.remove(self.partial_path)
+                os.remove(self.checkpoint_path)
+                return 0
+            os.replace(self.partial_path, self.output_path)
+            os.remove(self.checkpoint_path)
+            return self.written
@@ -0,0 +1,75 @@
+"""
+risk_metrics.py
+Risk statistics for one scheme's split-adjusted NAV series.
+
+- Computed over the trailing RISK_LOOKBACK_DAYS of history (all of it for
+  younger schemes), from simple daily NAV returns
+- Annualized volatility and downside deviation (√TRADING_DAYS scaling)
+- Sharpe and Sortino against RISK_FREE_RATE
+- Max drawdown with its peak, trough and recovery dates (recovery is None
+  while the NAV is still below the peak)
+"""
+
+import numpy as np
+
+TRADING_DAYS = 252
+RISK_FREE_RATE = 0.065          # annual, used for Sharpe/Sortino
+RISK_LOOKBACK_DAYS = 365 * 3
+MIN_OBSERVATIONS = 60           # fewer daily returns than this → no metrics
+
+
+def _date(value):
+    return str(np.datetime64(value, "D"))
+
+
+def max_drawdown(dates, navs):
+    """Largest peak-to-trough fall as (drawdown, peak_date, trough_date, recovery_date)."""
+    running_peak = np.maximum.accumulate(navs)
+    drawdowns = navs / running_peak - 1
+    trough = int(np.argmin(drawdowns))
+    if drawdowns[trough] >= 0:
+        return 0.0, None, None, None
+
+    peak = int(np.argmax(navs[:trough + 1]))
+    recovered = np.flatnonzero(navs[trough:] >= navs[peak])
+    recovery = _date(dates[trough + recovered[0]]) if recovered.size else None
+    return float(drawdowns[trough]), _date(dates[peak]), _date(dates[trough]), recovery
+
+
+def calculate_risk_metrics(dates, navs, lookback_days=RISK_LOOKBACK_DAYS, risk_free=RISK_FREE_RATE):
+    """
+    Risk metrics for a prepared NAV series (`dates`/`navs` from prepare_nav).
+
+    Percentages are rounded to 2 decimals, ratios to 3. Returns None when the
+    window holds fewer than MIN_OBSERVATIONS daily returns.
+    """
+    if navs is None or len(navs) < 2:
+        return None
+
+    day_numbers = np.asarray(dates, dtype="datetime64[D]")
+    navs = np.asarray(navs, dtype=float)
+    start = np.searchsorted(day_numbers, day_numbers[-1] - np.timedelta64(lookback_days, "D"))
+    day_numbers, navs = day_numbers[start:], navs[start:]
+
+    returns = navs[1:] / navs[:-1] - 1
+    if returns.size < MIN_OBSERVATIONS:
+        return None
+
+    excess = returns - risk_free / TRADING_DAYS
+    volatility = returns.std(ddof=1) * np.sqrt(TRADING_DAYS)
+    downside = np.sqrt(np.mean(np.minimum(excess, 0) ** 2)) * np.sqrt(TRADING_DAYS)
+    annual_excess = excess.mean() * TRADING_DAYS
+    drawdown, peak, trough, recovery = max_drawdown(day_numbers, navs)
+
+    return {
+        "window_start": _date(day_numbers[0]),
+        "window_end": _date(day_numbers[-1]),
+        "volatility": round(float(volatility) * 100, 2),
+        "downside_deviation": round(float(downside) * 100, 2),
+        "sharpe": round(float(annual_excess / volatility), 3) if volatility > 0 else None,
+        "sortino": round(float(annual_excess / downside), 3) if downside > 0 else None,
+        "max_drawdown": round(drawdown * 100, 2),
+        "drawdown_peak": peak,
+        "drawdown_trough": trough,
+        "drawdown_recovery": recovery,
+    }
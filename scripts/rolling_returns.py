@@ -0,0 +1,107 @@
+"""
+rolling_returns.py
+Rolling-window return summaries for one scheme's split-adjusted NAV series.
+
+For every start date in the history (one vectorized pass per window):
+- lumpsum CAGR: buy at the start NAV, sell at the first NAV on/after start + window
+- SIP XIRR: monthly instalments anchored on the start date, valued at the same
+  window end, solved for all windows together with xirr_solver.solve_xirr
+
+Each window is reduced to {windows, min, median, max, pct_positive} (returns in
+%), so rolling-return views read stored numbers instead of computing them.
+"""
+
+import numpy as np
+
+from xirr_solver import DAYS_PER_YEAR, solve_xirr
+
+ROLLING_WINDOWS = {
+    "1Y": 365,
+    "3Y": 365 * 3,
+    "5Y": 365 * 5,
+}
+
+
+def _day_numbers(dates):
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+
+
+def rolling_lumpsum(day_numbers, navs, days):
+    """Annualized lumpsum return for every start date with a complete window."""
+    end_pos = np.searchsorted(day_numbers, day_numbers + days, side="left")
+    start = np.flatnonzero(end_pos < len(navs))
+    if start.size == 0:
+        return np.empty(0)
+    end = end_pos[start]
+    years = (day_numbers[end] - day_numbers[start]) / DAYS_PER_YEAR
+    return (navs[end] / navs[start]) ** (1 / years) - 1
+
+
+def _instalment_days(start_days, months):
+    """(S, months) day numbers of monthly instalments anchored on each start day (clamped to month end)."""
+    start_dates = start_days.astype("datetime64[D]")
+    start_month = start_dates.astype("datetime64[M]")
+    offset = (start_dates - start_month.astype("datetime64[D]")).astype(np.int64)
+
+    inst_month = start_month[:, None] + np.arange(months)
+    month_start = inst_month.astype("datetime64[D]")
+    month_len = ((inst_month + 1).astype("datetime64[D]") - month_start).astype(np.int64)
+    return month_start.astype(np.int64) + np.minimum(offset[:, None], month_len - 1)
+
+
+def rolling_sip(day_numbers, navs, days):
+    """SIP XIRR for every start date with a complete window."""
+    end_pos = np.searchsorted(day_numbers, day_numbers + days, side="left")
+    starts = np.flatnonzero(end_pos < len(navs))
+    if starts.size == 0:
+        return np.empty(0)
+    end_pos = end_pos[starts]
+
+    months = max(1, round(days / DAYS_PER_YEAR * 12))
+    pos = np.searchsorted(day_numbers, _instalment_days(day_numbers[starts], months), side="left")
+
+    # XIRR is scale-free, so instalments are one unit of currency each
+    value = (1.0 / navs[pos]).sum(axis=1) * navs[end_pos]
+    cashflows = np.hstack((np.full(pos.shape, -1.0), value[:, None]))
+    flow_days = np.hstack((day_numbers[pos], day_numbers[end_pos][:, None]))
+    times = (flow_days - flow_days[:, :1]) / DAYS_PER_YEAR
+    return solve_xirr(cashflows, times)
+
+
+def summarize(rates):
+    """Reduce a window's rates to min/median/max/% positive (in %), None if no windows."""
+    values = rates[np.isfinite(rates)] * 100
+    if values.size == 0:
+        return None
+    return {
+        "windows": int(values.size),
+        "min": round(float(values.min()), 2),
+        "median": round(float(np.median(values)), 2),
+        "max": round(float(values.max()), 2),
+        "pct_positive": round(float((values > 0).mean() * 100), 2),
+    }
+
+
+def calculate_rolling_returns(dates, navs, windows=ROLLING_WINDOWS):
+    """
+    Rolling lumpsum CAGR and SIP XIRR summaries for a prepared NAV series.
+
+    `dates`/`navs` are the sorted, split-adjusted arrays from prepare_nav.
+    Returns {window: {"lumpsum": summary, "sip": summary}}; windows longer than
+    the history map to None.
+    """
+    if navs is None or len(navs) < 2:
+        return {label: None for label in windows}
+
+    day_numbers = _day_numbers(dates)
+    navs = np.asarray(navs, dtype=float)
+    out = {}
+    for label, days in windows.items():
+        if day_numbers[-1] - day_numbers[0] < days:
+            out[label] = None
+            continue
+        out[label] = {
+            "lumpsum": summarize(rolling_lumpsum(day_numbers, navs, days)),
+            "sip": summarize(rolling_sip(day_numbers, navs, days)),
+        }
+    return out
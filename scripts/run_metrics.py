@@ -0,0 +1,189 @@
+"""
+run_metrics.py
+Per-stage timing and counters for the nightly refresh.
+
+- METRICS is the process-wide collector; update_data records fetch, parse,
+  split_scan, compute and analytics timings per scheme, plus bytes downloaded,
+  retries and failure reasons
+- Timings are attributed to the scheme passed explicitly or to the one set
+  with `with METRICS.scheme(code):` on the current thread
+- Worker processes hand their samples back with drain(); the parent merge()s them
+- summary() gives p50/p95/p99 per stage, the slowest schemes and the
+  process's peak RSS; write() saves it as JSON for the machine-readable
+  metrics file
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:          # not available on Windows
+    resource = None
+
+SLOWEST_SCHEMES = 10
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+class RunMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+        # Forked workers start clean: fresh lock, no samples inherited from the parent
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.samples = []               # (stage, code, seconds)
+            self.counters = Counter()
+            self.failures = {}              # code -> reason
+
+    # ----------------------------------------------------------------
+    # Recording
+    # ----------------------------------------------------------------
+    @contextmanager
+    def scheme(self, code):
+        """Attribute timings recorded on this thread to `code` while the block runs."""
+        previous = getattr(self._local, "code", None)
+        self._local.code = str(code)
+        try:
+            yield
+        finally:
+            self._local.code = previous
+
+    def record(self, stage, seconds, code=None):
+        code = str(code) if code is not None else getattr(self._local, "code", None)
+        with self._lock:
+            self.samples.append((stage, code, seconds))
+
+    @contextmanager
+    def timer(self, stage, code=None):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - t0, code)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def fail(self, code, reason):
+        with self._lock:
+            self.failures[str(code)] = reason
+
+    # ----------------------------------------------------------------
+    # Cross-process hand-off
+    # ----------------------------------------------------------------
+    def drain(self):
+        """Return and clear everything recorded so far (for shipping out of a worker)."""
+        with self._lock:
+            state = (self.samples, dict(self.counters), self.failures)
+            self.samples, self.counters, self.failures = [], Counter(), {}
+        return state
+
+    def merge(self, state):
+        samples, counters, failures = state
+        with self._lock:
+            self.samples.extend(samples)
+            self.counters.update(counters)
+            self.failures.update(failures)
+
+    # ----------------------------------------------------------------
+    # Reporting
+    # ----------------------------------------------------------------
+    def summary(self, slowest=SLOWEST_SCHEMES):
+        with self._lock:
+            samples = list(self.samples)
+            counters = dict(self.counters)
+            failures = dict(self.failures)
+
+        by_stage = defaultdict(list)
+        by_scheme = defaultdict(lambda: defaultdict(float))
+        for stage, code, seconds in samples:
+            by_stage[stage].append(seconds)
+            if code is not None:
+                by_scheme[code][stage] += seconds
+
+        stages = {}
+        for stage, values in by_stage.items():
+            ms = np.array(values) * 1e3
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            stages[stage] = {
+                "count": int(ms.size),
+                "total_s": round(float(ms.sum()) / 1e3, 3),
+                "p50_ms": round(float(p50), 3),
+                "p95_ms": round(float(p95), 3),
+                "p99_ms": round(float(p99), 3),
+                "max_ms": round(float(ms.max()), 3),
+            }
+
+        ranked = sorted(by_scheme.items(), key=lambda item: sum(item[1].values()), reverse=True)
+        return {
+            "started_at": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "elapsed_s": round(time.time() - self.started, 3),
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": stages,
+            "counters": counters,
+            "failure_reasons": dict(Counter(failures.values()).most_common()),
+            "failed_schemes": failures,
+            "slowest_schemes": [
+                {
+                    "scheme_code": code,
+                    "total_ms": round(sum(parts.values()) * 1e3, 3),
+                    "stages": {stage: round(s * 1e3, 3) for stage, s in parts.items()},
+                }
+                for code, parts in ranked[:slowest]
+            ],
+        }
+
+    def print_summary(self, summary=None):
+        summary = summary or self.summary()
+        peak = f", peak RSS {summary['peak_rss_mb']:.0f} MB" if summary.get("peak_rss_mb") else ""
+        print(f"\n📈 Run metrics ({summary['elapsed_s']:.1f}s wall clock{peak})")
+        print(f"   {'stage':<14} {'count':>7} {'total s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for stage, s in summary["stages"].items():
+            print(f"   {stage:<14} {s['count']:>7} {s['total_s']:>9.2f} "
+                  f"{s['p50_ms']:>9.2f} {s['p95_ms']:>9.2f} {s['p99_ms']:>9.2f}")
+        for name, value in summary["counters"].items():
+            print(f"   {name}: {value}")
+        if summary["failure_reasons"]:
+            print("   ❌ Failures:")
+            for reason, n in summary["failure_reasons"].items():
+                print(f"      {n:>6} × {reason}")
+        if summary["slowest_schemes"]:
+            print("   🐢 Slowest schemes:")
+            for s in summary["slowest_schemes"]:
+                parts = ", ".join(f"{k} {v:.0f}ms" for k, v in s["stages"].items())
+                print(f"      {s['scheme_code']}: {s['total_ms']:.0f}ms ({parts})")
+
+    def write(self, path, summary=None):
+        with open(path, "w") as f:
+            json.dump(summary or self.summary(), f, indent=2)
+
+
+METRICS = RunMetrics()
@@ -0,0 +1,67 @@
+import asyncio
+import os
+import sys
+import threading
+
+import pytest
+
+# The scripts import their siblings by bare module name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class NavServer:
+    """
+    mfapi-shaped server on a background loop that counts the requests it answered.
+
+    respond(code, query) → JSON payload, or an int HTTP status to fail with.
+    """
+
+    def __init__(self, respond):
+        from aiohttp import web
+
+        self.web = web
+        self.respond = respond
+        self.served = 0
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+        threading.Thread(target=self._serve, args=(started,), daemon=True).start()
+        started.wait(5)
+        self.base_url = f"http://127.0.0.1:{self.port}/mf/"
+
+    async def handle(self, request):
+        self.served += 1
+        answer = self.respond(request.match_info["code"], dict(request.query))
+        if isinstance(answer, int):
+            return self.web.Response(status=answer)
+        return self.web.json_response(answer)
+
+    def _serve(self, started):
+        asyncio.set_event_loop(self.loop)
+        app = self.web.Application()
+        app.router.add_get("/mf/{code}", self.handle)
+        self.runner = self.web.AppRunner(app)
+        self.loop.run_until_complete(self.runner.setup())
+        site = self.web.TCPSite(self.runner, "127.0.0.1", 0)
+        self.loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        started.set()
+        self.loop.run_forever()
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+@pytest.fixture
+def nav_server():
+    """Factory: nav_server(respond) starts a NavServer, stopped after the test."""
+    pytest.importorskip("aiohttp")
+    servers = []
+
+    def start(respond):
+        servers.append(NavServer(respond))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
@@ -0,0 +1,59 @@
+import asyncio
+import contextlib
+import time
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from async_fetcher import AdaptiveLimiter, AsyncNavFetcher, iter_nav_payloads
+
+JOBS = 1000
+MAX_PENDING = 8
+BUFFER = 4
+
+
+@pytest.fixture
+def server(nav_server):
+    return nav_server(lambda code, query: {"meta": {"scheme_code": code},
+                                           "data": [{"date": "30-06-2025", "nav": "10.0"}]})
+
+
+def wait_settled(server, seconds=1.0):
+    """Let the fetcher run ahead of a stalled consumer as far as it can."""
+    deadline = time.monotonic() + seconds
+    last = -1
+    while time.monotonic() < deadline and server.served != last:
+        last = server.served
+        time.sleep(0.2)
+    return server.served
+
+
+def test_stream_in_flight_plus_buffered_stays_bounded(server):
+    async def consume_one_then_stall():
+        fetcher = AsyncNavFetcher(base_url=server.base_url, max_pending=MAX_PENDING,
+                                  limiter=AdaptiveLimiter(initial=MAX_PENDING))
+        stream = fetcher.stream((str(code), None) for code in range(JOBS))
+        first = await stream.__anext__()
+        await asyncio.sleep(1.0)
+        in_flight = fetcher.limiter.in_flight
+        await stream.aclose()
+        return first, in_flight
+
+    first, in_flight = asyncio.run(consume_one_then_stall())
+    assert first.data is not None
+    # One result consumed; everything else answered is in flight or waiting in the queue
+    assert server.served - 1 + in_flight <= MAX_PENDING
+
+
+def test_sync_wrapper_pauses_for_stalled_consumer(server):
+    results = iter_nav_payloads([(str(code), None) for code in range(JOBS)], buffer=BUFFER,
+                                base_url=server.base_url, max_pending=MAX_PENDING)
+    with contextlib.closing(results):
+        assert next(results).data is not None
+        served = wait_settled(server)
+        assert served <= 1 + BUFFER + 1 + MAX_PENDING
+
+        # Resuming the consumer drains the whole run
+        assert sum(1 for r in results if r.data is not None) == JOBS - 1
+    assert server.served == JOBS
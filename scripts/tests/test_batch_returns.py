@@ -0,0 +1,22 @@
+import pytest
+
+from parity_check import CORPUS_FILE, _frame, check, compare_results, load_corpus, resolve_engine
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    return load_corpus(CORPUS_FILE)
+
+
+@pytest.mark.parametrize("engine", ["scheme", "batch"])
+def test_engine_matches_golden_corpus(corpus, engine):
+    assert check(resolve_engine(engine), corpus) == {}
+
+
+def test_batch_matches_per_scheme_engine(corpus):
+    frames = {c["name"]: _frame(c["dates"], c["navs"]) for c in corpus["cases"]}
+    per_scheme = resolve_engine("scheme")(frames)
+    batch = resolve_engine("batch")(frames)
+    assert set(batch) == set(per_scheme)
+    mismatched = {name: diffs for name in frames if (diffs := compare_results(per_scheme[name], batch[name]))}
+    assert mismatched == {}
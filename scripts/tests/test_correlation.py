@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_returns import adjust_splits_matrix, build_nav_matrix
+from correlation import CorrelationIndex, correlation_matrix, daily_returns, save_matrix
+
+DAYS = 400
+SCHEMES = 9
+
+
+@pytest.fixture
+def returns():
+    """Correlated daily returns; schemes launch, stop or skip days at different points."""
+    rng = np.random.default_rng(11)
+    market = rng.normal(0.0005, 0.01, DAYS)
+    out = np.empty((DAYS, SCHEMES), dtype=np.float32)
+    for s in range(SCHEMES):
+        out[:, s] = (0.2 + 0.1 * s) * market + rng.normal(0.0003 * s, 0.008, DAYS)
+    out[:150, 1] = np.nan                   # launched late
+    out[300:, 2] = np.nan                   # stopped publishing
+    out[rng.random(DAYS) < 0.1, 3] = np.nan # gappy
+    out[:330, 4] = np.nan                   # too young to overlap MIN_OVERLAP days
+    out[150:, 5] *= 3                       # volatility regime change
+    out[:, 6] = 0.001                       # flat
+    return out
+
+
+def overlap_pearson(returns, i, j, min_overlap):
+    both = np.isfinite(returns[:, i]) & np.isfinite(returns[:, j])
+    if both.sum() < min_overlap:
+        return np.nan
+    x, y = returns[both, i].astype(np.float64), returns[both, j].astype(np.float64)
+    if x.std() == 0 or y.std() == 0:
+        return np.nan
+    return np.corrcoef(x, y)[0, 1]
+
+
+@pytest.mark.parametrize("block_size", [2, 512])
+def test_matches_corrcoef_on_each_pair_overlap(returns, block_size):
+    corr = correlation_matrix(returns, min_overlap=60, block_size=block_size)
+    for i in range(SCHEMES):
+        for j in range(SCHEMES):
+            if i == j:
+                continue
+            expected = overlap_pearson(returns, i, j, 60)
+            if np.isnan(expected):
+                assert np.isnan(corr[i, j]), (i, j)
+            else:
+                assert corr[i, j] == pytest.approx(expected, abs=1e-4), (i, j)
+    assert np.allclose(corr, corr.T, equal_nan=True)
+
+
+def test_index_reloads_rebuilt_matrices(tmp_path):
+    directory = str(tmp_path)
+    save_matrix(directory, "equity", ["1", "2", "3"],
+                np.array([[1, 0.9, 0.1], [0.9, 1, 0.2], [0.1, 0.2, 1]], dtype=np.float32))
+    index = CorrelationIndex(directory)
+    assert index.most_similar("1", 1) == [("2", 0.9)]
+    assert not index.refresh()
+
+    save_matrix(directory, "equity", ["1", "2", "3", "4"],
+                np.array([[1, 0.1, 0.3, 0.8], [0.1, 1, 0.2, 0.0], [0.3, 0.2, 1, 0.0], [0.8, 0.0, 0.0, 1]],
+                         dtype=np.float32))
+    assert index.refresh()
+    assert "4" in index
+    assert index.most_similar("1", 1) == [("4", 0.8)]
+
+
+def test_daily_returns_matches_full_history_alignment():
+    rng = np.random.default_rng(5)
+    days = pd.bdate_range("2015-01-01", "2024-12-31")
+    frames = {}
+    for code in range(6):
+        navs = 10 * np.cumprod(1 + rng.normal(0.0004, 0.01, days.size))
+        frames[code] = pd.DataFrame({"nav": navs}, index=days)
+    frames[0].iloc[days.searchsorted(pd.Timestamp("2023-06-01")):, 0] /= 10  # split inside the window
+    frames[1].iloc[days.searchsorted(pd.Timestamp("2018-06-01")):, 0] /= 2   # split before it
+    frames[2] = frames[2].iloc[::3]                                             # gappy
+    frames[3] = frames[3].loc[:"2021-06-30"]                                    # stopped before it
+    frames[4] = frames[4].loc["2023-01-01":]                                    # launched inside it
+    frames[5] = frames[5].loc[:"2021-12-31"].drop(pd.Timestamp("2021-12-31")).iloc[::-1]  # unsorted
+
+    codes, returns = daily_returns(frames, lookback_days=365 * 3)
+
+    # Reference: align and split-adjust the whole history, then cut to the window
+    dates, all_codes, navs, has_nav = build_nav_matrix(frames)
+    start = dates.searchsorted(dates[-1] - pd.Timedelta(days=365 * 3))
+    adjusted = adjust_splits_matrix(navs)[start:]
+    expected = adjusted[1:] / adjusted[:-1] - 1
+    expected[~has_nav[start + 1:]] = np.nan
+
+    assert codes == all_codes
+    np.testing.assert_allclose(returns, expected.astype(np.float32), rtol=1e-6, equal_nan=True)
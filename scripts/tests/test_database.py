@@ -0,0 +1,133 @@
+"""
+COPY/merge paths of reference/database.py against a real Postgres.
+
+Set TEST_DATABASE_URL (e.g. postgresql://postgres@localhost/postgres) to run;
+every test works in a throwaway schema. TEST_DB_SSLMODE defaults to "prefer".
+"""
+
+import os
+import sys
+import uuid
+
+import pytest
+
+DSN = os.getenv("TEST_DATABASE_URL")
+if not DSN:
+    pytest.skip("TEST_DATABASE_URL not set", allow_module_level=True)
+
+# database.py connects its module-level singleton on import; point it at the test DSN
+os.environ["DATABASE_URL"] = DSN
+os.environ["DB_SSLMODE"] = os.getenv("TEST_DB_SSLMODE", "prefer")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "reference"))
+
+import psycopg2  # noqa: E402
+
+import database  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    schema = f"test_{uuid.uuid4().hex[:8]}"
+    d = database.Database()
+    d.cursor.execute(f"CREATE SCHEMA {schema}; SET search_path TO {schema};")
+    d.conn.commit()
+    d.init_db()
+    yield d
+    d.conn.rollback()
+    d.cursor.execute(f"DROP SCHEMA {schema} CASCADE;")
+    d.conn.commit()
+    d.close()
+
+
+def fetch(db, query, params=None):
+    db.cursor.execute(query, params)
+    rows = db.cursor.fetchall()
+    db.conn.commit()
+    return rows
+
+
+def test_metadata_merge_keeps_last_duplicate_and_skips_missing_codes(db):
+    db.upsert_metadata([
+        {"scheme_code": 1, "scheme_name": 'Alpha, "Growth"', "plan": float("nan"), "type": "Mutual Fund"},
+        {"scheme_code": None, "scheme_name": "no code"},
+        {"scheme_name": "no key"},
+        {"scheme_code": 2.0, "scheme_name": "Beta\nline two", "category": ""},
+        {"scheme_code": "1", "scheme_name": "Alpha 2", "type": "ETF"},
+    ])
+    db.upsert_metadata([{"scheme_code": "2", "scheme_name": "Beta 2"}])
+
+    rows = fetch(db, "SELECT scheme_code, scheme_name, category, plan, type FROM fund_metadata ORDER BY scheme_code;")
+
+    assert [dict(r) for r in rows] == [
+        {"scheme_code": "1", "scheme_name": "Alpha 2", "category": None, "plan": None, "type": "ETF"},
+        {"scheme_code": "2", "scheme_name": "Beta 2", "category": None, "plan": None, "type": None},
+    ]
+
+
+def test_returns_merge_round_trips_json_and_touches_updated_at(db):
+    results = {"1Y": 12.34, "3Y": None, "rolling": {"1Y": {"min": -1.5}}, "name": 'x, "y"'}
+    assert db.upsert_fund_results_many([(101, "Fund", results, {"type": "ETF", "plan": "Direct"})]) == 1
+    first = fetch(db, "SELECT updated_at FROM fund_returns WHERE scheme_code = '101';")[0]["updated_at"]
+
+    db.upsert_fund_results_json("101", "Fund", {"1Y": 5.0})
+    rows = db.get_precomputed_returns_many([101, 999])
+
+    assert len(rows) == 1
+    assert rows[0]["results_json"] == {"1Y": 5.0}
+    assert rows[0]["updated_at"] > first
+    assert fetch(db, "SELECT type, plan FROM fund_returns;")[0] == {"type": None, "plan": None}
+
+
+def test_failed_merge_rolls_back(db):
+    with pytest.raises(psycopg2.Error):
+        db._bulk_merge("fund_metadata", ["scheme_code", "no_such_column"], [("1", "x")], "scheme_code")
+
+    assert fetch(db, "SELECT COUNT(*) AS n FROM fund_metadata;")[0]["n"] == 0
+
+
+def test_failed_read_leaves_the_connection_usable(db):
+    db.cursor.execute("ALTER TABLE fund_returns RENAME TO fund_returns_moved;")
+    db.conn.commit()
+
+    with pytest.raises(psycopg2.errors.UndefinedTable):
+        db.get_precomputed_returns_many(["1"])
+    db.cursor.execute("ALTER TABLE fund_returns_moved RENAME TO fund_returns;")
+    db.conn.commit()
+
+    assert db.get_precomputed_returns_many(["1"]) == []
+
+
+def test_top_performers_fall_back_when_rankings_are_stale(db):
+    db.upsert_metadata([
+        {"scheme_code": str(code), "scheme_name": f"Fund {code}", "category": "Equity",
+         "plan": "Direct", "option": "Growth", "type": "Mutual Fund"}
+        for code in (1, 2, 3)
+    ])
+    db.upsert_fund_results_many([(code, f"Fund {code}", {"1Y": ret}, None) for code, ret in ((1, 10), (2, 20), (3, 5))])
+    db.refresh_rankings(["1Y"])
+
+    def top():
+        return [r["scheme_code"] for r in db.get_top_performers("Mutual Fund", ["Equity"], "1Y", "Direct", "Growth")]
+
+    assert top() == ["2", "1"]
+
+    # A returns write after the refresh makes the rankings stale: live query
+    db.upsert_fund_results_many([(3, "Fund 3", {"1Y": 30}, None)])
+    assert top() == ["3", "2"]
+
+
+def test_data_versions_are_shared_between_connections(db):
+    other = database.Database()
+    schema = fetch(db, "SHOW search_path;")[0]["search_path"]
+    other.cursor.execute(f"SET search_path TO {schema};")
+    try:
+        assert other.get_data_versions() == {}
+
+        db.bump_data_versions(["returns", "filters"])
+        db.bump_data_versions(["returns"])
+        versions = other.get_data_versions()
+
+        assert {name: version for name, (version, _) in versions.items()} == {"returns": 2, "filters": 1}
+        assert versions["returns"][1] >= versions["filters"][1]
+    finally:
+        other.close()
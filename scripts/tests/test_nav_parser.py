@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import nav_parser
+from nav_parser import DATE_DTYPE, parse_dates, parse_nav_arrays, parse_navs
+
+
+def pandas_dates(values):
+    """The pd.to_datetime path the fast parser replaced."""
+    parsed = pd.to_datetime(pd.Series(values, dtype=object), format="%d-%m-%Y", errors="coerce")
+    return parsed.to_numpy(dtype=DATE_DTYPE), parsed.notna().to_numpy()
+
+
+def assert_dates(values, expected):
+    dates, valid = parse_dates(values)
+    expected = np.array(expected, dtype=DATE_DTYPE)
+    assert np.array_equal(dates, expected, equal_nan=True)
+    assert valid.tolist() == [not np.isnat(d) for d in expected]
+
+
+def test_well_formed_dates():
+    assert_dates(
+        ["01-01-2020", "29-02-2024", "31-12-1999", "15-08-2047"],
+        ["2020-01-01", "2024-02-29", "1999-12-31", "2047-08-15"],
+    )
+
+
+@pytest.mark.parametrize("value", [
+    "", "32-01-2020", "31-04-2020", "29-02-2023", "00-01-2020", "01-13-2020",
+    "01/01/2020", "2020-01-01", "01-01-2020 ", "01-01-20", "1a-01-2020", "N.A.",
+])
+def test_malformed_or_blank_dates_are_invalid(value):
+    dates, valid = parse_dates(["01-01-2020", value])
+
+    assert valid.tolist() == [True, False]
+    assert np.isnat(dates[1])
+
+
+def test_irregular_dates_fall_back_to_pandas():
+    values = ["1-1-2020", "5-11-2021", "01-01-2020", "31-02-2020", "", "१२-०१-२०२०"]
+
+    dates, valid = parse_dates(values)
+    expected_dates, expected_valid = pandas_dates(values)
+
+    assert valid.tolist() == expected_valid.tolist()
+    assert np.array_equal(dates, expected_dates, equal_nan=True)
+
+
+def test_numeric_navs_take_the_fast_path(monkeypatch):
+    monkeypatch.setattr(nav_parser.pd, "to_numeric", None)
+
+    assert parse_navs(["123.45", "0.1", 7]).tolist() == [123.45, 0.1, 7.0]
+
+
+@pytest.mark.parametrize("value", ["N.A.", "1,234.56", "", None, "-"])
+def test_non_numeric_navs_go_through_the_fallback(value):
+    navs = parse_navs(["10.5", value, "11"])
+
+    assert navs[0] == 10.5 and navs[2] == 11.0
+    assert np.isnan(navs[1])
+    expected = pd.to_numeric(pd.Series(["10.5", value, "11"], dtype=object), errors="coerce")
+    assert np.array_equal(navs, expected.to_numpy(dtype=float), equal_nan=True)
+
+
+def test_payload_drops_bad_rows_and_sorts_oldest_first():
+    body = b"""{"meta": {"scheme_name": "Fund"}, "data": [
+        {"date": "03-01-2024", "nav": "12.00"},
+        {"date": "02-01-2024", "nav": "N.A."},
+        {"date": "", "nav": "11.50"},
+        {"date": "31-12-2023", "nav": "0"},
+        {"date": "1-1-2024", "nav": "1,234.56"},
+        {"date": "29-12-2023", "nav": "11.00"}
+    ]}"""
+
+    dates, navs = parse_nav_arrays(body)
+
+    assert dates.astype(str).tolist() == ["2023-12-29", "2024-01-03"]
+    assert navs.tolist() == [11.0, 12.0]
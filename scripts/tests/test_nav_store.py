@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+import pytest
+
+import nav_store
+from nav_store import DATE_DTYPE, NAV_DTYPE, NavStore
+
+
+def history(start, days, scale=1.0):
+    dates = np.arange(np.datetime64(start), np.datetime64(start) + days).astype(DATE_DTYPE)
+    return dates, np.linspace(10, 20, days) * scale
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = NavStore(str(tmp_path))
+    s.replace("1", history("2024-01-01", 30))
+    s.replace("2", history("2024-01-01", 20, 2.0))
+    s.append("1", history("2024-01-31", 5))
+    s.flush()
+    return s
+
+
+def assert_same(actual, expected):
+    assert np.array_equal(actual[0], expected[0])
+    assert np.array_equal(actual[1], expected[1])
+
+
+def test_torn_append_is_trimmed_on_open(store, tmp_path):
+    intact = {code: store.read(code) for code in ("1", "2")}
+    intact = {code: (np.array(d), np.array(n)) for code, (d, n) in intact.items()}
+
+    # Crash after dates.bin got a new segment (plus half a row) but before navs.bin did
+    with open(store.dates_path, "ab") as f:
+        f.write(history("2024-02-05", 7)[0].tobytes() + b"\0" * 3)
+    reopened = NavStore(str(tmp_path))
+    assert os.path.getsize(reopened.dates_path) // DATE_DTYPE.itemsize == reopened._rows
+    assert os.path.getsize(reopened.navs_path) // NAV_DTYPE.itemsize == reopened._rows
+
+    # Later appends line dates and NAVs up again
+    reopened.replace("3", history("2023-06-01", 10, 3.0))
+    for code, arrays in intact.items():
+        assert_same(reopened.read(code), arrays)
+    assert_same(reopened.read("3"), history("2023-06-01", 10, 3.0))
+
+
+def test_segments_past_the_data_are_dropped(store, tmp_path):
+    # Crash that lost the tail of both files after the index was written
+    end = store._rows - 5
+    os.truncate(store.dates_path, end * DATE_DTYPE.itemsize)
+    os.truncate(store.navs_path, (end + 2) * NAV_DTYPE.itemsize)
+
+    reopened = NavStore(str(tmp_path))
+    assert reopened._rows == end
+    assert len(reopened.read("1")[0]) == 30       # appended segment was cut off
+    assert reopened.last_date("1") == np.datetime64("2024-01-30")
+    assert_same(reopened.read("2"), history("2024-01-01", 20, 2.0))
+    assert NavStore(str(tmp_path)).index == reopened.index
+
+
+def test_failed_write_keeps_files_aligned(store, monkeypatch):
+    rows = store._rows
+
+    def interrupted_open(path, mode="r", *args, **kwargs):
+        if path == store.navs_path and mode == "ab":
+            raise KeyboardInterrupt
+        return open(path, mode, *args, **kwargs)
+
+    monkeypatch.setattr(nav_store, "open", interrupted_open, raising=False)
+    with pytest.raises(KeyboardInterrupt):
+        store.append("2", history("2024-03-01", 4))
+    monkeypatch.undo()
+
+    assert store._rows == rows
+    assert os.path.getsize(store.dates_path) == rows * DATE_DTYPE.itemsize
+    assert os.path.getsize(store.navs_path) == rows * NAV_DTYPE.itemsize
+    assert_same(store.read("2"), history("2024-01-01", 20, 2.0))
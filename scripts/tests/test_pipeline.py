@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+import batch_returns
+import pipeline
+import update_data
+from benchmark import synthetic_payload
+from run_metrics import METRICS
+
+
+@pytest.fixture
+def items():
+    rng = np.random.default_rng(7)
+    out = []
+    for i, years in enumerate((1, 3, 5)):
+        code = str(900000 + i)
+        nav_df = update_data.parse_nav_payload(synthetic_payload(rng, code, years)).set_index("date")
+        out.append(({"schemeCode": code, "schemeName": f"Fund {code}"}, nav_df))
+    return out
+
+
+def codes_of(rows):
+    return sorted(row["scheme_code"] for row in rows)
+
+
+def test_batch_failure_falls_back_to_per_scheme(items, monkeypatch):
+    expected, _ = pipeline._compute_chunk("scheme", items)
+
+    def broken(frames):
+        raise RuntimeError("matrix engine down")
+
+    monkeypatch.setattr(batch_returns, "calculate_returns_batch", broken)
+    rows, (_, _, failures) = pipeline._compute_chunk("batch", items)
+    assert codes_of(rows) == codes_of(expected)
+    assert rows == expected
+    assert failures == {}
+
+
+def test_schemes_left_out_by_batch_are_computed(items, monkeypatch):
+    real = batch_returns.calculate_returns_batch
+    skipped = items[0][0]["schemeCode"]
+
+    def partial(frames):
+        out = real(frames)
+        out.pop(skipped)
+        return out
+
+    monkeypatch.setattr(batch_returns, "calculate_returns_batch", partial)
+    rows, _ = pipeline._compute_chunk("batch", items)
+    assert codes_of(rows) == sorted(row["schemeCode"] for row, _ in items)
+
+
+def test_scheme_failing_both_engines_is_recorded(items, monkeypatch):
+    real = update_data.analyze_scheme
+    bad = items[1][1]
+
+    def analyze(nav_df):
+        if nav_df is bad:
+            raise ValueError("unusable history")
+        return real(nav_df)
+
+    def broken(frames):
+        raise RuntimeError("matrix engine down")
+
+    monkeypatch.setattr(batch_returns, "calculate_returns_batch", broken)
+    monkeypatch.setattr(update_data, "analyze_scheme", analyze)
+    rows, (_, _, failures) = pipeline._compute_chunk("batch", items)
+    assert len(rows) == len(items) - 1
+    assert failures == {items[1][0]["schemeCode"]: "compute: ValueError"}
@@ -0,0 +1,115 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "reference"))
+
+flask = pytest.importorskip("flask")
+
+from response_cache import DataVersion, ResponseCache  # noqa: E402
+
+
+class MemoryStore:
+    """Stands in for the data_versions table shared by all workers."""
+
+    def __init__(self):
+        self.versions = {}
+        self.loads = 0
+
+    def bump(self, datasets):
+        for name in datasets:
+            version, _ = self.versions.get(name, (0, 0.0))
+            self.versions[name] = (version + 1, 1000.0 + version)
+
+    def load(self):
+        self.loads += 1
+        return dict(self.versions)
+
+
+def app_for(version):
+    app = flask.Flask(__name__)
+    calls = []
+
+    @app.route("/data")
+    @version.conditional(["returns"])
+    def data():
+        calls.append(1)
+        return {"ok": True}
+
+    return app.test_client(), calls
+
+
+def test_workers_sharing_a_store_agree_on_etags():
+    store = MemoryStore()
+    changed = []
+    a = DataVersion(["returns", "filters"], store=store)
+    b = DataVersion(["returns", "filters"], store=store, on_change=changed.append, refresh=0)
+    client_a, _ = app_for(a)
+    client_b, calls_b = app_for(b)
+
+    etag = client_a.get("/data").headers["ETag"]
+    assert client_b.get("/data", headers={"If-None-Match": etag}).status_code == 304
+    assert calls_b == []
+
+    # A write handled by worker A is seen by worker B on its next read
+    a.bump("returns")
+    response = client_b.get("/data", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == client_a.get("/data").headers["ETag"] != etag
+    assert changed == [["returns"]]
+
+
+def test_shared_stamps_are_reread_at_most_every_refresh_seconds():
+    store = MemoryStore()
+    version = DataVersion(["returns"], store=store, refresh=60)
+
+    first = version.stamp(["returns"])
+    store.bump(["returns"])                 # another worker's write
+    assert version.stamp(["returns"]) == first
+    assert store.loads == 1
+
+    version.bump("returns")                 # own writes re-read at once
+    assert version.stamp(["returns"])[0] == "s-2"
+
+
+def test_unreadable_store_serves_untagged_responses():
+    class Down(MemoryStore):
+        def load(self):
+            raise ConnectionError("db down")
+
+    client, calls = app_for(DataVersion(["returns"], store=Down()))
+    response = client.get("/data", headers={"If-None-Match": 'W/"anything"'})
+
+    assert response.status_code == 200 and "ETag" not in response.headers
+    assert calls == [1]
+
+
+def test_process_local_versions_are_off_with_several_workers(monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    client, _ = app_for(DataVersion(["returns"]))
+    assert "ETag" not in client.get("/data").headers
+
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    client, _ = app_for(DataVersion(["returns"]))
+    etag = client.get("/data").headers["ETag"]
+    assert client.get("/data", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_invalidate_where_drops_only_matching_entries():
+    cache = ResponseCache()
+    args = flask.Flask(__name__).test_request_context
+    keys = {}
+    for code in ("101", "102"):
+        with args(f"/?code={code}"):
+            keys[code] = cache.key("periodic_returns", flask.request.args)
+        cache.put(keys[code], b"{}", "application/json", 60, cache.generation("periodic_returns"))
+    with args("/?limit=5"):
+        summary = cache.key("returns_summary", flask.request.args)
+    cache.put(summary, b"[]", "application/json", 60, 0)
+
+    cache.invalidate("periodic_returns", where={"code": [" 101"]})
+
+    assert cache.get(keys["101"]) is None
+    assert cache.get(keys["102"]) is not None
+    assert cache.get(summary) is not None
@@ -0,0 +1,54 @@
+import csv
+
+from result_writer import ResultWriter
+
+
+def row(code):
+    return {"scheme_code": code, "scheme_name": f"Fund, {code}", "1Y": 12.5}
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [r["scheme_code"] for r in csv.DictReader(f)]
+
+
+def test_resume_drops_torn_and_unchecked_rows(tmp_path):
+    output = str(tmp_path / "precomputed_clean.csv")
+    writer = ResultWriter(output)
+    writer.write(row("101"))
+    writer.write(row("102"))
+    writer._data.close()
+    writer._checkpoint.close()
+
+    # Crash mid-run: a row on disk whose code never reached the checkpoint,
+    # then a torn last line inside a quoted field, then a torn checkpoint line
+    with open(output + ".partial", "a", newline="", encoding="utf-8") as f:
+        f.write('103,"Fund, 103",9.1\r\n104,"Fund, 1')
+    with open(output + ".checkpoint", "a", encoding="utf-8") as f:
+        f.write("10")
+
+    resumed = ResultWriter(output, resume=True)
+    assert resumed.done == {"101", "102"}
+    assert read_rows(output + ".partial") == ["101", "102"]
+
+    resumed.write(row("103"))
+    resumed.write(row("104"))
+    with open(output + ".checkpoint", encoding="utf-8") as f:
+        assert f.read().split("\n")[1:] == ["101", "102", "103", "104", ""]
+    assert resumed.close() == 4
+    assert read_rows(output) == ["101", "102", "103", "104"]
+    assert not (tmp_path / "precomputed_clean.csv.partial").exists()
+    assert not (tmp_path / "precomputed_clean.csv.checkpoint").exists()
+
+
+def test_stale_checkpoint_starts_over(tmp_path):
+    output = str(tmp_path / "precomputed_clean.csv")
+    (tmp_path / "precomputed_clean.csv.partial").write_text("scheme_code\n101\n")
+    (tmp_path / "precomputed_clean.csv.checkpoint").write_text("date=2000-01-01\n101\n")
+
+    writer = ResultWriter(output, resume=True)
+    assert writer.done == set()
+
+    writer.write(row("102"))
+    assert writer.close() == 1
+    assert read_rows(output) == ["102"]
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from risk_metrics import MIN_OBSERVATIONS, RISK_FREE_RATE, TRADING_DAYS, calculate_risk_metrics, max_drawdown
+
+
+def calendar(n, start="2023-01-01"):
+    return np.arange(np.datetime64(start), np.datetime64(start) + n)
+
+
+def test_drawdown_peak_trough_and_recovery():
+    navs = np.array([100.0, 110.0, 99.0, 104.5, 121.0, 120.0])
+
+    assert max_drawdown(calendar(6), navs) == (
+        pytest.approx(-0.1), "2023-01-02", "2023-01-03", "2023-01-05",
+    )
+
+
+def test_drawdown_takes_the_deepest_fall_not_the_first():
+    navs = np.array([100.0, 95.0, 120.0, 90.0, 130.0])
+
+    drawdown, peak, trough, recovery = max_drawdown(calendar(5), navs)
+
+    assert drawdown == pytest.approx(-0.25)
+    assert (peak, trough, recovery) == ("2023-01-03", "2023-01-04", "2023-01-05")
+
+
+def test_drawdown_without_recovery():
+    navs = np.array([100.0, 120.0, 90.0, 110.0])
+
+    assert max_drawdown(calendar(4), navs)[1:] == ("2023-01-02", "2023-01-03", None)
+
+
+def test_rising_series_has_no_drawdown():
+    assert max_drawdown(calendar(3), np.array([1.0, 2.0, 3.0])) == (0.0, None, None, None)
+
+
+def test_alternating_returns():
+    # +1%, −1%, … for 80 days: mean return 0, every second day below the risk-free rate
+    returns = np.tile([0.01, -0.01], 40)
+    navs = 100 * np.cumprod(np.concatenate(([1.0], 1 + returns)))
+
+    metrics = calculate_risk_metrics(calendar(navs.size), navs)
+
+    volatility = 0.01 * np.sqrt(80 / 79) * np.sqrt(TRADING_DAYS)
+    downside = np.sqrt(0.5) * (0.01 + RISK_FREE_RATE / TRADING_DAYS) * np.sqrt(TRADING_DAYS)
+    assert metrics == {
+        "window_start": "2023-01-01",
+        "window_end": "2023-03-22",
+        "volatility": round(volatility * 100, 2),
+        "downside_deviation": round(downside * 100, 2),
+        "sharpe": round(-RISK_FREE_RATE / volatility, 3),
+        "sortino": round(-RISK_FREE_RATE / downside, 3),
+        # peaks after the first +1%, then loses 0.01% per pair of days to the end
+        "max_drawdown": round((0.9999 ** 40 / 1.01 - 1) * 100, 2),
+        "drawdown_peak": "2023-01-02",
+        "drawdown_trough": "2023-03-22",
+        "drawdown_recovery": None,
+    }
+
+
+def test_only_the_lookback_window_is_used():
+    # a crash long before the window must not show up in the metrics
+    navs = np.concatenate(([100.0, 50.0], 50 * 1.001 ** np.arange(1, 101)))
+    dates = np.concatenate((calendar(2, "2019-01-01"), calendar(100, "2023-01-01")))
+
+    metrics = calculate_risk_metrics(dates, navs, lookback_days=99)
+
+    assert metrics["window_start"] == "2023-01-01"
+    assert metrics["volatility"] == 0.0
+    assert metrics["max_drawdown"] == 0.0
+
+
+def test_too_few_observations():
+    navs = 100 * 1.001 ** np.arange(MIN_OBSERVATIONS)
+
+    assert calculate_risk_metrics(calendar(navs.size), navs) is None
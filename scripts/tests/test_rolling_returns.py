@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from rolling_returns import _day_numbers, _instalment_days, calculate_rolling_returns, rolling_lumpsum, rolling_sip
+
+
+def daily_series(start, end, annual_rate):
+    """Calendar-daily NAVs compounding at exactly `annual_rate` per 365 days."""
+    dates = np.arange(np.datetime64(start), np.datetime64(end))
+    day_numbers = _day_numbers(dates)
+    return day_numbers, 10 * (1 + annual_rate) ** ((day_numbers - day_numbers[0]) / 365)
+
+
+def test_lumpsum_sells_at_first_nav_on_or_after_window_end():
+    day_numbers = np.array([0, 1, 365, 366, 730])
+    navs = np.array([10.0, 10.0, 11.0, 12.0, 12.1])
+
+    rates = rolling_lumpsum(day_numbers, navs, 365)
+
+    # 0→365: 11/10, 1→366: 12/10, 365→730: 12.1/11; 366 and 730 have no complete window
+    assert rates == pytest.approx([0.1, 0.2, 0.1])
+
+
+def test_lumpsum_annualizes_over_the_actual_holding_period():
+    day_numbers = np.array([0, 400])
+    navs = np.array([10.0, 12.0])
+
+    assert rolling_lumpsum(day_numbers, navs, 365) == pytest.approx([1.2 ** (365 / 400) - 1])
+
+
+def test_instalments_clamp_to_month_end():
+    start = _day_numbers(np.array(["2021-01-31", "2021-03-15"]))
+
+    days = _instalment_days(start, 3).astype("datetime64[D]").astype(str)
+
+    assert days.tolist() == [
+        ["2021-01-31", "2021-02-28", "2021-03-31"],
+        ["2021-03-15", "2021-04-15", "2021-05-15"],
+    ]
+
+
+def test_sip_covers_every_start_date():
+    day_numbers, navs = daily_series("2020-01-01", "2022-01-01", 0.12)
+
+    rates = rolling_sip(day_numbers, navs, 365)
+
+    # every calendar day up to one year before the last NAV starts a window
+    assert rates.size == np.count_nonzero(day_numbers + 365 <= day_numbers[-1])
+    # each instalment compounds at 12%, so the SIP XIRR is 12% as well
+    assert rates == pytest.approx(np.full(rates.size, 0.12), abs=1e-6)
+
+
+def test_sip_on_flat_nav_is_zero():
+    day_numbers, navs = daily_series("2020-01-01", "2021-06-01", 0.0)
+
+    assert rolling_sip(day_numbers, navs, 365) == pytest.approx(0.0, abs=1e-6)
+
+
+def test_sip_with_no_complete_window_is_empty():
+    day_numbers, navs = daily_series("2020-01-01", "2020-06-01", 0.1)
+
+    assert rolling_sip(day_numbers, navs, 365).size == 0
+
+
+def test_summary_per_window():
+    dates = np.arange(np.datetime64("2019-01-01"), np.datetime64("2021-01-01"))
+    _, navs = daily_series("2019-01-01", "2021-01-01", 0.08)
+
+    out = calculate_rolling_returns(dates, navs, windows={"1Y": 365, "3Y": 365 * 3})
+
+    assert out["3Y"] is None
+    lumpsum, sip = out["1Y"]["lumpsum"], out["1Y"]["sip"]
+    assert lumpsum == {"windows": 366, "min": 8.0, "median": 8.0, "max": 8.0, "pct_positive": 100.0}
+    assert sip == {"windows": 366, "min": 8.0, "median": 8.0, "max": 8.0, "pct_positive": 100.0}
@@ -0,0 +1,137 @@
+import itertools
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "reference"))
+
+from scheme_index import FACET_FIELDS, FILTER_FIELDS, SchemeIndex  # noqa: E402
+
+NAN = np.nan
+ROWS = [
+    # code, name, AMC, category, subcategory, plan, option, type
+    (101, "Alpha Bluechip Fund", "Alpha AMC", "Equity Scheme", "Large Cap Fund", "Direct", "Growth", "Mutual Fund"),
+    (102, "Alpha Bluechip Fund", "Alpha AMC", "Equity Scheme", "Large Cap Fund", "Regular", "IDCW", "Mutual Fund"),
+    (103, "Alpha Nifty ETF", "Alpha AMC", "Other Scheme", "Index ETF", NAN, "Growth", "ETF"),
+    (104, "Beta Liquid Fund", "Beta Mutual Fund", "Debt Scheme", "Liquid Fund", " direct", "growth", "Mutual Fund"),
+    (105, "Beta Gilt Fund", "Beta Mutual Fund", "Debt Scheme", "Gilt Fund", "Regular", NAN, "Mutual Fund"),
+    (106, "Gamma Hybrid Fund", NAN, "Hybrid Scheme", "Aggressive Hybrid Fund", "Direct", "Growth", "Mutual Fund"),
+    (107, "Gamma Gold ETF", "Gamma AMC", "Other Scheme", "Gold ETF", NAN, NAN, "ETF"),
+    (108, "Delta Small Cap", "Delta AMC", NAN, "Small Cap Fund", "Direct Plan", "Growth", "Mutual Fund"),
+    (101, "Alpha Bluechip Fund", "Alpha AMC", "Equity Scheme", "Large Cap Fund", "Direct", "Growth", "Mutual Fund"),
+    (104, "Beta Liquid Fund (old)", "Beta Mutual Fund", "Debt Scheme", "Liquid Fund", "Regular", "IDCW", "Mutual Fund"),
+    (109, NAN, "Delta AMC", "Equity Scheme", "Small Cap Fund", "Regular", "Growth", "Mutual Fund"),
+]
+COLUMNS = ["schemeCode", "schemeName", "AMC", "schemeCategory", "schemeSubCategory", "Plan", "Option", "instrumentType"]
+
+# Selections per filter, including substrings, case/whitespace variants and misses
+CHOICES = {
+    "amc": [[], ["alpha amc"], ["BETA"], ["amc"], ["alpha", "delta"], ["nan"]],
+    "category": [[], ["equity scheme"], ["scheme"], ["Debt Scheme", "hybrid"]],
+    "subcategory": [[], ["fund"], ["etf"], ["cap"], [" Liquid Fund "]],
+    "plan": [[], ["direct"], ["regular"], ["plan"], ["direct", "regular"]],
+    "option": [[], ["growth"], ["idcw"], ["GROWTH", "idcw"]],
+}
+
+
+@pytest.fixture(scope="module")
+def df():
+    return pd.DataFrame(ROWS, columns=COLUMNS)
+
+
+@pytest.fixture(scope="module")
+def index(df):
+    return SchemeIndex(df, lambda r: {"schemeCode": str(r["schemeCode"])})
+
+
+def filter_mask(df, field, values):
+    """The CSV path: any selected value is a substring of the normalized column; NaN never matches."""
+    values = [v.lower().strip() for v in values if v]
+    if not values:
+        return np.ones(len(df), dtype=bool)
+    norm = df[FILTER_FIELDS[field]].str.strip().str.lower()
+    return np.array([isinstance(x, str) and any(v in x for v in values) for x in norm])
+
+
+def type_mask(df, type_):
+    if type_.lower() == "both":
+        return np.ones(len(df), dtype=bool)
+    return (df["instrumentType"].str.lower().str.strip() == type_.lower().strip()).to_numpy(copy=True)
+
+
+def expected_rows(df, type_, filters, q):
+    mask = type_mask(df, type_)
+    for field, values in filters.items():
+        mask &= filter_mask(df, field, values)
+    if q:
+        mask &= np.any([df[c].str.lower().str.contains(q, regex=False, na=False).to_numpy()
+                        for c in ["schemeName", "AMC", "schemeCategory", "schemeSubCategory"]], axis=0)
+    return df[mask].drop_duplicates(subset=["schemeCode"]).index.tolist()
+
+
+def expected_facets(df, type_, filters):
+    """Per facet: schemes per value among rows matching the type and every *other* facet's selection."""
+    out = {}
+    for field in FACET_FIELDS:
+        mask = type_mask(df, type_)
+        for other, values in filters.items():
+            if other != field:
+                mask &= filter_mask(df, other, values)
+        column = FILTER_FIELDS[field]
+        counts = df[mask].dropna(subset=[column]).groupby(column)["schemeCode"].nunique()
+        out[field] = {value: int(n) for value, n in counts.sort_index().items()}
+    return out
+
+
+def selections(sample=100):
+    """Every single-filter selection plus a fixed random sample of combinations."""
+    fields = list(CHOICES)
+    combos = list(itertools.product(*(range(len(CHOICES[f])) for f in fields)))
+    picked = [c for c in combos if sum(i > 0 for i in c) <= 1]
+    rng = np.random.default_rng(21)
+    picked += [combos[i] for i in rng.choice(len(combos), sample, replace=False)]
+    for picks in picked:
+        yield {f: CHOICES[f][i] for f, i in zip(fields, picks)}
+
+
+@pytest.mark.parametrize("type_", ["both", "Mutual Fund", "etf"])
+def test_filters_match_dataframe(df, index, type_):
+    for filters in selections():
+        rows = index.rows_for(index.match(type_, filters))
+        assert rows.tolist() == expected_rows(df, type_, filters, None), filters
+
+
+@pytest.mark.parametrize("q", ["a", "fund", "alpha b", "etf", "equity", "cap fund", "(old)", "zzz", "nan"])
+def test_search_matches_dataframe(df, index, q):
+    for type_, filters in [("both", {}), ("Mutual Fund", {"plan": ["direct"]}), ("ETF", {"amc": ["amc"]})]:
+        rows = index.rows_for(index.match(type_, filters, q))
+        assert rows.tolist() == expected_rows(df, type_, filters, q), (type_, filters)
+
+
+def test_first_row_per_code_wins(df, index):
+    rows = index.rows_for(index.match("both"))
+    assert df.loc[rows, "schemeCode"].tolist() == [101, 102, 103, 104, 105, 106, 107, 108, 109]
+    # 104's first row is the direct plan; the later regular row only shows when it alone matches
+    assert index.rows_for(index.match("both", {"plan": ["regular"]}, "liquid")).tolist() == [9]
+
+
+@pytest.mark.parametrize("type_", ["Mutual Fund", "ETF", "both"])
+def test_facet_counts_use_other_facets(df, index, type_):
+    for filters in selections():
+        assert index.facets(type_, filters) == expected_facets(df, type_, filters), filters
+        # memoized answers stay correct and keep sorted value order
+        facets = index.facets(type_, filters)
+        assert all(list(counts) == sorted(counts) for counts in facets.values())
+
+
+def test_facet_counts_by_hand(index):
+    facets = index.facets("Mutual Fund", {"plan": ["direct"]})
+
+    # own selection ignored: every plan value of the mutual funds is offered
+    assert facets["plan"] == {" direct": 1, "Direct": 2, "Direct Plan": 1, "Regular": 4}
+    # duplicate 101 rows count once; 104's regular row does not match "direct"
+    assert facets["amc"] == {"Alpha AMC": 1, "Beta Mutual Fund": 1, "Delta AMC": 1}
+    assert facets["option"] == {"Growth": 3, "growth": 1}
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import update_data
+from benchmark import synthetic_payload
+from nav_store import NavStore
+
+
+@pytest.fixture
+def offline_store(tmp_path, monkeypatch):
+    store = NavStore(str(tmp_path))
+    monkeypatch.setattr(update_data, "_nav_store", store)
+    return store
+
+
+def test_async_incremental_refetches_full_history_when_delta_fails(nav_server, offline_store, monkeypatch):
+    payload = synthetic_payload(np.random.default_rng(3), "1", 2, gaps=False)
+    full = update_data.parse_nav_payload(payload)
+    offline_store.replace("1", full.iloc[:-20])
+
+    # Delta requests (startDate/endDate) fail; plain full-history requests succeed
+    server = nav_server(lambda code, query: 404 if "startDate" in query else payload)
+    monkeypatch.setattr(update_data, "MFAPI_BASE", server.base_url)
+
+    results = dict(update_data.iter_nav_histories_async(["1"], incremental=True))
+    nav_df = results["1"]
+    assert nav_df is not None
+    assert len(nav_df) == len(full)
+    assert offline_store.last_date("1") == pd.Timestamp(full["date"].iloc[-1])
+    assert server.served == 2
@@ -0,0 +1,100 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+import xirr_solver
+from xirr_solver import _bisect, _stack, solve_xirr, xirr, xirr_many
+
+
+def baseline_xirr(cashflows, dates, guess=0.1):
+    """The scalar Newton loop update_data used before the vectorized solver."""
+    def npv(rate):
+        return sum([cf / ((1 + rate) ** ((d - dates[0]).days / 365)) for cf, d in zip(cashflows, dates)])
+
+    rate = guess
+    for _ in range(100):
+        try:
+            f_value = npv(rate)
+            f_derivative = sum([-cf * ((d - dates[0]).days / 365) / ((1 + rate) ** (((d - dates[0]).days / 365) + 1))
+                                for cf, d in zip(cashflows, dates)])
+            if f_derivative == 0:
+                break
+            new_rate = rate - f_value / f_derivative
+            if abs(new_rate - rate) < 1e-6:
+                return new_rate
+            rate = new_rate
+        except Exception:
+            return None
+    return rate
+
+
+def sip_flows(months, growth, amount=10000, start=date(2015, 1, 1)):
+    """Monthly SIP instalments, then the redemption value after `growth` per month compounding."""
+    dates = [start + timedelta(days=round(30.44 * k)) for k in range(months + 1)]
+    value = sum(amount * (1 + growth) ** (months - k) for k in range(months))
+    return [-amount] * months + [value], dates
+
+
+def npv(rate, cashflows, dates):
+    """NPV relative to the total cash moved (a root is ~0 within the solver's tolerance)."""
+    t = np.array([(d - dates[0]).days for d in dates]) / 365
+    return float(np.sum(np.asarray(cashflows) * (1 + rate) ** -t)) / np.abs(cashflows).sum()
+
+
+@pytest.mark.parametrize("months,growth", [(12, 0.01), (36, 0.004), (60, -0.002), (120, 0.012), (1, 0.05)])
+def test_matches_scalar_baseline(months, growth):
+    cashflows, dates = sip_flows(months, growth)
+    assert xirr(cashflows, dates) == pytest.approx(baseline_xirr(cashflows, dates), abs=1e-6)
+
+
+def test_batch_matches_one_by_one():
+    flows = [sip_flows(m, g) for m, g in [(12, 0.01), (36, 0.004), (60, -0.002), (120, 0.012)]]
+    batch = xirr_many(flows)
+    assert batch == pytest.approx([baseline_xirr(cf, d) for cf, d in flows], abs=1e-6)
+    assert batch == pytest.approx([xirr(cf, d) for cf, d in flows], rel=1e-12)
+
+
+def test_no_sign_change_has_no_root():
+    dates = [date(2020, 1, 1), date(2021, 1, 1), date(2022, 1, 1)]
+    assert xirr([-100, -100, -100], dates) is None
+    assert xirr([100, 50, 10], dates) is None
+    assert xirr([-100], dates[:1]) is None
+    ok = sip_flows(24, 0.01)
+    assert xirr_many([([-1, -2], dates[:2]), ok, ([], [])]) == [None, xirr(*ok), None]
+
+
+def test_large_loss_is_bracketed_where_baseline_fails():
+    # crash_95pct-style: one lump sum losing 95%; Newton from 0.1 overshoots below -100%
+    cashflows = [-10000, 500]
+    dates = [date(2020, 1, 1), date(2021, 1, 1)]
+    baseline = baseline_xirr(cashflows, dates)
+    assert baseline is None or not -1 < baseline < 0 or abs(npv(baseline, cashflows, dates)) > 1e-5
+
+    rate = xirr(cashflows, dates)
+    assert rate == pytest.approx((500 / 10000) ** (365 / 366) - 1, abs=1e-6)     # 2020 is a leap year
+    assert abs(npv(rate, cashflows, dates)) < 1e-5
+
+    # Same for a SIP bleeding out over four years
+    cashflows, dates = sip_flows(48, -0.06)
+    rate = xirr(cashflows, dates)
+    assert -1 < rate < 0
+    assert abs(npv(rate, cashflows, dates)) < 1e-5
+
+
+def test_newton_failure_falls_back_to_bisection(monkeypatch):
+    flows = [sip_flows(m, g) for m, g in [(12, 0.01), (60, -0.002), (120, 0.012)]]
+    expected = xirr_many(flows)
+
+    def never_converges(cashflows, times, guess, tol, max_iter):
+        return np.full(cashflows.shape[0], guess), np.zeros(cashflows.shape[0], dtype=bool)
+
+    monkeypatch.setattr(xirr_solver, "_newton", never_converges)
+    assert xirr_many(flows) == pytest.approx(expected, abs=1e-5)
+
+
+def test_bisect_leaves_unbracketed_rows_nan():
+    cashflows, times = _stack([sip_flows(24, 0.01), ([-100, -100], [date(2020, 1, 1), date(2021, 1, 1)])])
+    rates = _bisect(cashflows, times, tol=1e-9)
+    assert rates[0] == pytest.approx(solve_xirr(cashflows[:1], times[:1])[0], abs=1e-6)
+    assert np.isnan(rates[1])
@@ -1,12 +1,21 @@
 import argparse
 import json
 import os
+import threading
 import time
 import requests
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+from nav_parser import decode_json, parse_nav_arrays
+from nav_store import NavStore
+from result_writer import ResultWriter
+from risk_metrics import calculate_risk_metrics
+from rolling_returns import calculate_rolling_returns
+from run_metrics import METRICS
+from xirr_solver import xirr_many
 
 # ==========================================
 # CONFIGURATION
@@ -20,12 +29,18 @@ PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
 INPUT_FILE = os.path.join(PROJECT_ROOT, "src", "data", "schemeswithcodes.csv")
 OUTPUT_FILE = os.path.join(PROJECT_ROOT, "src", "data", "precomputed_clean.csv")
 CACHE_DIR = os.path.join(SCRIPT_DIR, "cache")
+NAV_STORE_DIR = os.path.join(CACHE_DIR, "nav_store")
 MAX_WORKERS = 10
 MFAPI_BASE = "https://api.mfapi.in/mf/"
 HTTP_HEADERS = {"User-Agent": "Mozilla/5.0", "Accept": "application/json"}
 SIP_AMOUNT = 10000
 SIP_DAY = 1
 
+# Incremental cache: re-request this many days before the last cached NAV and
+# force a full refetch if any overlapping NAV moved by more than the tolerance
+INCREMENTAL_OVERLAP_DAYS = 7
+RESTATEMENT_TOLERANCE = 1e-6
+
 # Periods to calculate
 PERIODS = {
     "1M": 30,
@@ -37,135 +52,341 @@ PERIODS = {
     "7Y": 365 * 7,
     "10Y": 365 * 10,
 }
+# Periods reported as absolute return; the rest use XIRR
+ABSOLUTE_PERIODS = ("1M", "3M", "6M", "1Y")
+
+# Split detection: day-over-day NAV ratios within SPLIT_TOLERANCE of one of
+# these factors are treated as a split and the tail is rescaled.
+SPLIT_RATIOS = np.array([2, 3, 4, 5, 10, 50, 100], dtype=float)
+SPLIT_TOLERANCE = 0.05
 
 os.makedirs(CACHE_DIR, exist_ok=True)
 
+_nav_store = None
+_nav_store_lock = threading.Lock()
+
+def get_nav_store():
+    """Shared NavStore for the NAV cache (opened on first use)."""
+    global _nav_store
+    with _nav_store_lock:
+        if _nav_store is None:
+            _nav_store = NavStore(NAV_STORE_DIR)
+        return _nav_store
+
 # ==========================================
 # CORE LOGIC
 # ==========================================
 
-def xirr(cashflows, dates, guess=0.1):
-    """Compute XIRR using Newton–Raphson method."""
-    def npv(rate):
-        return sum([cf / ((1 + rate) ** ((d - dates[0]).days / 365)) for cf, d in zip(cashflows, dates)])
+def adjust_splits(navs, dates=None):
+    """
+    Detect forward/reverse splits and return (adjusted_navs, split_events).
 
-    rate = guess
-    for _ in range(100):
-        try:
-            f_value = npv(rate)
-            f_derivative = sum([-cf * ((d - dates[0]).days / 365) / ((1 + rate) ** (((d - dates[0]).days / 365) + 1)) for cf, d in zip(cashflows, dates)])
-            if f_derivative == 0: break
-            new_rate = rate - f_value / f_derivative
-            if abs(new_rate - rate) < 1e-6: return new_rate
-            rate = new_rate
-        except:
+    All day-over-day ratios are tested against SPLIT_RATIOS in one pass and the
+    detected factors are applied as a cumulative adjustment, so every NAV after
+    a split is rescaled onto the pre-split basis.
+    """
+    navs = np.asarray(navs, dtype=float)
+    events = []
+    if len(navs) < 2:
+        return navs.copy(), events
+
+    prev_nav, curr_nav = navs[:-1], navs[1:]
+    valid = (prev_nav > 0) & (curr_nav > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(valid, prev_nav / curr_nav, 0.0)
+        rev_ratio = np.where(valid, curr_nav / prev_nav, 0.0)
+
+    # (n-1, k) tolerance tests; candidate bands never overlap so at most one hits
+    fwd_hit = np.abs(ratio[:, None] - SPLIT_RATIOS) / SPLIT_RATIOS < SPLIT_TOLERANCE
+    rev_hit = np.abs(rev_ratio[:, None] - SPLIT_RATIOS) / SPLIT_RATIOS < SPLIT_TOLERANCE
+    fwd_factor = np.where(fwd_hit.any(axis=1), SPLIT_RATIOS[fwd_hit.argmax(axis=1)], 1.0)
+    rev_factor = np.where(rev_hit.any(axis=1), SPLIT_RATIOS[rev_hit.argmax(axis=1)], 1.0)
+
+    split_idx = np.flatnonzero((fwd_factor != 1.0) | (rev_factor != 1.0))
+    if split_idx.size == 0:
+        return navs.copy(), events
+
+    multiplier = np.concatenate(([1.0], np.cumprod(fwd_factor)))
+    divisor = np.concatenate(([1.0], np.cumprod(rev_factor)))
+    adjusted = navs * multiplier / divisor
+
+    for i in split_idx:
+        pos = int(i) + 1
+        event = {
+            "index": pos,
+            "date": dates[pos] if dates is not None else None,
+            "prev_nav": float(prev_nav[i]),
+            "nav": float(curr_nav[i]),
+        }
+        if fwd_factor[i] != 1.0:
+            event.update(kind="forward", factor=float(fwd_factor[i]))
+            print(f"🔧 Forward split ×{fwd_factor[i]:g} detected: {prev_nav[i]:.2f} -> {curr_nav[i]:.2f}")
+        else:
+            event.update(kind="reverse", factor=float(rev_factor[i]))
+            print(f"🔄 Reverse split ÷{rev_factor[i]:g} detected: {prev_nav[i]:.2f} -> {curr_nav[i]:.2f}")
+        events.append(event)
+
+    return adjusted, events
+
+def nav_frame(dates, navs):
+    """Date-indexed NAV DataFrame (the shape fetch_nav_history returns) from NAV arrays."""
+    return pd.DataFrame({"nav": navs}, index=pd.DatetimeIndex(dates, name="date"))
+
+def parse_nav_payload(data):
+    """Turn the API's {date, nav} string rows into a clean, date-sorted DataFrame."""
+    dates, navs = parse_nav_arrays(data)
+    return nav_frame(dates, navs).reset_index()
+
+def load_cached_nav(scheme_code):
+    """
+    Load a scheme's cached history as a date/nav frame, or None if not cached.
+
+    Reads the shared NavStore; a legacy scripts/cache/<code>.csv is imported
+    into the store the first time it is seen.
+    """
+    store = get_nav_store()
+    df = store.read_frame(scheme_code)
+    if df is not None:
+        return df.reset_index()
+
+    legacy_path = os.path.join(CACHE_DIR, f"{scheme_code}.csv")
+    if not os.path.exists(legacy_path):
+        return None
+    try:
+        df = pd.read_csv(legacy_path, usecols=["date", "nav"], parse_dates=["date"])
+        df = df.dropna(subset=["date", "nav"])
+        df = df.sort_values("date").drop_duplicates("date", keep="last").reset_index(drop=True)
+        store.replace(scheme_code, df)
+        return df
+    except Exception as e:
+        print(f"⚠️ Unreadable cache for {scheme_code}, refetching: {e}")
+        return None
+
+def delta_params(last_date):
+    """Query params asking the API for NAVs from the overlap window onwards."""
+    window_start = last_date - timedelta(days=INCREMENTAL_OVERLAP_DAYS)
+    return {
+        "startDate": window_start.strftime("%Y-%m-%d"),
+        "endDate": datetime.now().strftime("%Y-%m-%d"),
+    }
+
+def merge_nav_delta(scheme_code, cached, data):
+    """
+    Merge a delta payload into the cached history and append new rows to the NavStore.
+
+    The overlapping rows must match the cache; if the source restated any of
+    them None is returned so the caller refetches the full history. Sources
+    that ignore the date range and return the full history are handled the
+    same way — only rows after the last cached date are kept.
+    """
+    if "data" not in data:
+        return None
+
+    last_date = cached["date"].iloc[-1]
+    window_start = last_date - timedelta(days=INCREMENTAL_OVERLAP_DAYS)
+    with METRICS.timer("parse", scheme_code):
+        fresh = parse_nav_payload(data) if data["data"] else pd.DataFrame(columns=["date", "nav"])
+    fresh = fresh[fresh["date"] >= window_start]
+
+    # Restatement check over the overlap window
+    overlap = fresh[fresh["date"] <= last_date].merge(cached, on="date", suffixes=("", "_cached"))
+    if not overlap.empty:
+        drift = (overlap["nav"] - overlap["nav_cached"]).abs() / overlap["nav_cached"]
+        if (drift > RESTATEMENT_TOLERANCE).any():
+            print(f"♻️ NAV history restated for {scheme_code}, forcing full refetch")
             return None
-    return rate
 
-def fetch_nav_history(scheme_code):
-    """Fetch NAV from API (Forced Refresh)."""
-    cache_path = os.path.join(CACHE_DIR, f"{scheme_code}.csv")
-    
-    # NOTE: Cache read is DISABLED to force fresh data
-    # if os.path.exists(cache_path): ...
+    new_rows = fresh[fresh["date"] > last_date]
+    if not new_rows.empty:
+        get_nav_store().append(scheme_code, new_rows)
+
+    df = pd.concat([cached, new_rows[["date", "nav"]]], ignore_index=True).set_index("date")
+    return df, data.get("meta", {}).get("scheme_name")
+
+def store_nav_history(scheme_code, data):
+    """Parse a full-history payload, replace the scheme's cached rows and return (nav_df, name)."""
+    if "data" not in data or not data["data"]:
+        METRICS.fail(scheme_code, "empty payload")
+        return None, None
+
+    # Straight to arrays; the DataFrame is only built for the caller
+    with METRICS.timer("parse", scheme_code):
+        dates, navs = parse_nav_arrays(data)
+
+    # Full history replaces whatever was cached
+    get_nav_store().replace(scheme_code, (dates, navs))
+
+    return nav_frame(dates, navs), data.get("meta", {}).get("scheme_name")
+
+def record_fetch(scheme_code, seconds, nbytes, attempts=1):
+    """Record one scheme's download in the run metrics."""
+    METRICS.record("fetch", seconds, scheme_code)
+    METRICS.count("requests", attempts)
+    METRICS.count("bytes_downloaded", nbytes)
+    if attempts > 1:
+        METRICS.count("retries", attempts - 1)
+
+def fetch_nav_delta(scheme_code, cached):
+    """
+    Fetch only NAVs newer than the cached history (see merge_nav_delta).
+
+    Returns None when the request fails or history was restated, so the caller
+    falls back to a full refetch.
+    """
+    params = delta_params(cached["date"].iloc[-1])
+    t0 = time.perf_counter()
+    response = requests.get(f"{MFAPI_BASE}{scheme_code}", params=params, headers=HTTP_HEADERS, timeout=10)
+    record_fetch(scheme_code, time.perf_counter() - t0, len(response.content))
+    if response.status_code != 200:
+        return None
+    return merge_nav_delta(scheme_code, cached, decode_json(response.content))
+
+def fetch_nav_history(scheme_code, incremental=False):
+    """
+    Fetch NAV history for a scheme.
+
+    By default the full history is re-downloaded (forced refresh) and replaces
+    the scheme's rows in the NavStore. With incremental=True the cached history
+    is reused and only newer rows are fetched and appended (see fetch_nav_delta).
+    """
+    if incremental:
+        cached = load_cached_nav(scheme_code)
+        if cached is not None and not cached.empty:
+            try:
+                delta = fetch_nav_delta(scheme_code, cached)
+                if delta is not None:
+                    return delta
+            except Exception as e:
+                print(f"⚠️ Delta fetch failed for {scheme_code}, refetching full history: {e}")
 
     url = f"{MFAPI_BASE}{scheme_code}"
     try:
+        t0 = time.perf_counter()
         response = requests.get(url, headers=HTTP_HEADERS, timeout=10)
-        if response.status_code != 200: return None, None
+        record_fetch(scheme_code, time.perf_counter() - t0, len(response.content))
+        if response.status_code != 200:
+            METRICS.fail(scheme_code, f"HTTP {response.status_code}")
+            return None, None
         
-        data = response.json()
-        if "data" not in data or not data["data"]: return None, None
-
-        df = pd.DataFrame(data["data"])
-        df["date"] = pd.to_datetime(df["date"], dayfirst=True, errors="coerce")
-        df["nav"] = pd.to_numeric(df["nav"], errors="coerce")
-        df = df.dropna(subset=["date", "nav"])
-        df = df[df["nav"] > 0].sort_values("date").reset_index(drop=True)
-        
-        # We still save to cache as a backup
-        df.to_csv(cache_path, index=False)
-        
-        df = df.set_index("date")
-        return df, data.get("meta", {}).get("scheme_name")
+        return store_nav_history(scheme_code, decode_json(response.content))
     except Exception as e:
         print(f"Error fetching {scheme_code}: {e}")
+        METRICS.fail(scheme_code, f"fetch: {type(e).__name__}")
         return None, None
 
-def simulate_sip(nav_df, start_date, end_date):
-    """Simulate monthly SIP investments and handle split adjustments."""
+def iter_nav_histories_async(codes, incremental=False, buffer=None):
+    """
+    Fetch many schemes with the async fetcher and yield (code, nav_df) as each arrives.
+
+    nav_df is None when the scheme could not be fetched. Incremental requests
+    that fail, or whose delta cannot be merged, fall back to a synchronous full
+    refetch (as fetch_nav_history does). Restatements are only detected inside
+    the INCREMENTAL_OVERLAP_DAYS overlap window; older rows the source revises
+    stay as cached until the next forced (full) refresh.
+    At most `buffer` (default STREAM_BUFFER) fetched payloads wait for this
+    generator's consumer, on top of the fetcher's own MAX_PENDING.
+    """
+    from async_fetcher import STREAM_BUFFER, iter_nav_payloads
+
+    store = get_nav_store()
+    jobs = []
+    deltas = set()
+    for code in codes:
+        params = None
+        if incremental:
+            last_date = store.last_date(code)
+            if last_date is None:
+                cached = load_cached_nav(code)
+                if cached is not None and not cached.empty:
+                    last_date = cached["date"].iloc[-1]
+            if last_date is not None:
+                params = delta_params(last_date)
+                deltas.add(str(code))
+        jobs.append((code, params))
+
+    for result in iter_nav_payloads(jobs, buffer=buffer or STREAM_BUFFER, base_url=MFAPI_BASE, headers=HTTP_HEADERS):
+        nav_df = None
+        record_fetch(result.code, result.elapsed, result.nbytes, result.attempts)
+        try:
+            if result.data is None and result.code in deltas:
+                print(f"⚠️ Delta fetch failed for {result.code} ({result.error}), refetching full history")
+                nav_df = fetch_nav_history(result.code)[0]
+            elif result.data is None:
+                print(f"Error fetching {result.code}: {result.error}")
+                METRICS.fail(result.code, result.error or "fetch failed")
+            elif incremental and store.last_date(result.code) is not None:
+                merged = merge_nav_delta(result.code, load_cached_nav(result.code), result.data)
+                nav_df = merged[0] if merged is not None else fetch_nav_history(result.code)[0]
+            else:
+                nav_df = store_nav_history(result.code, result.data)[0]
+        except Exception as e:
+            print(f"Error processing {result.code}: {e}")
+            METRICS.fail(result.code, f"parse: {type(e).__name__}")
+        yield result.code, nav_df
+
+def prepare_nav(nav_df):
+    """
+    Sort and split-adjust a scheme's NAV history once.
+
+    Returns (dates, navs, splits). `navs` is marked read-only so every period
+    window can share it without copying.
+    """
     if nav_df is None or nav_df.empty:
-        return None, None, None, None
+        return None, None, []
 
-    # Generate SIP Dates
+    nav_df = nav_df.sort_index()
+    dates = nav_df.index
+    with METRICS.timer("split_scan"):
+        navs, splits = adjust_splits(nav_df["nav"].to_numpy(dtype=float), dates)
+    navs.flags.writeable = False
+    return dates, navs, splits
+
+def sip_schedule(start_date, end_date):
+    """Monthly SIP dates (SIP_DAY of each month) from start_date's month up to end_date."""
     months = pd.date_range(start=start_date.replace(day=1), end=end_date, freq="MS")
-    sip_dates = []
-    for m in months:
-        try:
-            candidate = m.replace(day=SIP_DAY)
-            if candidate <= end_date:
-                sip_dates.append(candidate)
-        except ValueError:
-            continue
+    sip_dates = months + pd.Timedelta(days=SIP_DAY - 1)
+    # Months too short for SIP_DAY are skipped
+    return sip_dates[(sip_dates.month == months.month) & (sip_dates <= end_date)]
 
-    # --- SPLIT DETECTION LOGIC (From periodic_return.py) ---
-    nav_series = nav_df["nav"].sort_index().values
-    for i in range(1, len(nav_series)):
-        prev_nav, curr_nav = nav_series[i - 1], nav_series[i]
-        if prev_nav <= 0 or curr_nav <= 0:
-            continue
-            
-        ratio = prev_nav / curr_nav
-        rev_ratio = curr_nav / prev_nav
-        
-        # Forward Split (Price drops)
-        for possible in [2, 3, 4, 5, 10, 50, 100]:
-            if abs(ratio - possible) / possible < 0.05:
-                print(f"🔧 Forward split ×{possible} detected: {prev_nav:.2f} -> {curr_nav:.2f}")
-                nav_df.iloc[i:, nav_df.columns.get_loc("nav")] *= possible
-                nav_series[i:] *= possible # Update local array for next iteration
-                break
-        
-        # Reverse Split (Price jumps)
-        for possible in [2, 3, 4, 5, 10, 50, 100]:
-            if abs(rev_ratio - possible) / possible < 0.05:
-                print(f"🔄 Reverse split ÷{possible} detected: {prev_nav:.2f} -> {curr_nav:.2f}")
-                nav_df.iloc[i:, nav_df.columns.get_loc("nav")] /= possible
-                nav_series[i:] /= possible
-                break
+def simulate_sip(dates, navs, start_date, end_date):
+    """Simulate monthly SIP investments over a prepared (split-adjusted) NAV series."""
+    if navs is None or len(navs) == 0:
+        return None, None, None, None
 
-    # --- SIP CALCULATION ---
-    units, cashflows, dates = [], [], []
-    for d in sip_dates:
-        df_sel = nav_df[nav_df.index >= d]
-        if df_sel.empty:
-            continue
-        nav = float(df_sel["nav"].iloc[0])
-        units.append(SIP_AMOUNT / nav)
-        cashflows.append(-SIP_AMOUNT)
-        dates.append(df_sel.index[0])
+    sip_dates = sip_schedule(start_date, end_date)
 
-    if not units:
+    # --- SIP CALCULATION ---
+    # Each instalment buys at the first NAV on or after its SIP date
+    pos = dates.searchsorted(sip_dates, side="left")
+    pos = pos[pos < len(navs)]
+    if pos.size == 0:
         return None, None, None, None
 
-    total_units = sum(units)
+    units = SIP_AMOUNT / navs[pos]
+    total_units = float(units.sum())
     total_invested = len(units) * SIP_AMOUNT
-    latest_nav = float(nav_df["nav"].iloc[-1])
+    latest_nav = float(navs[-1])
     current_value = total_units * latest_nav
 
-    cashflows.append(current_value)
-    dates.append(nav_df.index[-1])
+    cashflows = np.append(np.full(len(units), -float(SIP_AMOUNT)), current_value)
+    flow_dates = dates[pos].append(dates[-1:])
 
-    return total_invested, current_value, dates, cashflows
+    return total_invested, current_value, flow_dates, cashflows
 
-def calculate_returns(nav_df):
-    """Calculate SIP returns (Absolute/XIRR)."""
+def calculate_returns(nav_df, prepared=None):
+    """Calculate SIP returns (Absolute/XIRR). `prepared` reuses a prepare_nav result."""
     if nav_df is None or nav_df.empty: return {}
-    
-    end_date = nav_df.index[-1]
-    first_date = nav_df.index[0]
+
+    # Split-adjust once; every period window reads the same array
+    nav_dates, navs, _ = prepared or prepare_nav(nav_df)
+    t0 = time.perf_counter()
+
+    end_date = nav_dates[-1]
+    first_date = nav_dates[0]
     results = {}
 
+    xirr_labels, xirr_flows = [], []
+
     for label, days in PERIODS.items():
         start_date = end_date - timedelta(days=days)
         
@@ -173,92 +394,272 @@ def calculate_returns(nav_df):
             results[label] = None
             continue
 
-        # Important: Pass a COPY so simulate_sip's split logic doesn't compound 
-        # if we were running it multiple times (though here it cleans it once per call)
-        invested, value, dates, cashflows = simulate_sip(nav_df.copy(), start_date, end_date)
+        invested, value, dates, cashflows = simulate_sip(nav_dates, navs, start_date, end_date)
         
         if invested is None:
             results[label] = None
             continue
 
-        if label in ["1M", "3M", "6M", "1Y"]:
-            returns = ((value / invested) - 1) * 100 # Absolute
+        if label in ABSOLUTE_PERIODS:
+            results[label] = round(((value / invested) - 1) * 100, 2) # Absolute
         else:
-            returns = xirr(cashflows, dates) * 100 # XIRR
+            # XIRR periods are solved together below
+            results[label] = None
+            xirr_labels.append(label)
+            xirr_flows.append((cashflows, dates))
 
-        results[label] = round(returns, 2) if returns is not None else None
+    for label, rate in zip(xirr_labels, xirr_many(xirr_flows)):
+        results[label] = round(rate * 100, 2) if rate is not None else None
 
+    METRICS.record("compute", time.perf_counter() - t0)
     return results
 
+def calculate_metrics(nav_df, prepared=None):
+    """Per-scheme analytics stored next to the period returns (rolling summaries, risk)."""
+    if nav_df is None or nav_df.empty: return {}
+
+    nav_dates, navs, _ = prepared or prepare_nav(nav_df)
+    with METRICS.timer("analytics"):
+        return {
+            "rolling": calculate_rolling_returns(nav_dates.values, navs),
+            "risk": calculate_risk_metrics(nav_dates.values, navs),
+        }
+
+def analyze_scheme(nav_df):
+    """Period returns and analytics for one scheme, split-adjusting its NAV once."""
+    if nav_df is None or nav_df.empty: return {}, {}
+
+    prepared = prepare_nav(nav_df)
+    return calculate_returns(nav_df, prepared), calculate_metrics(nav_df, prepared)
+
 # ==========================================
 # WORKER FUNCTION
 # ==========================================
-def process_scheme(row):
+def build_result(row, returns, metrics=None):
+    """Shape one scheme's returns (and analytics from calculate_metrics) into an output CSV row."""
+    metrics = metrics or {}
+    risk = metrics.get("risk") or {}
+    return {
+        "scheme_code": str(row["schemeCode"]),
+        "scheme_name": row["schemeName"],
+        "type": "ETF" if "ETF" in str(row.get("Option", "")).upper() else "Mutual Fund",
+        "plan": row.get("Plan", ""),
+        "option": row.get("Option", ""),
+        "return_1m": returns.get("1M"),
+        "return_3m": returns.get("3M"),
+        "return_6m": returns.get("6M"),
+        "return_1y": returns.get("1Y"),
+        "return_3y": returns.get("3Y"),
+        "return_5y": returns.get("5Y"),
+        "return_7y": returns.get("7Y"),
+        "return_10y": returns.get("10Y"),
+        "results_json": json.dumps(returns),
+        "rolling_json": json.dumps(metrics["rolling"]) if "rolling" in metrics else None,
+        "risk_json": json.dumps(metrics["risk"]) if "risk" in metrics else None,
+        "volatility": risk.get("volatility"),
+        "max_drawdown": risk.get("max_drawdown"),
+        "sharpe": risk.get("sharpe"),
+        "sortino": risk.get("sortino"),
+        "updated_at": datetime.now().strftime("%Y-%m-%d")
+    }
+
+def process_scheme(row, incremental=False):
     code = str(row["schemeCode"])
-    name = row["schemeName"]
     
     try:
-        nav_df, api_name = fetch_nav_history(code)
-        if nav_df is None: return None
+        with METRICS.scheme(code):
+            nav_df, api_name = fetch_nav_history(code, incremental=incremental)
+            if nav_df is None: return None
 
-        # Calculate using the SIP Logic
-        returns = calculate_returns(nav_df)
+            # Calculate using the SIP Logic
+            returns, metrics = analyze_scheme(nav_df)
         
-        return {
-            "scheme_code": code,
-            "scheme_name": name,
-            "type": "ETF" if "ETF" in str(row.get("Option", "")).upper() else "Mutual Fund",
-            "plan": row.get("Plan", ""),
-            "option": row.get("Option", ""),
-            "return_1m": returns.get("1M"),
-            "return_3m": returns.get("3M"),
-            "return_6m": returns.get("6M"),
-            "return_1y": returns.get("1Y"),
-            "return_3y": returns.get("3Y"),
-            "return_5y": returns.get("5Y"),
-            "return_7y": returns.get("7Y"),
-            "return_10y": returns.get("10Y"),
-            "results_json": json.dumps(returns),
-            "updated_at": datetime.now().strftime("%Y-%m-%d")
-        }
+        return build_result(row, returns, metrics)
     except Exception as e:
+        METRICS.fail(code, f"compute: {type(e).__name__}")
         return None
 
+def iter_fetched(schemes, incremental=False, fetcher="threads", workers=MAX_WORKERS, max_pending=None):
+    """
+    Yield (row, nav_df) for every scheme row as its NAV history arrives.
+
+    The thread fetcher keeps at most `max_pending` requests submitted (default
+    4 × workers), so a slow consumer throttles fetching instead of buffering.
+    The async fetcher lets at most `max_pending` payloads wait beyond its own
+    MAX_PENDING in-flight/ready bound.
+    """
+    max_pending = max_pending or workers * 4
+    if fetcher == "async":
+        rows_by_code = {}
+        for _, row in schemes.iterrows():
+            rows_by_code.setdefault(str(row["schemeCode"]), []).append(row)
+        for code, nav_df in iter_nav_histories_async(list(rows_by_code), incremental=incremental,
+                                                     buffer=max_pending):
+            for row in rows_by_code[code]:
+                yield row, nav_df
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        for _, row in schemes.iterrows():
+            pending[executor.submit(fetch_nav_history, str(row["schemeCode"]), incremental)] = row
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()[0]
+        for future in as_completed(pending):
+            yield pending[future], future.result()[0]
+
+def run_batch(schemes, sink, incremental=False, fetcher="threads"):
+    """Fetch NAVs, compute returns BATCH_SIZE schemes at a time and pass each row to sink."""
+    from batch_returns import BATCH_SIZE, calculate_returns_batch
+
+    total = len(schemes)
+    pending = []
+    processed = 0
+
+    def flush():
+        frames = {code: nav_df for _, code, nav_df in pending}
+        try:
+            with METRICS.timer("compute_batch"):
+                batch = calculate_returns_batch(frames)
+        except Exception as e:
+            print(f"⚠️ Batch engine failed ({e}), falling back to per-scheme compute")
+            batch = {}
+            for code, nav_df in frames.items():
+                with METRICS.scheme(code):
+                    batch[code] = calculate_returns(nav_df)
+        for row, code, nav_df in pending:
+            with METRICS.scheme(code):
+                metrics = calculate_metrics(nav_df)
+            sink(build_result(row, batch.get(code, {}), metrics))
+        pending.clear()
+
+    for row, nav_df in iter_fetched(schemes, incremental=incremental, fetcher=fetcher):
+        if nav_df is not None:
+            pending.append((row, str(row["schemeCode"]), nav_df))
+        if len(pending) >= BATCH_SIZE:
+            flush()
+
+        processed += 1
+        if processed % 50 == 0:
+            print(f"✅ Fetched {processed}/{total}...")
+
+    if pending:
+        flush()
+
 # ==========================================
 # MAIN EXECUTION
 # ==========================================
 def main():
-    print(f"🚀 Starting Data Update (Forced Fresh Fetch)...")
+    parser = argparse.ArgumentParser(description="Refresh precomputed SIP returns for all schemes.")
+    parser.add_argument("--engine", choices=["scheme", "batch"], default="scheme",
+                        help="scheme: compute each scheme as it is fetched; "
+                             "batch: compute fetched schemes together on a NAV matrix")
+    parser.add_argument("--incremental", action="store_true",
+                        help="reuse scripts/cache and only download NAVs newer than the cached history")
+    parser.add_argument("--fetcher", choices=["threads", "async"], default="threads",
+                        help="threads: requests in a fixed thread pool; "
+                             "async: pooled aiohttp client with adaptive concurrency and retries")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="run fetch, compute and write as separate stages (compute in a process pool)")
+    parser.add_argument("--fetch-workers", type=int, default=MAX_WORKERS,
+                        help="I/O threads for the threads fetcher")
+    parser.add_argument("--compute-workers", type=int, default=os.cpu_count(),
+                        help="compute processes in --pipeline mode")
+    parser.add_argument("--queue-size", type=int, default=200,
+                        help="fetched schemes allowed to wait for compute in --pipeline mode")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue today's interrupted run, skipping schemes already written")
+    parser.add_argument("--metrics-file",
+                        help="write per-stage timings, counters and failures as JSON to this path")
+    args = parser.parse_args()
+
+    mode = "Incremental Cache Refresh" if args.incremental else "Forced Fresh Fetch"
+    print(f"🚀 Starting Data Update ({mode})...")
     
     if not os.path.exists(INPUT_FILE):
         print(f"❌ Error: {INPUT_FILE} not found.")
         return
 
     schemes = pd.read_csv(INPUT_FILE)
-    total = len(schemes)
-    print(f"Found {total} schemes to process.")
+    print(f"Found {len(schemes)} schemes to process.")
 
-    results = []
+    # Rows stream to disk as they finish; see result_writer.py
+    writer = ResultWriter(OUTPUT_FILE, resume=args.resume)
+    if writer.done:
+        schemes = schemes[~schemes["schemeCode"].astype(str).isin(writer.done)]
+        print(f"⏩ Resuming: {len(writer.done)} schemes already computed today, {len(schemes)} left.")
+
+    total = len(schemes)
     processed = 0
     
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [executor.submit(process_scheme, row) for _, row in schemes.iterrows()]
-        
-        for future in as_completed(futures):
+    def progress(n):
+        if n % 50 == 0:
+            print(f"✅ Fetched {n}/{total}...")
+
+    if args.pipeline:
+        from pipeline import run_pipeline
+        fetched = iter_fetched(schemes, incremental=args.incremental, fetcher=args.fetcher,
+                               workers=args.fetch_workers)
+        run_pipeline(fetched, writer.write, engine=args.engine, compute_workers=args.compute_workers,
+                     queue_size=args.queue_size, on_progress=progress)
+    elif args.engine == "batch":
+        run_batch(schemes, writer.write, incremental=args.incremental, fetcher=args.fetcher)
+    elif args.fetcher == "async":
+        for row, nav_df in iter_fetched(schemes, incremental=args.incremental, fetcher="async"):
+            try:
+                if nav_df is not None:
+                    with METRICS.scheme(row["schemeCode"]):
+                        analysis = analyze_scheme(nav_df)
+                    writer.write(build_result(row, *analysis))
+            except Exception as e:
+                print(f"Error computing {row['schemeCode']}: {e}")
+                METRICS.fail(row["schemeCode"], f"compute: {type(e).__name__}")
+
+            processed += 1
+            if processed % 50 == 0:
+                print(f"✅ Processed {processed}/{total}...")
+    else:
+        def finish(future):
+            nonlocal processed
             res = future.result()
             if res:
-                results.append(res)
-            
+                writer.write(res)
+
             processed += 1
             if processed % 50 == 0:
                 print(f"✅ Processed {processed}/{total}...")
 
-    if results:
-        df_out = pd.DataFrame(results)
-        df_out.to_csv(OUTPUT_FILE, index=False)
-        print(f"\n🎉 Success! Updated {OUTPUT_FILE} with {len(results)} records.")
+        # Sliding window (as in iter_fetched): at most 4 × MAX_WORKERS schemes are
+        # submitted at once and each row goes to the writer as soon as it is done
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            pending = set()
+            for _, row in schemes.iterrows():
+                pending.add(executor.submit(process_scheme, row, args.incremental))
+                if len(pending) >= MAX_WORKERS * 4:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finish(future)
+            for future in as_completed(pending):
+                finish(future)
+
+    # Persist the NAV cache; compaction drops rows superseded by full refetches
+    get_nav_store().compact()
+
+    written = writer.close()
+    if written:
+        print(f"\n🎉 Success! Updated {OUTPUT_FILE} with {written} records.")
     else:
         print("\n⚠️ No results generated.")
 
+    # Where the time went: per-stage percentiles, slowest schemes, failures
+    METRICS.count("schemes_written", written)
+    summary = METRICS.summary()
+    METRICS.print_summary(summary)
+    if args.metrics_file:
+        METRICS.write(args.metrics_file, summary)
+        print(f"📝 Metrics written to {args.metrics_file}")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,151 @@
+"""
+xirr_solver.py
+Vectorized XIRR for the returns pipeline.
+
+- Year fractions are computed once per series as a float array (days / 365)
+- NPV and its derivative are evaluated with NumPy for a whole batch of series
+- Newton–Raphson first; series that diverge or leave the valid range fall back
+  to a bracketed bisection, and None is returned only when no root exists
+"""
+
+import numpy as np
+
+DAYS_PER_YEAR = 365
+MIN_RATE = -0.9999          # (1 + rate) must stay positive
+MAX_RATE = 1e4              # 1,000,000% — anything above is treated as no root
+BRACKET_GRID = np.concatenate((
+    np.linspace(MIN_RATE, -0.5, 20, endpoint=False),
+    np.linspace(-0.5, 2.0, 101),
+    np.geomspace(2.5, MAX_RATE, 40),
+))
+
+
+def year_fractions(dates):
+    """Return (d - dates[0]).days / 365 for every date as a float array."""
+    days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+    return (days - days[0]) / DAYS_PER_YEAR
+
+
+def _stack(flows):
+    """Pad a list of (cashflows, dates) into (m, L) cashflow and year-fraction matrices."""
+    width = max(len(cf) for cf, _ in flows)
+    cashflows = np.zeros((len(flows), width))
+    times = np.zeros((len(flows), width))
+    for i, (cf, dates) in enumerate(flows):
+        cashflows[i, :len(cf)] = np.asarray(cf, dtype=float)
+        times[i, :len(cf)] = year_fractions(dates)
+    # Padding has a zero cashflow, so it never contributes to NPV
+    return cashflows, times
+
+
+def _npv(rates, cashflows, times):
+    """NPV of each row at its own rate."""
+    with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+        return (cashflows * (1 + rates)[:, None] ** -times).sum(axis=1)
+
+
+def _newton(cashflows, times, guess, tol, max_iter):
+    """Batched Newton–Raphson. Returns (rates, converged mask)."""
+    m = cashflows.shape[0]
+    rate = np.full(m, float(guess))
+    converged = np.zeros(m, dtype=bool)
+    active = np.ones(m, dtype=bool)
+
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        r = rate[active]
+        cf, t = cashflows[active], times[active]
+        with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+            disc = (1 + r)[:, None] ** -t
+            f_value = (cf * disc).sum(axis=1)
+            f_derivative = (-cf * t * disc / (1 + r)[:, None]).sum(axis=1)
+            new_rate = r - f_value / f_derivative
+
+        idx = np.flatnonzero(active)
+        bad = (f_derivative == 0) | ~np.isfinite(new_rate) | (new_rate <= -1)
+        done = ~bad & (np.abs(new_rate - r) < tol)
+
+        rate[idx[~bad]] = new_rate[~bad]
+        converged[idx[done]] = True
+        active[idx[bad | done]] = False
+
+    return rate, converged
+
+
+def _bisect(cashflows, times, tol, max_iter=200):
+    """Bracketed bisection for rows Newton could not solve. Unbracketed rows → NaN."""
+    m = cashflows.shape[0]
+    grid = np.broadcast_to(BRACKET_GRID, (m, BRACKET_GRID.size))
+    values = np.stack([_npv(grid[:, j], cashflows, times) for j in range(grid.shape[1])], axis=1)
+
+    # First sign change along the grid brackets the root closest to MIN_RATE
+    sign_change = np.isfinite(values[:, :-1]) & np.isfinite(values[:, 1:]) & \
+        (np.sign(values[:, :-1]) * np.sign(values[:, 1:]) <= 0)
+    has_bracket = sign_change.any(axis=1)
+    j = sign_change.argmax(axis=1)
+    rows = np.arange(m)
+
+    lo, hi = grid[rows, j].copy(), grid[rows, j + 1].copy()
+    f_lo = values[rows, j]
+    for _ in range(max_iter):
+        mid = (lo + hi) / 2
+        f_mid = _npv(mid, cashflows, times)
+        same = np.sign(f_mid) == np.sign(f_lo)
+        lo = np.where(same, mid, lo)
+        f_lo = np.where(same, f_mid, f_lo)
+        hi = np.where(same, hi, mid)
+        if np.all(hi - lo < tol):
+            break
+
+    return np.where(has_bracket, (lo + hi) / 2, np.nan)
+
+
+def solve_xirr(cashflows, times, guess=0.1, tol=1e-6, max_iter=100):
+    """
+    Solve XIRR for stacked (m, L) cashflow and year-fraction matrices.
+
+    Rows are padded with zero cashflows. Returns a float array of annual rates
+    with NaN where a row has no sign change or no root could be bracketed.
+    """
+    cashflows = np.asarray(cashflows, dtype=float)
+    times = np.asarray(times, dtype=float)
+    rates = np.full(cashflows.shape[0], np.nan)
+
+    solvable = np.flatnonzero((cashflows.min(axis=1) < 0) & (cashflows.max(axis=1) > 0))
+    if solvable.size == 0:
+        return rates
+
+    cf, t = cashflows[solvable], times[solvable]
+    solved, converged = _newton(cf, t, guess, tol, max_iter)
+    if not converged.all():
+        retry = np.flatnonzero(~converged)
+        solved[retry] = _bisect(cf[retry], t[retry], tol)
+
+    rates[solvable] = solved
+    return rates
+
+
+def xirr_many(flows, guess=0.1, tol=1e-6, max_iter=100):
+    """
+    Solve XIRR for a batch of (cashflows, dates) series in one vectorized pass.
+
+    Returns a list of annual rates (e.g. 0.12 for 12%), None where the series
+    has no sign change or no root could be bracketed.
+    """
+    results = [None] * len(flows)
+    usable = [i for i, (cf, _) in enumerate(flows) if len(cf) >= 2]
+    if not usable:
+        return results
+
+    cashflows, times = _stack([flows[i] for i in usable])
+    rates = solve_xirr(cashflows, times, guess=guess, tol=tol, max_iter=max_iter)
+
+    for i, rate in zip(usable, rates):
+        results[i] = float(rate) if np.isfinite(rate) else None
+    return results
+
+
+def xirr(cashflows, dates, guess=0.1, tol=1e-6, max_iter=100):
+    """Compute XIRR for a single series (Newton–Raphson with bracketing fallback)."""
+    return xirr_many([(cashflows, dates)], guess=guess, tol=tol, max_iter=max_iter)[0]